@@ -0,0 +1,79 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Ingest every dump of collect_data.sh into the long term archive and
+#      compact its old months
+#
+# Refs :
+#   a) util_archive.py
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import sys
+import argparse
+from util_archive import COMPACT_POLICY
+from util_archive import compact_archive
+from util_archive import ingest_util_dir
+
+
+# Run after every collect_data.sh, e.g.
+#   python src/archive_gpu_util.py --path data/2024-11-01 --archive data/archive --compact
+def main():
+    """Ingest a directory of gpu utilization files into the archive
+
+    Args
+
+        N/A
+
+    Returns
+
+    Raises
+
+    """
+    parser = argparse.ArgumentParser(
+                description="Merge the text files from collect_data.sh into a month "
+                            "partitioned archive of gpu utilization")
+    parser.add_argument('--path', metavar='path/to/toplevel/data/dir', type=str,
+                        help='Directory with node*_gpuutil_gpu*.txt')
+    parser.add_argument('--archive', metavar='path/to/archive', type=str,
+                        required=True, help='Archive directory, created if needed')
+    parser.add_argument('--excludenodes', metavar='excludenodes', nargs='?',
+                        type=str, help='Comma separated node names to skip')
+    parser.add_argument('--compact', action='store_true',
+                        help='Roll up the old raw months, see --width / --keep_months')
+    parser.add_argument('--width', metavar='1h', type=str,
+                        default=COMPACT_POLICY['2min'][0],
+                        help='Width the raw months are rolled up to, default 1h')
+    parser.add_argument('--keep_months', metavar='months', type=int,
+                        default=COMPACT_POLICY['2min'][1],
+                        help='Latest months kept raw, the current one included, '
+                             'default 3')
+    args = parser.parse_args()
+
+    if args.path is not None:
+        excludenodeL = None if args.excludenodes is None else args.excludenodes.split(',')
+        countD = ingest_util_dir(args.path, args.archive, excludenodeL)
+        print("{} series, {} new samples".format(countD['series'], countD['samples']))
+    if args.compact is True:
+        ncompact = compact_archive(args.archive, {'2min' : (args.width,
+                                                            args.keep_months)})
+        print("{} months compacted".format(ncompact))
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -35,17 +35,28 @@ import pandas as pd
 #matplotlib.use('tkagg')        # Linux
 #matplotlib.use('qtagg')
 from classes import User
+from classes import AllocationCurve
+from classes import OccupancyTimeline
 from functools import reduce
 import matplotlib.pyplot as plt
 from plot_funcs import make_pie
 from functions import make_autopct
-from functions import parse_sacct_file
+from functions import parse_sacct_table
 from functions import is_job_in_time_range
+from functions import sort_user_usage
+from functions import user_usage_table
+from functions import print_allocation_query
+from functions import print_peak_query
+from sacct_store import read_sacct_store
+from hostlist import select_nodes
 from plot_funcs import plot_time_series_mpl
 from plot_funcs import plot_time_series_plotly
+from plot_funcs import plot_occupancy_mpl
 
 
 # Expects data like : sacct --allusers -P -S 2024-08-01 --format="jobidraw,jobname,user,nodelist,elapsedraw,alloccpus,cputimeraw,maxrss,state,start,end,reqtres" > sacct_2024-08-01.txt
+# or --format="job,..." (make_fake_data.py), array (1234_5) and het (1234+0) job ids
+# are kept as is
 
 # Run via
 #    python -m pdb src/bcm_accounting_plots.py --path data/sacct_2024-05-01_to_2024-10-31.txt --start 2024-05-01T00:00:00 --end 2024-11-01T00:00:00 --plottyp time-series --users all
@@ -54,7 +65,13 @@ from plot_funcs import plot_time_series_plotly
 # For Monthly plots
 #   DPATH=data/20250403/; python -m pdb src/bcm_accounting_plots.py --path ${DPATH}/sacct_2025-04-03 --totalutil ${DPATH}/totalgpuutilization_1d.txt --start 2025-03-01T00:00:00 --end 2025-04-01T00:00:00 --plot_type time-series --users total_alloc+util --engine matplotlib --exclude_nodes rceabrg01,rceabrg02 --plot_title "GPU allococation and utilization excluding rceabrg[01-02]"
 #   DPATH=data/20250403/; python -m pdb src/bcm_accounting_plots.py --path ${DPATH}/sacct_2025-04-03 --totalutil ${DPATH}/totalgpuutilization_1d.txt --start 2025-03-01T00:00:00 --end 2025-04-01T08:00:01 --plot_type time-series --users total_alloc+util --engine matplotlib --exclude_nodes rceabrg01,rceabrg02 --plot_title "GPU allococation and utilization excluding rceabrg[01-02]"
->>>>>>> caa16a9ea2a83ae34b1d032859801ae07719b511
+#
+# For allocation in an arbitrary window, builds data/curve.npz once then only loads it
+#   python src/bcm_accounting_plots.py --path data/sacct_2025-04-03 --curve data/curve.npz --query --start 2025-03-01T00:00:00 --end 2025-04-01T00:00:00
+#
+# For peak concurrency and the node occupancy heatmap (6h bins)
+#   python src/bcm_accounting_plots.py --path data/sacct_2025-04-03 --peaks --start 2025-03-01T00:00:00 --end 2025-04-01T00:00:00
+#   python src/bcm_accounting_plots.py --path data/sacct_2025-04-03 --plot_type occupancy --column gpus --hourinterval 6 --start 2025-03-01T00:00:00 --end 2025-04-01T00:00:00
 def main():
     """Loads the sacct .
 
@@ -70,13 +87,19 @@ def main():
     parser = argparse.ArgumentParser(
                     description="This generates plots from output of `sacct`")
     parser.add_argument('--path', metavar='path/to/sacct_text_file', type=str,
-                        help='Path to parsable sacct file')
+                        help='Path to parsable sacct file, or comma separated '
+                             'paths / globs of overlapping dumps, merged per job')
+    parser.add_argument('--store', metavar='path/to/sacct_store', type=str,
+                        help='Read jobs from a store built by ingest_sacct.py '
+                             'instead of --path')
     parser.add_argument('--start', metavar='YYYY-MM-DDTHH:MM:SS', type=str,
                         help='Time in YYYY-MM-DDTHH:MM:SS format')
     parser.add_argument('--end', metavar='YYYY-MM-DDTHH:MM:SS', type=str,
                         help='Time in YYYY-MM-DDTHH:MM:SS format')
-    parser.add_argument('--plot_type', metavar='histogram|pie|time-series', type=str,
-                        help='Options : "histogram", "pie" or "time-series"')
+    parser.add_argument('--plot_type', metavar='histogram|pie|time-series|occupancy',
+                        type=str, help='Options : "histogram", "pie", "time-series" '
+                                       'or "occupancy" (concurrent allocation and a '
+                                       'node x time heatmap)')
     parser.add_argument('--users', metavar='all|total|total_alloc+util', type=str,
                         help='Options : "all", "total", "total_alloc+util", or '
                         '"someuser"')
@@ -86,12 +109,39 @@ def main():
                         type=str, help='Total utilization file, e.g. 1h or 1d')
     parser.add_argument('--exclude_nodes', metavar='exclude_nodes', nargs='?',
                         type=str, help='Exclude nodes from calculation. Useful when'
-                                       'considering nodes that have MIGs enabled')
+                                       'considering nodes that have MIGs enabled. '
+                                       'Hostlists (node[01-03]) and globs (dgx*) '
+                                       'are allowed')
+    parser.add_argument('--include_nodes', metavar='include_nodes', nargs='?',
+                        type=str, help='Only keep jobs that ran entirely on these '
+                                       'nodes, same syntax as --exclude_nodes')
     parser.add_argument('--plot_title', metavar='plottitle', nargs='?',
                         type=str, help='Set title of plot')
     parser.add_argument('--hourinterval', metavar='hourinterval', nargs='?',
                         help='Time interval in h, only valid for time-series',
                         type=str )
+    parser.add_argument('--query', action='store_true',
+                        help='Print gpu / cpu time allocated per user between '
+                             '--start and --end instead of plotting')
+    parser.add_argument('--curve', metavar='path/to/curve.npz', nargs='?',
+                        type=str, help='Allocation curve used by --query. Loaded '
+                             'if it exists, otherwise built from --path and saved')
+    parser.add_argument('--usage_table', metavar='path/to/usage.csv', nargs='?',
+                        type=str, help='With --plot_type pie, also write the cpu / '
+                                       'gpu time of every user to a csv')
+    parser.add_argument('--peaks', action='store_true',
+                        help='Print peak / mean concurrent gpus, cpus, jobs and '
+                             'busy nodes between --start and --end instead of '
+                             'plotting')
+    parser.add_argument('--column', metavar='gpus|cpus|jobs|nodes', type=str,
+                        default='gpus', help='Allocation shown by --plot_type '
+                                             'occupancy, default gpus')
+    parser.add_argument('--chunksize', metavar='nrows', nargs='?', type=int,
+                        help='Stream --path in chunks of this many rows to bound '
+                             'memory on very large sacct files')
+    parser.add_argument('--nproc', metavar='nproc', nargs='?', type=int,
+                        help='Processes reading many --path dumps, default is '
+                             'all cores')
     args = parser.parse_args()
     path = args.path
     users = args.users
@@ -117,13 +167,6 @@ def main():
         totalutil = None
     engine = args.engine
     title = args.plot_title
-    if args.exclude_nodes is not None :
-        if('[' in args.exclude_nodes or ']' in args.exclude_nodes or
-           '-' in args.exclude_nodes):
-            raise ValueError("ERROR!!! You must write the full name of each node")
-        excludenodeL = args.exclude_nodes.split(',')
-    else :
-        excludenodeL = None
     if engine is None :
         engine = 'matplotlib'
     mintime = datetime.datetime.strptime(args.start, "%Y-%m-%dT%H:%M:%S")
@@ -141,42 +184,61 @@ def main():
     ngpupernode = 8
     ncpupernode = 224       # Threads in case of multithreading
 
+    # Answer from a previously saved curve, skips parsing entirely
+    if args.query is True and args.curve is not None and os.path.exists(args.curve):
+        curve = AllocationCurve.load(args.curve)
+        (includenodeL, excludenodeL) = select_nodes(curve.includenodeL +
+                                                    curve.excludenodeL,
+                                                    args.include_nodes,
+                                                    args.exclude_nodes)
+        if (sorted(curve.excludenodeL) != sorted(excludenodeL) or
+            sorted(curve.includenodeL) != sorted(includenodeL)):
+            raise ValueError("ERROR!!! {} was built including {} and excluding {}, "
+                             "rebuild it or match --include_nodes / "
+                             "--exclude_nodes".format(args.curve,
+                             curve.includenodeL, curve.excludenodeL))
+        if len(includenodeL) > 0:
+            nnodes = len(includenodeL)
+        else:
+            nnodes = nnodes - len(excludenodeL)
+        print_allocation_query(curve, mintime, maxtime,
+                               walltime * nnodes * ngpupernode,
+                               walltime * nnodes * ncpupernode)
+        sys.stdout.flush()
+        sys.exit(0)
+
     #df = pd.read_csv(path, sep='|')
-    (_, _, jobL, starttime, endtime) = parse_sacct_file(path=path)
+    if args.store is not None:
+        (_, _, jobtable, starttime, endtime) = parse_sacct_table(df=read_sacct_store(args.store))
+    else:
+        (_, _, jobtable, starttime, endtime) = parse_sacct_table(path=path,
+                                                              chunksize=args.chunksize,
+                                                              nproc=args.nproc)
 
-    # Exclude nodes...
-    if excludenodeL is not None :
-        idx=0
-        subsetL = []
-        includednodeL = []
-        for job in jobL :
-            keep = True
-            for node in excludenodeL :
-                if node in job.nodelist :
-                    keep = False
-                    break
-            if keep is True :
-                idx += 1
-                subsetL.append(job)
-                # Handle lists of differing length
-                if len(job.nodelist) == 1 :
-                    includednodeL.append(job.nodelist[0])
-                elif len(job.nodelist) > 1 :
-                    includednodeL.extend(job.nodelist)
-                else :
-                    raise ValueError("ERROR!! Invalid job.nodelist "
-                                     "{}".format(job.nodelist))
-        #includednodeL = list(itertools.chain.from_iterable(includednodeL))
+    # Include / exclude nodes, one mask over the node ids of every job
+    (includenodeL, excludenodeL) = select_nodes(jobtable.nodenameL,
+                                                args.include_nodes,
+                                                args.exclude_nodes)
+    if args.include_nodes is not None and len(includenodeL) == 0:
+        raise ValueError("ERROR!!! --include_nodes {} matches no "
+                         "nodes".format(args.include_nodes))
+    if len(includenodeL) > 0 or len(excludenodeL) > 0:
+        keepV = jobtable.node_filter(includenodeL, excludenodeL)
+        subtable = jobtable[keepV]
         print("Included Nodes : ")
-        for node in sorted(set(includednodeL)):
+        for node in sorted(set(subtable.nodenameL[i] for i in
+                               np.unique(subtable.nodeidxV))):
             print("\t{}".format(node))
         print("Excluded Nodes : ")
         for node in excludenodeL:
             print("\t{}".format(node))
-        print("Originally had {} jobs".format(len(jobL)))
-        print("Now have {} jobs\n".format(len(subsetL)))
-        jobL = subsetL
-        nnodes = nnodes - len(excludenodeL)
+        print("Originally had {} jobs".format(len(jobtable)))
+        print("Now have {} jobs\n".format(len(subtable)))
+        jobtable = subtable
+        if len(includenodeL) > 0:
+            nnodes = len(includenodeL)
+        else:
+            nnodes = nnodes - len(excludenodeL)
 
     ### Diagnostics, ensure we rm'd excluded notes
     # tmpL=[]
@@ -194,45 +256,46 @@ def main():
     print("ncpupernode = {}".format(ncpupernode))
 
 
-    # total time avail
-    if plottype == 'pie':
-        ## Extract by user
-        userL = []
-        usernameL = np.unique([job.user for job in jobL])
-        for username in usernameL:
-            njob = 0
-            cputimeraw = 0
-            gputimeraw = 0
-            # Extracts ANY job that has ANY part fall w/in the [mintime, maxtime]
-            for job in jobL:
-                if username == job.user:
-                    inrange,overlap = is_job_in_time_range(job, mintime, maxtime)
-                    if inrange is True and job.elapsedraw > 0:
-                        njob += 1
-                        #print("{} {} {} {} {}".format(job.user, job.jobid,
-                        #      overlap.seconds, job.cputimeraw, job.elapsedraw))
-                        cputimeraw += (job.cputimeraw * overlap.total_seconds() /
-                                       job.elapsedraw)
-                        gputimeraw += (job.gputimeraw * overlap.total_seconds() /
-                                       job.elapsedraw)
-            user = User(name=username, njobs=njob, cputimeraw=cputimeraw,
-                        gputimeraw=gputimeraw)
-            userL.append(user)
+    if args.query is True:
+        curve = AllocationCurve.from_table(jobtable, excludenodeL, includenodeL)
+        if args.curve is not None:
+            curve.save(args.curve)
+            print("Wrote {}".format(args.curve))
+        print_allocation_query(curve, mintime, maxtime,
+                               walltime * nnodes * ngpupernode,
+                               walltime * nnodes * ncpupernode)
 
-        # Sort by GPU usage
-        userbygpuL = sorted(userL, key=operator.attrgetter('gputimeraw'), reverse=True)
-        userbycpuL = sorted(userL, key=operator.attrgetter('cputimeraw'), reverse=True)
+    elif args.peaks is True or plottype == 'occupancy':
+        if args.column not in ['gpus', 'cpus', 'jobs', 'nodes']:
+            raise ValueError("ERROR!! Invalid value ({}) for --column".format(args.column))
+        # Still RUNNING jobs are taken to run until the last time in the dump
+        timeline = OccupancyTimeline.from_table(jobtable, endtime, excludenodeL,
+                                                includenodeL)
+        capacityD = {'gpus' : nnodes * ngpupernode, 'cpus' : nnodes * ncpupernode,
+                     'nodes' : nnodes}
+        if args.peaks is True:
+            print_peak_query(timeline, mintime, maxtime, capacityD)
+        else:
+            plot_occupancy_mpl(timeline=timeline, start=mintime, end=maxtime,
+                               interval=3600 * hourinterval, column=args.column,
+                               capacity=capacityD.get(args.column), title=title)
+
+    # total time avail
+    elif plottype == 'pie':
+        ## Extract by user, ANY job that has ANY part fall w/in the [mintime, maxtime]
+        usagedf = user_usage_table(jobtable, mintime, maxtime)
+        if args.usage_table is not None:
+            usagedf.to_csv(args.usage_table)
+            print("Wrote {}".format(args.usage_table))
 
         #### CPU
-        usertimeL = [user.cputimeraw for user in userbycpuL]
-        usernameL = [user.name for user in userbycpuL]
+        (usernameL, usertimeL) = sort_user_usage(usagedf, 'cputimeraw')
         totalsystemcputime = walltime * nnodes * ncpupernode
         colorD = make_pie(sortedtimeL = usertimeL, sortednameL = usernameL,
                           totalsystime=totalsystemcputime, title="CPU")
 
         #### GPU
-        usertimeL = [user.gputimeraw for user in userbygpuL]
-        usernameL = [user.name for user in userbygpuL]
+        (usernameL, usertimeL) = sort_user_usage(usagedf, 'gputimeraw')
         totalsystemgputime = walltime * nnodes * ngpupernode
         if engine == 'plotly':
             raise NotImplementedError("ERROR!! No plotly pie charts enabled yet")
@@ -248,12 +311,12 @@ def main():
         if users is None:
             raise ValueError("ERROR!! Please specify which users to plot")
         if engine == 'matplotlib':
-            plot_time_series_mpl(jobL=jobL, start=mintime, end=maxtime,
+            plot_time_series_mpl(jobL=jobtable, start=mintime, end=maxtime,
                              interval=interval, cpuorgpu='gpu',
                              totalsystime=totaltimeperinterval, users=users,
                              totalutil = totalutil, title=title)
         elif engine == 'plotly' :
-            plot_time_series_plotly(jobL=jobL, start=mintime, end=maxtime,
+            plot_time_series_plotly(jobL=jobtable, start=mintime, end=maxtime,
                              interval=interval, cpuorgpu='gpu',
                              totalsystime=totaltimeperinterval, users=users)
         else:
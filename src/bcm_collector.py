@@ -0,0 +1,336 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Dump the gpu utilization series from BCM concurrently, the serial loop in
+#      collect_data.sh runs ~750 cmsh calls one after the other
+#   2. Only request data newer than what is already on disk
+#   3. Discover the nodes and gpus instead of hardcoding them
+#
+# Refs :
+#   a) Base View admin manual, section 12.6, dumpmonitoringdata
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Every series is a text file named like collect_data.sh names it, i.e. what
+# gpu_util_manifest() reads. Its high-water mark is the time of its last data
+# line. The next dump starts at that time, the samples at or after it are
+# replaced by the new ones and everything before is kept, so BCM dropping old
+# telemetry doesn't drop it here.
+#
+import os
+import re
+import time
+import subprocess
+import concurrent.futures
+from typing import Dict,List
+from classes import from_epoch
+from classes import util_line_time
+from classes import util_file_region
+from classes import read_util_file
+from functions import UTIL_RESOLUTIONS
+from hostlist import resolve_nodes
+
+# resolution : (--consolidationinterval, lookback of the first dump)
+COLLECT_RESOLUTIONS = {'2min' : (None, '-7d'), '1h' : ('1h', '-365d'),
+                       '1d' : ('1d', '-365d')}
+# Suffix of the per gpu files, the raw ones are named after the 10s sampling
+GPU_FILE_SUFFIX = {'2min' : '10s', '1h' : '1h', '1d' : '1d'}
+# Time format of dumpmonitoringdata start times
+CMSH_TIME_FORMAT = "%Y/%m/%d %H:%M:%S"
+# Measurable of the gpu utilization, one per gpu
+GPU_MEASURABLE = re.compile(r'\bgpu_utilization:gpu(\d+)\b')
+
+
+def run_cmsh(command : str = None, cmsh : str = 'cmsh', timeout : float = 600,
+             retries : int = 3, backoff : float = 2.0, check = None) -> str :
+    """Run `cmsh -c command`, retrying with exponential backoff
+
+    Args
+        command = cmsh command, e.g. 'device; list'
+        cmsh    = cmsh executable
+        timeout = s before a call is killed
+        retries = calls after the first one fails
+        backoff = s to wait after the first failure, doubled after each one
+        check   = optional function of the output, raises ValueError if the
+                  output is bad (cmsh can exit 0 after printing an error)
+
+    Returns
+        stdout of the first successful call
+
+    Raises
+        ValueError if every call failed, with the last error
+    """
+    for attempt in range(retries + 1):
+        try:
+            proc = subprocess.run([cmsh, '-c', command], capture_output=True,
+                                  text=True, timeout=timeout)
+            if proc.returncode != 0:
+                raise ValueError("exit {} : {}".format(proc.returncode,
+                                 proc.stderr.strip()))
+            if check is not None:
+                check(proc.stdout)
+            return proc.stdout
+        except (ValueError, OSError, subprocess.TimeoutExpired) as err:
+            error = err
+        if attempt < retries:
+            time.sleep(backoff * 2**attempt)
+    raise ValueError("ERROR!!! `{} -c \"{}\"` failed {} times, last : {}".format(
+                     cmsh, command, retries + 1, error))
+
+
+def discover_nodes(cmshD : Dict = None) -> List[str] :
+    """Nodes known to BCM, from `device; list`, the head node(s) excluded
+
+    Args
+        cmshD = keyword arguments of run_cmsh(), e.g. cmsh, timeout, retries
+
+    Returns
+        sorted node names
+
+    Raises
+        ValueError if cmsh fails
+    """
+    nodeL = []
+    for line in run_cmsh('device; list', **cmshD).splitlines():
+        fieldL = line.split()
+        if len(fieldL) >= 2 and fieldL[0].endswith('Node') and fieldL[0] != 'HeadNode':
+            nodeL.append(fieldL[1])
+    return sorted(nodeL)
+
+
+def discover_gpus(node : str = None, cmshD : Dict = None) -> List[int] :
+    """Gpu indices of node, from its gpu_utilization:gpu<N> measurables
+
+    Args
+        node  = node name
+        cmshD = keyword arguments of run_cmsh()
+
+    Returns
+        sorted gpu indices, [] for nodes without gpus
+
+    Raises
+        ValueError if cmsh fails
+    """
+    output = run_cmsh("device; use {}; measurables".format(node), **cmshD)
+    return sorted(set(int(gidx) for gidx in GPU_MEASURABLE.findall(output)))
+
+
+def util_file_high_water(path : str = None) -> int :
+    """Time of the last data line of a dumpmonitoringdata file
+
+    Args
+        path = path to file
+
+    Returns
+        s since EPOCH, None if the file doesn't exist or has no data
+
+    Raises
+        ValueError if the last line can't be parsed
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as fin:
+        size = os.fstat(fin.fileno()).st_size
+        chunk = 4096
+        while True:
+            fin.seek(max(0, size - chunk))
+            lineL = [line for line in fin.read().splitlines()
+                     if line.strip() != b'' and line[:1] != b'#']
+            # The first line may be cut unless the whole file was read
+            if len(lineL) > 1 or chunk >= size:
+                break
+            chunk *= 2
+    if len(lineL) == 0:
+        return None
+    return util_line_time(lineL[-1], path)
+
+
+def collect_plan(outdir : str = None, gpuD : Dict = None,
+                 resolutionL : List[str] = None) -> List[Dict] :
+    """The series to dump
+
+    Args
+        outdir      = directory of the text files
+        gpuD        = {node : [gidx]}
+        resolutionL = subset of UTIL_RESOLUTIONS, None is all of them
+
+    Returns
+        list of dict with path (file of the series), command (dumpmonitoringdata
+        with a {since} placeholder) and lookback (since of the first dump)
+
+    Raises
+        ValueError if a resolution is unknown
+    """
+    planL = []
+    for resolution in (UTIL_RESOLUTIONS if resolutionL is None else resolutionL):
+        if resolution not in COLLECT_RESOLUTIONS:
+            raise ValueError("ERROR!!! Invalid resolution {}, expected one of "
+                             "{}".format(resolution, UTIL_RESOLUTIONS))
+        (interval, lookback) = COLLECT_RESOLUTIONS[resolution]
+        option = "" if interval is None else "--consolidationinterval {} ".format(interval)
+        for node in sorted(gpuD):
+            for gidx in gpuD[node]:
+                planL.append({'path' : os.path.join(outdir,
+                                "{}_gpuutil_gpu{}_{}.txt".format(node, gidx,
+                                GPU_FILE_SUFFIX[resolution])),
+                              'command' : "device; dumpmonitoringdata {}{{since}} now "
+                                          "gpu_utilization:gpu{} -n {}".format(
+                                          option, gidx, node),
+                              'lookback' : lookback})
+        planL.append({'path' : os.path.join(outdir,
+                                 "totalgpuutilization_{}.txt".format(resolution)),
+                      'command' : "partition; dumpmonitoringdata {}{{since}} now "
+                                  "totalgpuutilization".format(option),
+                      'lookback' : lookback})
+    return planL
+
+
+def merge_dump(path : str = None, newpath : str = None) -> int :
+    """Atomically replace the samples of path at or after the first sample of
+       newpath by the samples of newpath
+
+    Args
+        path    = archived series, may not exist yet
+        newpath = output of a dump, parsed by read_util_file()
+
+    Returns
+        number of samples in newpath
+
+    Raises
+        ValueError if newpath can't be parsed
+    """
+    (timeV, utilV, headerL) = read_util_file(newpath)
+    if timeV.shape[0] == 0:
+        return 0
+    tmppath = "{}.tmp{}".format(path, os.getpid())
+    with open(newpath, 'rb') as fnew, open(tmppath, 'wb') as fout:
+        if os.path.isfile(path):
+            # Keep the old header and the lines before the new data
+            with open(path, 'rb') as fold:
+                datastart = 0
+                for line in fold:
+                    if line[:1] != b'#':
+                        break
+                    datastart += len(line)
+                cut = util_file_region(fold, datastart, os.fstat(fold.fileno()).st_size,
+                                       int(timeV[0]), path)
+                fold.seek(0)
+                keep = fold.read(cut)
+            fout.write(keep)
+            if keep[-1:] not in (b'', b'\n'):
+                fout.write(b'\n')
+            for line in fnew:
+                if line[:1] != b'#' and line.strip() != b'':
+                    fout.write(line)
+        else:
+            fout.write(fnew.read())
+    os.replace(tmppath, path)
+    return int(timeV.shape[0])
+
+
+def collect_series(entry : Dict = None, cmshD : Dict = None) -> int :
+    """Dump one series of collect_plan() from its high-water mark on
+
+    Args
+        entry = element of collect_plan()
+        cmshD = keyword arguments of run_cmsh()
+
+    Returns
+        number of samples dumped
+
+    Raises
+        ValueError if cmsh fails or its output can't be parsed
+    """
+    path = entry['path']
+    highwater = util_file_high_water(path)
+    if highwater is None:
+        since = entry['lookback']
+    else:
+        since = '"{}"'.format(from_epoch(highwater).strftime(CMSH_TIME_FORMAT))
+    newpath = "{}.new{}".format(path, os.getpid())
+
+    def check(output):
+        with open(newpath, 'w') as fout:
+            fout.write(output)
+        read_util_file(newpath)
+
+    try:
+        run_cmsh(entry['command'].format(since=since), check=check, **cmshD)
+        return merge_dump(path, newpath)
+    finally:
+        if os.path.isfile(newpath):
+            os.remove(newpath)
+
+
+def collect_gpu_util(outdir : str = None, nodeS : str = None,
+                     excludenodeS : str = None, ngpu : int = None,
+                     resolutionL : List[str] = None, nworker : int = 8,
+                     cmshD : Dict = None) -> Dict :
+    """Dump every gpu utilization series into outdir with at most nworker cmsh
+       calls at a time
+
+    Args
+        outdir       = directory of the text files, created if needed
+        nodeS        = node patterns, see hostlist.resolve_nodes(). Globs (or
+                       None, all nodes) need `device; list`
+        excludenodeS = node patterns to skip
+        ngpu         = gpus per node, None discovers them per node
+        resolutionL  = subset of UTIL_RESOLUTIONS, None is all of them
+        nworker      = concurrent cmsh calls, keep it low on the head node
+        cmshD        = keyword arguments of run_cmsh()
+
+    Returns
+        dict with the number of series, samples dumped and the list of failed
+        series (as error messages). A failure leaves the file of its series as
+        it was.
+
+    Raises
+        ValueError if the nodes can't be listed
+    """
+    cmshD = dict() if cmshD is None else cmshD
+    os.makedirs(outdir, exist_ok=True)
+    if nodeS is None or '*' in nodeS or '?' in nodeS:
+        knownL = discover_nodes(cmshD)
+        nodeL = knownL if nodeS is None else resolve_nodes(nodeS, knownL)
+    else:
+        nodeL = resolve_nodes(nodeS, [])
+    if excludenodeS is not None:
+        excludeD = set(resolve_nodes(excludenodeS, nodeL))
+        nodeL = [node for node in nodeL if node not in excludeD]
+    failedL = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=nworker) as pool:
+        if ngpu is None:
+            futureD = {node : pool.submit(discover_gpus, node, cmshD) for node in nodeL}
+            gpuD = dict()
+            for node, future in futureD.items():
+                try:
+                    gidxL = future.result()
+                except ValueError as err:
+                    failedL.append(str(err))
+                    continue
+                if len(gidxL) > 0:
+                    gpuD[node] = gidxL
+        else:
+            gpuD = {node : list(range(ngpu)) for node in nodeL}
+        planL = collect_plan(outdir, gpuD, resolutionL)
+        futureL = [pool.submit(collect_series, entry, cmshD) for entry in planL]
+        nsample = 0
+        for future in futureL:
+            try:
+                nsample += future.result()
+            except ValueError as err:
+                failedL.append(str(err))
+    return {'series' : len(planL), 'samples' : nsample, 'failedL' : failedL}
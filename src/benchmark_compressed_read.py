@@ -0,0 +1,140 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Compare reading plain vs gzip / xz / zstd compressed sacct and gpu
+#      utilization files, and project it onto a share with limited bandwidth
+#
+# Refs :
+#   a) compressed_io.py
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import os
+import sys
+import gzip
+import lzma
+import time
+import shutil
+import argparse
+import datetime
+import tempfile
+import numpy as np
+from classes import read_util_file
+from functions import read_sacct_frame
+from compressed_io import zstandard
+from benchmark_parse_sacct_file import write_fake_sacct
+
+
+# Run via
+#   python src/benchmark_compressed_read.py --nsample 500000 --njob 50000 --bandwidth 100
+# The files sit in the page cache, so 'time (s)' is the cpu cost. On a share
+# that delivers --bandwidth MB/s reading the bytes costs size / bandwidth on top.
+def write_fake_util(path : str = None, nsample : int = None):
+    """Write a dumpmonitoringdata like file with nsample 10s samples
+
+    Args
+        path    = output path
+        nsample = number of samples
+
+    Returns
+
+    Raises
+
+    """
+    rng = np.random.default_rng(42)
+    begin = datetime.datetime(2024, 11, 1)
+    utilV = rng.integers(0, 101, nsample)
+    with open(path, 'w') as fout:
+        fout.write("# Start time : Nov 01 00:00:00 2024\n")
+        for i in range(nsample):
+            date = begin + datetime.timedelta(seconds=10 * i)
+            fout.write("{}.250  {}%\n".format(date.strftime("%Y/%m/%d %H:%M:%S"),
+                                             utilV[i]))
+
+
+def compress(path : str = None, suffix : str = None) -> str :
+    """Compress path to path + suffix, returns the new path"""
+    outpath = path + suffix
+    with open(path, 'rb') as fin:
+        if suffix == '.zst':
+            with open(outpath, 'wb') as fout:
+                zstandard.ZstdCompressor().copy_stream(fin, fout)
+        else:
+            opener = gzip.open if suffix == '.gz' else lzma.open
+            with opener(outpath, 'wb') as fout:
+                shutil.copyfileobj(fin, fout)
+    return outpath
+
+
+def main():
+    """Times read_util_file() and read_sacct_frame() on plain and compressed
+       copies of the same file
+
+    Args
+
+        N/A
+
+    Returns
+
+    Raises
+
+    """
+    parser = argparse.ArgumentParser(
+                    description="Benchmark reading compressed inputs")
+    parser.add_argument('--nsample', metavar='nsample', type=int, default=500000,
+                        help='Samples in the utilization file')
+    parser.add_argument('--njob', metavar='njob', type=int, default=50000,
+                        help='Jobs in the sacct file')
+    parser.add_argument('--bandwidth', metavar='MB/s', type=float, default=100,
+                        help='Read bandwidth of the share to project onto')
+    parser.add_argument('--repeat', metavar='repeat', type=int, default=3,
+                        help='Best of this many reads')
+    args = parser.parse_args()
+
+    suffixL = ['', '.gz', '.xz'] + ([] if zstandard is None else ['.zst'])
+    readerD = {'util' : lambda path : read_util_file(path),
+               'sacct' : lambda path : read_sacct_frame(path, cache=False)}
+    print("{:>6} {:>6} {:>10} {:>7} {:>10} {:>10} {:>12}".format(
+          "file", "codec", "size (MB)", "ratio", "time (s)", "MB/s", "share (s)"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, reader in readerD.items():
+            path = os.path.join(tmpdir, name)
+            if name == 'util':
+                write_fake_util(path, args.nsample)
+            else:
+                write_fake_sacct(path, args.njob)
+            plainsize = os.path.getsize(path)
+            for suffix in suffixL:
+                cpath = path if suffix == '' else compress(path, suffix)
+                size = os.path.getsize(cpath)
+                dtL = []
+                for i in range(args.repeat):
+                    t0 = time.perf_counter()
+                    reader(cpath)
+                    dtL.append(time.perf_counter() - t0)
+                dt = min(dtL)
+                # Throughput in plain MB, share time adds moving the bytes
+                print("{:>6} {:>6} {:>10.2f} {:>7.1f} {:>10.3f} {:>10.1f} {:>12.3f}".format(
+                      name, suffix.lstrip('.') or 'plain', size / 1024**2,
+                      plainsize / size, dt, plainsize / 1024**2 / dt,
+                      dt + size / 1024**2 / args.bandwidth))
+    sys.stdout.flush()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,122 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Show that parse_sacct_file() scales linearly with the number of rows
+#
+# Refs :
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import os
+import sys
+import time
+import random
+import argparse
+import datetime
+import tempfile
+from functions import parse_sacct_file
+
+
+# Run via
+#   python src/benchmark_parse_sacct_file.py --njobs 1000,2000,4000,8000,16000
+def write_fake_sacct(path : str = None, njob : int = None):
+    """Write a sacct file with njob jobs, each with a toplevel, .batch, .extern
+       and .0 entry.  Mimics `sacct -P --format=jobidraw,...`
+
+    Args
+        path = output path
+        njob = number of jobs
+
+    Returns
+        number of rows written
+
+    Raises
+
+    """
+    random.seed(42)
+    begin = datetime.datetime(2024,10,1)
+    userL = ['bill', 'anna', 'ryan', 'maggie']
+    header = ("JobIDRaw|JobName|User|NodeList|ElapsedRaw|AllocCPUS|CPUTimeRAW|"
+              "MaxRSS|State|Start|End|ReqTRES\n")
+    nrow = 0
+    with open(path, 'w') as fout:
+        fout.write(header)
+        for jobid in range(1, njob+1):
+            start = begin + datetime.timedelta(seconds=random.randint(0, 2592000))
+            elapsed = random.randint(0, 86400)
+            end = start + datetime.timedelta(seconds=elapsed)
+            ncpu = random.randint(1, 32)
+            ngpu = random.randint(0, 8)
+            node = "node{:02d}".format(random.randint(1, 31))
+            startstr = start.strftime("%Y-%m-%dT%H:%M:%S")
+            endstr = end.strftime("%Y-%m-%dT%H:%M:%S")
+            reqtres = "billing={},cpu={},gres/gpu={},mem=2063937M,node=1".format(
+                      ncpu, ncpu, ngpu)
+            fout.write("{}|stuff|{}|{}|{}|{}|{}||COMPLETED|{}|{}|{}\n".format(
+                       jobid, random.choice(userL), node, elapsed, ncpu,
+                       ncpu*elapsed, startstr, endstr, reqtres))
+            for step in ['batch', 'extern', '0']:
+                fout.write("{}.{}|{}||{}|{}|{}|{}|1000K|COMPLETED|{}|{}|\n".format(
+                           jobid, step, step, node, elapsed, ncpu, ncpu*elapsed,
+                           startstr, endstr))
+            nrow += 4
+    return nrow
+
+
+def main():
+    """Times parse_sacct_file() on increasingly large files
+
+    Args
+
+        N/A
+
+    Returns
+
+    Raises
+
+    """
+    parser = argparse.ArgumentParser(
+                    description="Benchmark parse_sacct_file() scaling")
+    parser.add_argument('--njobs', metavar='1000,2000,4000', type=str,
+                        default='1000,2000,4000,8000,16000',
+                        help='Comma separated list of number of jobs per file')
+    args = parser.parse_args()
+    njobL = [int(n) for n in args.njobs.split(',')]
+
+    print("{:>10} {:>10} {:>10} {:>12}".format("njob", "nrow", "time (s)",
+                                               "us / row"))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for njob in njobL:
+            path = os.path.join(tmpdir, "sacct_{}".format(njob))
+            nrow = write_fake_sacct(path=path, njob=njob)
+            # parse_sacct_file() prints, keep the table readable
+            stdout = sys.stdout
+            sys.stdout = open(os.devnull, 'w')
+            t0 = time.perf_counter()
+            parse_sacct_file(path=path)
+            dt = time.perf_counter() - t0
+            sys.stdout.close()
+            sys.stdout = stdout
+            print("{:>10} {:>10} {:>10.3f} {:>12.2f}".format(njob, nrow, dt,
+                                                              dt / nrow * 10**6))
+    # Linear scaling <=> 'us / row' stays ~constant as nrow grows
+    sys.stdout.flush()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -26,11 +26,177 @@ import math
 import random
 import argparse
 import datetime
+import functools
+import io
 import numpy as np
 import pandas as pd
 from typing import List
 from bisect import bisect_left
 from collections import OrderedDict
+from hostlist import expand_hostlist
+from compressed_io import compression_of,open_input
+
+
+# Naive datetimes from sacct are treated as if they were UTC. Only differences
+# matter, so this keeps the conversion symmetric and cheap
+EPOCH = datetime.datetime(1970, 1, 1)
+# Sentinel for start / end times that are 'None' / 'Unknown' (e.g. RUNNING jobs)
+UNKNOWN_TIME = -1
+# Format of the dates in dumpmonitoringdata output, time of day follows as HH:MM:SS.fff
+UTIL_DATE_FORMAT = "%Y/%m/%d"
+# Max number of gpu utilization series kept in memory by load_util_series()
+UTIL_CACHE_SIZE = 256
+# Jumps between samples longer than this many periods are reported as gaps
+GAP_PERIODS = 2
+
+
+def to_epoch(date : datetime.datetime = None) -> int :
+    """Convert naive datetime to integer seconds since EPOCH
+
+    Args :
+        date : datetime or None
+
+    Returns :
+        int seconds, UNKNOWN_TIME if date is None
+
+    Raises :
+
+    """
+    if date is None:
+        return UNKNOWN_TIME
+    return int((date - EPOCH).total_seconds())
+
+
+def from_epoch(seconds : int = None) -> datetime.datetime :
+    """Convert integer seconds since EPOCH back to a naive datetime
+
+    Args :
+        seconds : int seconds since EPOCH, UNKNOWN_TIME maps to None
+
+    Returns :
+        datetime or None
+
+    Raises :
+
+    """
+    if seconds == UNKNOWN_TIME:
+        return None
+    return EPOCH + datetime.timedelta(seconds=int(seconds))
+
+
+def time_grid(start : datetime.datetime = None, end : datetime.datetime = None,
+              interval : float = None):
+    """Fixed width bins [start + k*interval, start + (k+1)*interval) for every k
+       with start + k*interval <= end. Shared by bin_job_overlap(),
+       resample_util() and OccupancyTimeline.heatmap() s.t. allocation and
+       utilization have the same x-axis.
+
+    Args :
+        start    : start of first interval
+        end      : last interval starts at or before end
+        interval : width of interval in s
+
+    Returns :
+        edgeV : float64 s since EPOCH, nbin + 1 edges
+        midV  : pd.DatetimeIndex of the mid point of each bin
+
+    Raises :
+        ValueError if interval isn't positive or end < start
+    """
+    if interval is None or interval <= 0 or end < start:
+        raise ValueError("ERROR!!! Invalid grid {} -> {} every {}s".format(start, end,
+                         interval))
+    delta = datetime.timedelta(seconds=interval)
+    nbin  = int((end - start) // delta) + 1
+    width = delta.total_seconds()
+    edgeV = (start - EPOCH).total_seconds() + np.arange(nbin + 1) * width
+    midV  = pd.DatetimeIndex(start + pd.to_timedelta((np.arange(nbin) + 0.5) * width,
+                                                     unit='s'))
+    return(edgeV, midV)
+
+
+def expand_nodelist(nodelist : str = None) -> List[str] :
+    """Expand a Slurm nodelist, e.g. node[06-08,13] -> [node06,node07,node08,node13]
+
+    Args :
+        nodelist : nodelist from sacct
+
+    Returns :
+        list of node names, see hostlist.expand_hostlist()
+
+    Raises :
+        ValueError if the nodelist is malformed
+    """
+    return expand_hostlist(nodelist)
+
+
+# Multiplier that converts a MaxRSS suffix to K
+MAXRSS_TO_KB = {'k' : 1, 'm' : 1024, 'g' : 1024**2, 't' : 1024**3}
+# Multiplier that converts a ReqTRES mem suffix to GB
+TRESMEM_TO_GB = {'K' : 1 / 1024**2, 'M' : 1 / 1024, 'G' : 1, 'T' : 1024}
+
+
+def maxrss_to_kb(maxrss : str = None) -> float :
+    """Convert a sacct MaxRSS, e.g. 10M, to K
+
+    Args :
+        maxrss : MaxRSS from sacct, may be empty
+
+    Returns :
+        float K or None if maxrss is empty
+
+    Raises :
+        ValueError if maxrss has no K/M/G/T suffix
+    """
+    if maxrss is None or len(maxrss) == 0:
+        return None
+    unit = maxrss[-1].lower()
+    if unit not in MAXRSS_TO_KB:
+        raise ValueError("ERROR!!! Invalid value ({}) for maxrss".format(maxrss))
+    return float(maxrss[:-1]) * MAXRSS_TO_KB[unit]
+
+
+def parse_reqtres(reqtres : str = None) -> dict :
+    """Split a sacct ReqTRES, e.g. billing=2,cpu=2,gres/gpu=1,mem=10G,node=1
+
+    Args :
+        reqtres : ReqTRES from sacct
+
+    Returns :
+        dict with the keys 'billing', 'cpu', 'gpu', 'memgb' and 'node' that are
+        present in reqtres
+
+    Raises :
+        ValueError if mem has unexpected units
+    """
+    tresD = dict()
+    for substr in reqtres.split(','):
+        tresL = substr.split('=')
+        if tresL[0] == 'billing':
+            tresD['billing'] = int(tresL[1])
+        # It is very hard to understand exactly how reqtrescpu is calculated
+        # $ srun --nodes=2 --ntasks-per-node=8 --gpus-per-node=8 --cpus-per-gpu=6
+        #        --pty bash
+        # Yields alloccpus=96, but reqtres = billing=16,cpu=16,gres/gpu=16
+        #
+        # $ srun --nodes=2 --ntasks-per-node=8 --gpus-per-node=8 --cpus-per-task=6
+        #        --pty bash
+        # Yields alloccpus=96, but reqtres = billing=96,cpu=96,gres/gpu=16
+        #
+        # Clearly reqtrescpu is fickle in interpretting, I don't understand why
+        # two ostensibly identical jobs, yielded different reqtres cpu
+        if tresL[0] == 'cpu':
+            tresD['cpu'] = int(tresL[1])
+        if tresL[0] == 'gres/gpu':
+            tresD['gpu'] = int(tresL[1])
+        if tresL[0] == 'mem':
+            unit = tresL[1][-1]
+            if unit not in TRESMEM_TO_GB:
+                raise ValueError("ERROR!! Unexpected memory units in tres : {}".format(tresL[1]))
+            tresD['memgb'] = float(tresL[1][:-1]) * TRESMEM_TO_GB[unit]
+        if tresL[0] == 'node':
+            tresD['node'] = int(tresL[1])
+    return tresD
 
 
 class SacctObj :
@@ -63,26 +229,7 @@ class SacctObj :
         """
         self.jobid    = jobid
         self.jobname  = jobname
-        self.nodelist = []
-        if '[' in nodelist:
-            stem = nodelist.split('[')[0]
-            nodes = nodelist.split('[')[1]
-            nodes = nodes.split(']')[0]
-            nodes = nodes.split(',')
-            # loop over node-ranges, like node[06-08,13,24-29]
-            for nr in nodes :
-                # handle cases like node[06-09]
-                if '-' in nr:
-                    minnode = nr.split('-')[0].lstrip("0")
-                    maxnode = nr.split('-')[1].lstrip("0")
-                    tmp = ["{}0{}".format(stem,i) if i < 10 else "{}{}".format(stem,i) for i in range(int(minnode),int(maxnode)+1)]
-                    self.nodelist.extend(tmp)
-                # handle cases like node[06]
-                else :
-                    tmp = "{}{}".format(stem,nr)
-                    self.nodelist.append(tmp)
-        else:
-            self.nodelist.append(nodelist)
+        self.nodelist = expand_nodelist(nodelist)
         if elapsedraw <= 10**-9 and Verbose is True :
             print("WARNING!!! Job {} has almost 0 elapsedraw time "
                   "{}".format(jobid, elapsedraw))
@@ -92,19 +239,8 @@ class SacctObj :
             raise ValueError("ERROR!!! cputimeraw={}, alloccpus*elapsedraw={}".format(
                              cputimeraw,alloccpus*elapsedraw))
         self.cputimeraw = cputimeraw
-        # MaxRSS
-        if maxrss is None or len(maxrss) == 0:
-            self.maxrss = None
-        elif 'k' in maxrss.lower():
-            self.maxrss = float(maxrss.lower().split('k')[0])
-        elif 'm' in maxrss.lower():
-            self.maxrss = float(maxrss.lower().split('m')[0])
-        elif 'g' in maxrss.lower():
-            self.maxrss = float(maxrss.lower().split('g')[0])
-        elif 't' in maxrss.lower():
-            self.maxrss = float(maxrss.lower().split('t')[0])
-        else:
-            raise ValueError("ERROR!!! Invalid value ({}) for maxrss".format(maxrss))
+        # MaxRSS, in K
+        self.maxrss = maxrss_to_kb(maxrss)
         # State
         if 'CANCELLED' in state:
             # Sometimes see things like 'CANCELLED by uid'
@@ -134,6 +270,43 @@ class SacctObj :
                                  "no sense".format(self.start,self.end))
 
 
+    @classmethod
+    def from_parsed(cls, jobid : str = None, jobname : str = None,
+                    nodelist : List[str] = None, elapsedraw : int = None,
+                    alloccpus : int = None, cputimeraw : int = None,
+                    maxrss : float = None, state : str = None,
+                    start : datetime.datetime = None, end : datetime.datetime = None):
+        """Build from fields that were already converted and validated in bulk,
+           see functions.sacct_frame_columns(). Skips all per row parsing.
+
+        Args :
+            nodelist    : expanded list of nodes
+            maxrss      : K or None
+            state       : with 'CANCELLED by uid' already mapped to 'CANCELLED'
+            start       : datetime or None
+            end         : datetime or None, None if RUNNING
+            (others same as __init__)
+
+        Returns :
+            SacctObj (or subclass)
+
+        Raises :
+
+        """
+        obj = cls.__new__(cls)
+        obj.jobid      = jobid
+        obj.jobname    = jobname
+        obj.nodelist   = nodelist
+        obj.elapsedraw = elapsedraw
+        obj.alloccpus  = alloccpus
+        obj.cputimeraw = cputimeraw
+        obj.maxrss     = maxrss
+        obj.state      = state
+        obj.start      = start
+        obj.end        = end
+        return obj
+
+
     # https://stackoverflow.com/a/47625174/4021436
     def as_dict(self):
         """Return self's variables as dictionary s.t. it can be easily converted to
@@ -194,46 +367,74 @@ class Job(SacctObj) :
         # Set these PRIOR to parsing reqtres in case no GPUs were present
         self.ngpu       = 0
         self.gputimeraw = 0
-        for substr in reqtres.split(','):
-            tresL = substr.split('=')
-            if tresL[0] == 'billing':
-                self.reqtresbilling = int(tresL[1])
-            # It is very hard to understand exactly how reqtrescpu is calculated
-            # $ srun --nodes=2 --ntasks-per-node=8 --gpus-per-node=8 --cpus-per-gpu=6
-            #        --pty bash
-            # Yields alloccpus=96, but reqtres = billing=16,cpu=16,gres/gpu=16
-            #
-            # $ srun --nodes=2 --ntasks-per-node=8 --gpus-per-node=8 --cpus-per-task=6
-            #        --pty bash
-            # Yields alloccpus=96, but reqtres = billing=96,cpu=96,gres/gpu=16
-            #
-            # Clearly reqtrescpu is fickle in interpretting, I don't understand why
-            # two ostensibly identical jobs, yielded different reqtres cpu
-            if tresL[0] == 'cpu':
-                self.reqtrescpu = int(tresL[1])
-            if tresL[0] == 'gres/gpu':
-                self.reqtresgpu = int(tresL[1])
-                self.ngpu       = int(tresL[1])
-                self.gputimeraw = self.ngpu * self.elapsedraw
-            if tresL[0] == 'mem':
-                if 'M' in tresL[1]:
-                    mem = float(tresL[1].split('M')[0]) / 1024
-                elif 'G' in tresL[1]:
-                    mem = float(tresL[1].split('G')[0])
-                elif 'T' in tresL[1]:
-                    mem = float(tresL[1].split('T')[0]) * 1024
-                elif 'K' in tresL[1]:
-                    mem = float(tresL[1].split('K')[0]) / 1024**2
-                else:
-                    raise ValueError("ERROR!! Unexpected memory units in tres : {}".format(tresL[1]))
-                self.reqtresmemgb = mem
-            if tresL[0] == 'node':
-                self.reqtresnode = int(tresL[1])
+        self.set_reqtres(parse_reqtres(reqtres))
         self.stepL = []
         self.externL = []
         self.batchL = []
 
 
+    @classmethod
+    def from_parsed(cls, jobid : str = None, jobname : str = None, user : str = None,
+                    nodelist : List[str] = None, elapsedraw : int = None,
+                    alloccpus : int = None, cputimeraw : int = None,
+                    maxrss : float = None, state : str = None,
+                    start : datetime.datetime = None, end : datetime.datetime = None,
+                    reqtres : str = None, tresD : dict = None):
+        """Build from fields that were already converted and validated in bulk,
+           see SacctObj.from_parsed()
+
+        Args :
+            tresD : parse_reqtres(reqtres), may be shared between jobs
+            (others same as SacctObj.from_parsed())
+
+        Returns :
+            Job
+
+        Raises :
+
+        """
+        obj = super().from_parsed(jobid = jobid, jobname = jobname,
+                                  nodelist = nodelist, elapsedraw = elapsedraw,
+                                  alloccpus = alloccpus, cputimeraw = cputimeraw,
+                                  maxrss = maxrss, state = state, start = start,
+                                  end = end)
+        obj.user       = user
+        obj.reqtres    = reqtres
+        obj.ngpu       = 0
+        obj.gputimeraw = 0
+        obj.set_reqtres(tresD)
+        obj.stepL = []
+        obj.externL = []
+        obj.batchL = []
+        return obj
+
+
+    def set_reqtres(self, tresD : dict = None):
+        """Set the reqtres* attributes (and ngpu, gputimeraw) that are present in
+           tresD
+
+        Args :
+            tresD : from parse_reqtres()
+
+        Returns :
+
+        Raises :
+
+        """
+        if 'billing' in tresD:
+            self.reqtresbilling = tresD['billing']
+        if 'cpu' in tresD:
+            self.reqtrescpu = tresD['cpu']
+        if 'gpu' in tresD:
+            self.reqtresgpu = tresD['gpu']
+            self.ngpu       = tresD['gpu']
+            self.gputimeraw = self.ngpu * self.elapsedraw
+        if 'memgb' in tresD:
+            self.reqtresmemgb = tresD['memgb']
+        if 'node' in tresD:
+            self.reqtresnode = tresD['node']
+
+
     # https://stackoverflow.com/a/47625174/4021436
     def as_dict(self):
         """Return self's variables as dictionary s.t. it can be easily converted to
@@ -313,70 +514,1219 @@ class User :
         self.gputimeraw = gputimeraw        # in s
 
 
-class Util :
-    """Class that maps entry in a node*_gpuutil_gpu*.txt"""
+class JobRow :
+    """Read-only view of one row of a JobTable. Has the same attributes as Job
+       so it can be handed to code written for Job, e.g. is_job_in_time_range()"""
+    __slots__ = ('table', 'idx')
+
+    def __init__(self, table = None, idx : int = None):
+        """Initialize JobRow Class
+
+        Args :
+            table : JobTable
+            idx   : row in table
+
+        Returns :
+
+        Raises :
+
+        """
+        self.table = table
+        self.idx   = idx
+
+    @property
+    def jobid(self) -> str :
+        return str(self.table.jobidV[self.idx])
+
+    @property
+    def user(self) -> str :
+        return self.table.userL[self.table.userV[self.idx]]
+
+    @property
+    def state(self) -> str :
+        return self.table.stateL[self.table.stateV[self.idx]]
+
+    @property
+    def nodelist(self) -> List[str] :
+        return [self.table.nodenameL[n] for n in self.table.nodes_of(self.idx)]
+
+    @property
+    def start(self) -> datetime.datetime :
+        return from_epoch(self.table.startV[self.idx])
+
+    @property
+    def end(self) -> datetime.datetime :
+        return from_epoch(self.table.endV[self.idx])
+
+    @property
+    def elapsedraw(self) -> int :
+        return int(self.table.elapsedrawV[self.idx])
+
+    @property
+    def alloccpus(self) -> int :
+        return int(self.table.alloccpusV[self.idx])
+
+    @property
+    def ngpu(self) -> int :
+        return int(self.table.ngpuV[self.idx])
+
+    @property
+    def cputimeraw(self) -> int :
+        return int(self.table.cputimerawV[self.idx])
+
+    @property
+    def gputimeraw(self) -> int :
+        return int(self.table.gputimerawV[self.idx])
+
+
+class JobTable :
+    """Struct-of-arrays alternative to a list of Job objects. Index i of every
+       array maps to one toplevel Slurm job. Steps are not kept.
+
+       Nodes are stored CSR-style, the node ids of job i are
+           nodeidxV[nodeptrV[i]:nodeptrV[i+1]]
+       and index into nodenameL. Users and states are stored as codes into
+       userL and stateL"""
+
+    def __init__(self, jobidV : np.ndarray = None, userV : np.ndarray = None,
+                 userL : List[str] = None, startV : np.ndarray = None,
+                 endV : np.ndarray = None, elapsedrawV : np.ndarray = None,
+                 alloccpusV : np.ndarray = None, ngpuV : np.ndarray = None,
+                 cputimerawV : np.ndarray = None, gputimerawV : np.ndarray = None,
+                 stateV : np.ndarray = None, stateL : List[str] = None,
+                 nodeptrV : np.ndarray = None, nodeidxV : np.ndarray = None,
+                 nodenameL : List[str] = None):
+        """Initialize JobTable Class
+
+        Args :
+            jobidV      : str job ids, e.g. 1234, 1234_5 (array) or 1234+0 (het)
+            userV       : int32 codes into userL
+            userL       : user names
+            startV      : int64 start in s since EPOCH, UNKNOWN_TIME if unknown
+            endV        : int64 end in s since EPOCH, UNKNOWN_TIME if unknown
+            elapsedrawV : int64 elapsed / wall time in s
+            alloccpusV  : int64 number of cpus allocated
+            ngpuV       : int64 number of gpus requested (gres/gpu)
+            cputimerawV : int64 alloccpus * elapsedraw
+            gputimerawV : int64 ngpu * elapsedraw
+            stateV      : int8 codes into stateL
+            stateL      : state names, COMPLETED, RUNNING, etc
+            nodeptrV    : int64, len(jobidV) + 1 offsets into nodeidxV
+            nodeidxV    : int32 codes into nodenameL
+            nodenameL   : node names
+
+        Returns :
+
+        Raises :
+            ValueError if the array lengths are inconsistent
+
+        """
+        self.jobidV      = np.asarray(jobidV).astype(str)
+        self.userV       = np.asarray(userV, dtype=np.int32)
+        self.userL       = list(userL)
+        self.startV      = np.asarray(startV, dtype=np.int64)
+        self.endV        = np.asarray(endV, dtype=np.int64)
+        self.elapsedrawV = np.asarray(elapsedrawV, dtype=np.int64)
+        self.alloccpusV  = np.asarray(alloccpusV, dtype=np.int64)
+        self.ngpuV       = np.asarray(ngpuV, dtype=np.int64)
+        self.cputimerawV = np.asarray(cputimerawV, dtype=np.int64)
+        self.gputimerawV = np.asarray(gputimerawV, dtype=np.int64)
+        self.stateV      = np.asarray(stateV, dtype=np.int8)
+        self.stateL      = list(stateL)
+        self.nodeptrV    = np.asarray(nodeptrV, dtype=np.int64)
+        self.nodeidxV    = np.asarray(nodeidxV, dtype=np.int32)
+        self.nodenameL   = list(nodenameL)
+        n = self.jobidV.shape[0]
+        for name in ['userV', 'startV', 'endV', 'elapsedrawV', 'alloccpusV',
+                     'ngpuV', 'cputimerawV', 'gputimerawV', 'stateV']:
+            if getattr(self, name).shape[0] != n:
+                raise ValueError("ERROR!!! len({}) != len(jobidV) = {}".format(name, n))
+        if self.nodeptrV.shape[0] != n + 1:
+            raise ValueError("ERROR!!! len(nodeptrV) != len(jobidV) + 1")
+
+
+    @classmethod
+    def from_jobs(cls, jobL : List[Job] = None):
+        """Build a JobTable from a list of Job (or JobRow) objects
+
+        Args :
+            jobL : list of Job objects, e.g. from parse_sacct_file()
+
+        Returns :
+            JobTable
+
+        Raises :
+
+        """
+        userD  = dict()
+        stateD = dict()
+        nodeD  = dict()
+        nodeptrL = [0]
+        nodeidxL = []
+        for job in jobL:
+            for node in job.nodelist:
+                nodeidxL.append(nodeD.setdefault(node, len(nodeD)))
+            nodeptrL.append(len(nodeidxL))
+        return cls(jobidV = [str(job.jobid) for job in jobL],
+                   userV  = [userD.setdefault(job.user, len(userD)) for job in jobL],
+                   userL  = list(userD.keys()),
+                   startV = [to_epoch(job.start) for job in jobL],
+                   endV   = [to_epoch(job.end) for job in jobL],
+                   elapsedrawV = [job.elapsedraw for job in jobL],
+                   alloccpusV  = [job.alloccpus for job in jobL],
+                   ngpuV       = [job.ngpu for job in jobL],
+                   cputimerawV = [job.cputimeraw for job in jobL],
+                   gputimerawV = [job.gputimeraw for job in jobL],
+                   stateV = [stateD.setdefault(job.state, len(stateD)) for job in jobL],
+                   stateL = list(stateD.keys()),
+                   nodeptrV = nodeptrL, nodeidxV = nodeidxL,
+                   nodenameL = list(nodeD.keys()))
+
+
+    @classmethod
+    def concat(cls, tableL : List['JobTable'] = None) -> 'JobTable' :
+        """Concatenate tables, e.g. from chunks of a sacct file. User, state and
+           node codes are remapped onto one shared set of names
+
+        Args :
+            tableL : list of JobTable
+
+        Returns :
+            JobTable, rows in the order of tableL
+
+        Raises :
+
+        """
+        if len(tableL) == 0:
+            raise ValueError("ERROR!!! No JobTable to concatenate")
+        userD  = dict()
+        stateD = dict()
+        nodeD  = dict()
+        userVL  = []
+        stateVL = []
+        nodeVL  = []
+        nodeptrVL = [np.zeros(1, dtype=np.int64)]
+        offset = 0
+        for table in tableL:
+            # Lookup tables old code -> new code
+            usermapV  = np.array([userD.setdefault(u, len(userD)) for u in table.userL],
+                                 dtype=np.int32)
+            statemapV = np.array([stateD.setdefault(s, len(stateD)) for s in table.stateL],
+                                 dtype=np.int8)
+            nodemapV  = np.array([nodeD.setdefault(n, len(nodeD)) for n in table.nodenameL],
+                                 dtype=np.int32)
+            userVL.append(usermapV[table.userV] if len(table) > 0 else table.userV)
+            stateVL.append(statemapV[table.stateV] if len(table) > 0 else table.stateV)
+            nodeVL.append(nodemapV[table.nodeidxV] if table.nodeidxV.shape[0] > 0
+                          else table.nodeidxV)
+            nodeptrVL.append(table.nodeptrV[1:] + offset)
+            offset += table.nodeptrV[-1]
+
+        def cat(name):
+            return np.concatenate([getattr(table, name) for table in tableL])
+
+        return cls(jobidV = cat('jobidV'), userV = np.concatenate(userVL),
+                   userL = list(userD.keys()), startV = cat('startV'),
+                   endV = cat('endV'), elapsedrawV = cat('elapsedrawV'),
+                   alloccpusV = cat('alloccpusV'), ngpuV = cat('ngpuV'),
+                   cputimerawV = cat('cputimerawV'), gputimerawV = cat('gputimerawV'),
+                   stateV = np.concatenate(stateVL), stateL = list(stateD.keys()),
+                   nodeptrV = np.concatenate(nodeptrVL),
+                   nodeidxV = np.concatenate(nodeVL), nodenameL = list(nodeD.keys()))
+
+
+    def __len__(self) -> int :
+        return self.jobidV.shape[0]
+
+
+    def __getitem__(self, key):
+        """Integer -> JobRow, slice / bool mask / index array -> JobTable"""
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self)
+            if key < 0 or key >= len(self):
+                raise IndexError("ERROR!!! JobTable index {} out of range".format(key))
+            return JobRow(self, int(key))
+        return self.subset(key)
+
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield JobRow(self, idx)
+
+
+    def nodes_of(self, idx : int = None) -> np.ndarray :
+        """Node ids (into nodenameL) of job idx"""
+        return self.nodeidxV[self.nodeptrV[idx]:self.nodeptrV[idx+1]]
+
+
+    def node_mask(self, nodeL : List[str] = None, how : str = 'any') -> np.ndarray :
+        """Which jobs ran on the given nodes, without comparing strings per job
+
+        Args :
+            nodeL : node names
+            how   : 'any' -> job used at least one of nodeL,
+                    'all' -> every node of the job is in nodeL
+
+        Returns :
+            bool np.ndarray, len(self)
+
+        Raises :
+            ValueError if how is not 'any' or 'all'
+        """
+        nameD = {name : i for i, name in enumerate(self.nodenameL)}
+        hitV  = np.zeros(len(self.nodenameL), dtype=bool)
+        hitV[[nameD[name] for name in nodeL if name in nameD]] = True
+        # Number of matching nodes per job from a cumulative sum over the CSR
+        cumV = np.zeros(self.nodeidxV.shape[0] + 1, dtype=np.int64)
+        cumV[1:] = np.cumsum(hitV[self.nodeidxV])
+        nhitV = cumV[self.nodeptrV[1:]] - cumV[self.nodeptrV[:-1]]
+        if how == 'any':
+            return nhitV > 0
+        elif how == 'all':
+            return nhitV == np.diff(self.nodeptrV)
+        else:
+            raise ValueError("ERROR!!! how = {} must be 'any' or 'all'".format(how))
+
+
+    def node_filter(self, includenodeL : List[str] = None,
+                    excludenodeL : List[str] = None) -> np.ndarray :
+        """Jobs to keep for a node selection, see hostlist.select_nodes()
+
+        Args :
+            includenodeL : keep only jobs that ran entirely on these nodes,
+                           None or [] keeps every node
+            excludenodeL : drop jobs that touched any of these nodes
+
+        Returns :
+            bool np.ndarray, len(self)
+
+        Raises :
+
+        """
+        excludenodeL = [] if excludenodeL is None else excludenodeL
+        if includenodeL is not None and len(includenodeL) > 0:
+            excludeD = set(excludenodeL)
+            return self.node_mask([name for name in includenodeL if name not in
+                                   excludeD], how='all')
+        return ~self.node_mask(excludenodeL, how='any')
+
+
+    def node_totals(self, valueV : np.ndarray = None) -> np.ndarray :
+        """Sum a per job value over the nodes each job ran on, e.g.
+           node_totals(jobtable.gputimerawV / nnodes)
+
+        Args :
+            valueV : per job value, len(self)
+
+        Returns :
+            float64 np.ndarray, len(self.nodenameL)
 
-    def __init__(self, line : str = None):
+        Raises :
 
-        """Initialize Util(ization) Class
+        """
+        countV = np.diff(self.nodeptrV)
+        return np.bincount(self.nodeidxV, weights=np.repeat(valueV, countV),
+                           minlength=len(self.nodenameL))
+
+
+    def subset(self, key) -> 'JobTable' :
+        """Return new JobTable with only the rows selected by key
 
         Args :
-            line = line with date and utilization in node*_gpuutil_gpu*.txt files
+            key : slice, bool mask or integer index array
 
         Returns :
-            Util class
+            JobTable, shares userL / stateL / nodenameL with self
 
         Raises :
-            ValueError when unexpected line format is encountered
 
         """
-        strL = line.split()
-        datestr = " ".join(strL[0:2])
-        datestr = datestr.split('.')[0]
-        self.time = datetime.datetime.strptime(datestr, "%Y/%m/%d %H:%M:%S")
-        try :
-            #self.date = datetime.datetime.strptime(datestr, "%Y/%m/%d %H:%M:%S")
-            self.util = float(strL[2].split('%')[0])
-        except ValueError :
-            ## If no data, set to invalid value
-            if 'no data' in line.lower():
-                self.util = -1
-            else :
-                raise ValueError("ERROR!!! Parsing line = {}".format(line))
+        idxV = np.arange(len(self))[key]
+        countV = self.nodeptrV[idxV+1] - self.nodeptrV[idxV]
+        nodeptrV = np.zeros(idxV.shape[0] + 1, dtype=np.int64)
+        nodeptrV[1:] = np.cumsum(countV)
+        # Gather the CSR slices of the kept rows without a python loop
+        offsetV = np.arange(nodeptrV[-1]) - np.repeat(nodeptrV[:-1], countV)
+        nodeidxV = self.nodeidxV[np.repeat(self.nodeptrV[idxV], countV) + offsetV]
+        return JobTable(jobidV = self.jobidV[idxV], userV = self.userV[idxV],
+                        userL = self.userL, startV = self.startV[idxV],
+                        endV = self.endV[idxV], elapsedrawV = self.elapsedrawV[idxV],
+                        alloccpusV = self.alloccpusV[idxV], ngpuV = self.ngpuV[idxV],
+                        cputimerawV = self.cputimerawV[idxV],
+                        gputimerawV = self.gputimerawV[idxV],
+                        stateV = self.stateV[idxV], stateL = self.stateL,
+                        nodeptrV = nodeptrV, nodeidxV = nodeidxV,
+                        nodenameL = self.nodenameL)
+
+
+class AllocationCurve :
+    """Cumulative allocated gpu / cpu seconds vs time, for the whole cluster
+       ('total') and for each user. Each curve is piecewise linear with knots at
+       job start / end times, so the allocation over any [mintime, maxtime] is
+       two binary searches and a subtraction.
+
+       Curves are concatenated, curve i lives in [ptrV[i], ptrV[i+1]) of timeV,
+       cumgpuV, gpurateV, cumcpuV and cpurateV. rate is the slope after a knot"""
+
+    def __init__(self, nameL : List[str] = None, ptrV : np.ndarray = None,
+                 timeV : np.ndarray = None, cumgpuV : np.ndarray = None,
+                 gpurateV : np.ndarray = None, cumcpuV : np.ndarray = None,
+                 cpurateV : np.ndarray = None, excludenodeL : List[str] = None,
+                 includenodeL : List[str] = None):
+        """Initialize AllocationCurve Class, see from_table()
 
+        Args :
+            nameL    : curve names, 'total' then users
+            ptrV     : int64 offsets, len(nameL) + 1
+            timeV    : int64 knots in s since EPOCH, sorted within each curve
+            cumgpuV  : float64 gpu seconds allocated before each knot
+            gpurateV : float64 gpus allocated after each knot
+            cumcpuV  : float64 cpu seconds allocated before each knot
+            cpurateV : float64 cpus allocated after each knot
+            excludenodeL : nodes that were excluded when the curve was built
+            includenodeL : nodes the jobs were restricted to, [] for all
 
-    # https://stackoverflow.com/a/4010558/4021436
-    def __lt__(self, other):
+        Returns :
+
+        Raises :
 
-        """Utility used for sorting objects
+        """
+        self.nameL    = list(nameL)
+        self.nameD    = {name : i for i, name in enumerate(self.nameL)}
+        self.ptrV     = np.asarray(ptrV, dtype=np.int64)
+        self.timeV    = np.asarray(timeV, dtype=np.int64)
+        self.cumgpuV  = np.asarray(cumgpuV, dtype=np.float64)
+        self.gpurateV = np.asarray(gpurateV, dtype=np.float64)
+        self.cumcpuV  = np.asarray(cumcpuV, dtype=np.float64)
+        self.cpurateV = np.asarray(cpurateV, dtype=np.float64)
+        self.excludenodeL = [] if excludenodeL is None else list(excludenodeL)
+        self.includenodeL = [] if includenodeL is None else list(includenodeL)
+
+
+    @classmethod
+    def from_table(cls, jobtable : JobTable = None, excludenodeL : List[str] = None,
+                   includenodeL : List[str] = None) -> 'AllocationCurve' :
+        """Build curves from job start / end / ngpu / alloccpus. Jobs with unknown
+           start or end are skipped and jobs with elapsedraw == 0 contribute
+           nothing, same as bin_job_overlap()
 
         Args :
-            other : Another Util object
+            jobtable : JobTable
+            excludenodeL : recorded in the curve, jobtable is assumed filtered
+            includenodeL : recorded in the curve, jobtable is assumed filtered
 
         Returns :
-            bool based on which is used
+            AllocationCurve
 
         Raises :
+
+        """
+        knownV = ((jobtable.startV != UNKNOWN_TIME) &
+                  (jobtable.endV != UNKNOWN_TIME) & (jobtable.elapsedrawV > 0))
+        idxV     = np.nonzero(knownV)[0]
+        elapsedV = jobtable.elapsedrawV[idxV]
+        gpuV     = jobtable.gputimerawV[idxV] / elapsedV
+        cpuV     = jobtable.cputimerawV[idxV] / elapsedV
+        # Curve 0 is the total, curve u+1 is user u. Each job adds events to both
+        njob     = idxV.shape[0]
+        curveV   = np.concatenate([np.zeros(2*njob, dtype=np.int64),
+                                   np.tile(jobtable.userV[idxV] + 1, 2)])
+        timeV    = np.tile(np.concatenate([jobtable.startV[idxV],
+                                           jobtable.endV[idxV]]), 2)
+        dgpuV    = np.tile(np.concatenate([gpuV, -gpuV]), 2)
+        dcpuV    = np.tile(np.concatenate([cpuV, -cpuV]), 2)
+        orderV   = np.lexsort((timeV, curveV))
+        curveV   = curveV[orderV]
+        timeV    = timeV[orderV]
+        # Merge events at the same (curve, time) into one knot
+        newV     = np.ones(curveV.shape[0], dtype=bool)
+        newV[1:] = (curveV[1:] != curveV[:-1]) | (timeV[1:] != timeV[:-1])
+        firstV   = np.nonzero(newV)[0]
+        kcurveV  = curveV[firstV]
+        ktimeV   = timeV[firstV]
+        ncurve   = len(jobtable.userL) + 1
+        ptrV     = np.searchsorted(kcurveV, np.arange(ncurve + 1))
+        countV   = np.diff(ptrV)
+
+        def segmented_cumsum(valueV):
+            # cumsum that restarts at 0 at the first knot of every curve
+            cumV = np.cumsum(valueV)
+            baseV = np.zeros(ncurve)
+            baseV[countV > 0] = (cumV - valueV)[ptrV[:-1][countV > 0]]
+            return cumV - np.repeat(baseV, countV)
+
+        rateL = []
+        cumL  = []
+        for dV in [dgpuV, dcpuV]:
+            if firstV.shape[0] == 0:
+                rateV = np.zeros(0)
+            else:
+                rateV = segmented_cumsum(np.add.reduceat(dV[orderV], firstV))
+            # Area between knot k-1 and k, first knot of each curve has none
+            areaV = np.zeros(ktimeV.shape[0])
+            areaV[1:] = rateV[:-1] * np.diff(ktimeV)
+            areaV[ptrV[:-1][countV > 0]] = 0
+            rateL.append(rateV)
+            cumL.append(segmented_cumsum(areaV))
+        return cls(nameL = ['total'] + list(jobtable.userL), ptrV = ptrV,
+                   timeV = ktimeV, cumgpuV = cumL[0], gpurateV = rateL[0],
+                   cumcpuV = cumL[1], cpurateV = rateL[1],
+                   excludenodeL = excludenodeL, includenodeL = includenodeL)
+
+
+    def cumulative(self, time : np.ndarray = None, name : str = 'total'):
+        """Gpu and cpu seconds allocated before time, O(log n)
+
+        Args :
+            time : s since EPOCH, scalar or array
+            name : 'total' or user name
+
+        Returns :
+            (gpu seconds, cpu seconds), same shape as time
+
+        Raises :
+            KeyError if name is not a user in the curve
+
+        """
+        idx  = self.nameD[name]
+        p0   = self.ptrV[idx]
+        p1   = self.ptrV[idx+1]
+        time = np.asarray(time, dtype=np.float64)
+        knotV = self.timeV[p0:p1]
+        kV   = np.searchsorted(knotV, time, side='right') - 1
+        beforeV = kV < 0
+        kV   = np.maximum(kV, 0) + p0
+        if p1 == p0:
+            return (np.zeros_like(time), np.zeros_like(time))
+        dtV  = time - self.timeV[kV]
+        gpuV = np.where(beforeV, 0, self.cumgpuV[kV] + self.gpurateV[kV] * dtV)
+        cpuV = np.where(beforeV, 0, self.cumcpuV[kV] + self.cpurateV[kV] * dtV)
+        return (gpuV, cpuV)
+
+
+    def query(self, mintime : datetime.datetime = None,
+              maxtime : datetime.datetime = None, name : str = 'total'):
+        """Gpu and cpu seconds allocated in [mintime, maxtime]
+
+        Args :
+            mintime : start of window
+            maxtime : end of window
+            name    : 'total' or user name
+
+        Returns :
+            (gpu seconds, cpu seconds)
+
+        Raises :
+
+        """
+        (gpuV, cpuV) = self.cumulative([to_epoch(mintime), to_epoch(maxtime)], name)
+        return (float(gpuV[1] - gpuV[0]), float(cpuV[1] - cpuV[0]))
+
+
+    def query_all(self, mintime : datetime.datetime = None,
+                  maxtime : datetime.datetime = None) -> pd.DataFrame :
+        """query() for every curve
+
+        Args :
+            mintime : start of window
+            maxtime : end of window
+
+        Returns :
+            pd.DataFrame indexed by name ('total' and users), columns
+            'gputimeraw' and 'cputimeraw', sorted by decreasing gputimeraw
+
+        Raises :
+
         """
-        return self.time < other.time
+        rowL = [self.query(mintime, maxtime, name) for name in self.nameL]
+        df = pd.DataFrame(rowL, index=self.nameL, columns=['gputimeraw', 'cputimeraw'])
+        return df.sort_values('gputimeraw', ascending=False, kind='stable')
+
+
+    def save(self, path : str = None):
+        """Write to path with np.savez
+
+        Args :
+            path : output path, should end in .npz
+
+        Returns :
+
+        Raises :
+
+        """
+        np.savez(path, nameV = np.asarray(self.nameL, dtype=str), ptrV = self.ptrV,
+                 timeV = self.timeV, cumgpuV = self.cumgpuV, gpurateV = self.gpurateV,
+                 cumcpuV = self.cumcpuV, cpurateV = self.cpurateV,
+                 excludenodeV = np.asarray(self.excludenodeL, dtype=str),
+                 includenodeV = np.asarray(self.includenodeL, dtype=str))
+
+
+    @classmethod
+    def load(cls, path : str = None) -> 'AllocationCurve' :
+        """Read curve written by save()
+
+        Args :
+            path : path to .npz
+
+        Returns :
+            AllocationCurve
+
+        Raises :
+
+        """
+        with np.load(path) as npz:
+            return cls(nameL = npz['nameV'].tolist(), ptrV = npz['ptrV'],
+                       timeV = npz['timeV'], cumgpuV = npz['cumgpuV'],
+                       gpurateV = npz['gpurateV'], cumcpuV = npz['cumcpuV'],
+                       cpurateV = npz['cpurateV'],
+                       excludenodeL = npz['excludenodeV'].tolist(),
+                       # Not written by older versions
+                       includenodeL = (npz['includenodeV'].tolist() if
+                                       'includenodeV' in npz.files else None))
+
+
+# Column of OccupancyTimeline : attribute holding its values
+OCCUPANCY_COLUMNS = {'gpus' : 'gpuV', 'cpus' : 'cpuV', 'jobs' : 'jobV',
+                     'nodes' : 'busyV'}
+
+
+class OccupancyTimeline :
+    """Exact number of gpus, cpus, jobs and busy nodes allocated at every
+       instant, for the whole cluster ('total') and for each node. Each is a
+       step function with knots at job start / end times, built by one sweep
+       over the sorted start / end events.
+
+       Curves are concatenated like AllocationCurve, curve i lives in
+       [ptrV[i], ptrV[i+1]) of timeV, gpuV, cpuV, jobV and busyV. The values
+       hold from a knot up to the next one, 0 before the first knot. busyV is
+       the number of nodes running a job, i.e. 0 or 1 for a node curve"""
+
+    def __init__(self, nameL : List[str] = None, ptrV : np.ndarray = None,
+                 timeV : np.ndarray = None, gpuV : np.ndarray = None,
+                 cpuV : np.ndarray = None, jobV : np.ndarray = None,
+                 busyV : np.ndarray = None, excludenodeL : List[str] = None,
+                 includenodeL : List[str] = None):
+        """Initialize OccupancyTimeline Class, see from_table()
+
+        Args :
+            nameL : curve names, 'total' then nodes
+            ptrV  : int64 offsets, len(nameL) + 1
+            timeV : int64 knots in s since EPOCH, sorted within each curve
+            gpuV  : int64 gpus allocated after each knot
+            cpuV  : int64 cpus allocated after each knot
+            jobV  : int64 jobs running after each knot
+            busyV : int64 nodes running a job after each knot
+            excludenodeL : nodes that were excluded when the timeline was built
+            includenodeL : nodes the jobs were restricted to, [] for all
+
+        Returns :
+
+        Raises :
+
+        """
+        self.nameL = list(nameL)
+        self.nameD = {name : i for i, name in enumerate(self.nameL)}
+        self.ptrV  = np.asarray(ptrV, dtype=np.int64)
+        self.timeV = np.asarray(timeV, dtype=np.int64)
+        self.gpuV  = np.asarray(gpuV, dtype=np.int64)
+        self.cpuV  = np.asarray(cpuV, dtype=np.int64)
+        self.jobV  = np.asarray(jobV, dtype=np.int64)
+        self.busyV = np.asarray(busyV, dtype=np.int64)
+        self.excludenodeL = [] if excludenodeL is None else list(excludenodeL)
+        self.includenodeL = [] if includenodeL is None else list(includenodeL)
+
+
+    @classmethod
+    def from_table(cls, jobtable : JobTable = None, endtime : datetime.datetime = None,
+                   excludenodeL : List[str] = None,
+                   includenodeL : List[str] = None) -> 'OccupancyTimeline' :
+        """Sweep the job start / end events, O(events log events). A job's gpus
+           and cpus are split as evenly as integers allow over its nodes, the
+           first nodes of the job get the remainder.
+
+        Args :
+            jobtable : JobTable
+            endtime  : jobs without an end (RUNNING) are taken to run until
+                       endtime, e.g. the time of the sacct dump. If None they
+                       are skipped, like jobs without a start
+            excludenodeL : recorded in the timeline, jobtable is assumed filtered
+            includenodeL : recorded in the timeline, jobtable is assumed filtered
+
+        Returns :
+            OccupancyTimeline
+
+        Raises :
+
+        """
+        endV = jobtable.endV
+        if endtime is not None:
+            endV = np.where(endV == UNKNOWN_TIME, to_epoch(endtime), endV)
+        knownV = ((jobtable.startV != UNKNOWN_TIME) & (endV != UNKNOWN_TIME) &
+                  (endV > jobtable.startV))
+        idxV   = np.nonzero(knownV)[0]
+        startV = jobtable.startV[idxV]
+        endV   = endV[idxV]
+        ngpuV  = jobtable.ngpuV[idxV]
+        ncpuV  = jobtable.alloccpusV[idxV]
+        # One (job, node) pair per node of each job, gathered from the CSR
+        nnodeV = jobtable.nodeptrV[idxV+1] - jobtable.nodeptrV[idxV]
+        pairjobV = np.repeat(np.arange(idxV.shape[0]), nnodeV)
+        rankV  = np.arange(pairjobV.shape[0]) - np.repeat(np.cumsum(nnodeV) - nnodeV,
+                                                          nnodeV)
+        pairnodeV = jobtable.nodeidxV[jobtable.nodeptrV[idxV][pairjobV] + rankV]
+        pairnV = nnodeV[pairjobV]
+        pairgpuV = (ngpuV[pairjobV] // pairnV +
+                    (rankV < ngpuV[pairjobV] % pairnV))
+        paircpuV = (ncpuV[pairjobV] // pairnV +
+                    (rankV < ncpuV[pairjobV] % pairnV))
+
+        # Curve 0 is the total, curve n+1 is node n. +1 at start, -1 at end
+        curveV = np.concatenate([np.zeros(idxV.shape[0], dtype=np.int64),
+                                 pairnodeV.astype(np.int64) + 1])
+        curveV = np.tile(curveV, 2)
+        timeV  = np.concatenate([startV, startV[pairjobV], endV, endV[pairjobV]])
+        deltaL = []
+        for (jobvalV, pairvalV) in [(ngpuV, pairgpuV), (ncpuV, paircpuV),
+                                    (np.ones_like(ngpuV), np.ones_like(pairgpuV))]:
+            dV = np.concatenate([jobvalV, pairvalV]).astype(np.int64)
+            deltaL.append(np.concatenate([dV, -dV]))
+        orderV = np.lexsort((timeV, curveV))
+        curveV = curveV[orderV]
+        timeV  = timeV[orderV]
+        # Merge events at the same (curve, time) into one knot
+        newV     = np.ones(curveV.shape[0], dtype=bool)
+        newV[1:] = (curveV[1:] != curveV[:-1]) | (timeV[1:] != timeV[:-1])
+        firstV   = np.nonzero(newV)[0]
+        kcurveV  = curveV[firstV]
+        ktimeV   = timeV[firstV]
+        ncurve   = len(jobtable.nodenameL) + 1
+        ptrV     = np.searchsorted(kcurveV, np.arange(ncurve + 1))
+        # Every curve ends at 0 (each start has its end in the same curve), so
+        # a plain cumsum doesn't leak from one curve into the next
+        valueL = []
+        for dV in deltaL:
+            if firstV.shape[0] == 0:
+                valueL.append(np.zeros(0, dtype=np.int64))
+            else:
+                valueL.append(np.cumsum(np.add.reduceat(dV[orderV], firstV)))
+        (gpuV, cpuV, jobV) = valueL
+
+        # A node is busy while it runs a job, the total counts the busy nodes
+        busyV = (jobV > 0).astype(np.int64)
+        # Curves end at 0 jobs, so diff() across a curve boundary is still right
+        nodeknotV = np.arange(ptrV[1], ktimeV.shape[0])
+        dbusyV = np.diff(busyV, prepend=0)[nodeknotV]
+        # Node knots are job start / end times, so they are knots of the total
+        posV = np.searchsorted(ktimeV[:ptrV[1]], ktimeV[nodeknotV])
+        busyV[:ptrV[1]] = np.cumsum(np.bincount(posV, weights=dbusyV,
+                                                minlength=ptrV[1])).astype(np.int64)
+        return cls(nameL = ['total'] + list(jobtable.nodenameL), ptrV = ptrV,
+                   timeV = ktimeV, gpuV = gpuV, cpuV = cpuV, jobV = jobV,
+                   busyV = busyV, excludenodeL = excludenodeL,
+                   includenodeL = includenodeL)
+
+
+    def curve(self, name : str = 'total', column : str = 'gpus'):
+        """Knots and values of one step function
+
+        Args :
+            name   : 'total' or node name
+            column : 'gpus', 'cpus', 'jobs' or 'nodes', see OCCUPANCY_COLUMNS
+
+        Returns :
+            (timeV, valueV), int64 views into self
+
+        Raises :
+            KeyError if name is not in the timeline or column is unknown
+
+        """
+        idx = self.nameD[name]
+        (p0, p1) = (self.ptrV[idx], self.ptrV[idx+1])
+        valueV = getattr(self, OCCUPANCY_COLUMNS[column])
+        return (self.timeV[p0:p1], valueV[p0:p1])
+
+
+    def at(self, time : np.ndarray = None, name : str = 'total',
+           column : str = 'gpus') -> np.ndarray :
+        """Value at time, O(log n)
+
+        Args :
+            time   : s since EPOCH, scalar or array
+            name   : 'total' or node name
+            column : see curve()
+
+        Returns :
+            int64 np.ndarray, same shape as time
+
+        Raises :
+
+        """
+        (knotV, valueV) = self.curve(name, column)
+        kV = np.searchsorted(knotV, np.asarray(time), side='right') - 1
+        if knotV.shape[0] == 0:
+            return np.zeros(np.shape(kV), dtype=np.int64)
+        return np.where(kV < 0, 0, valueV[np.maximum(kV, 0)])
+
+
+    def integral(self, time : np.ndarray = None, name : str = 'total',
+                 column : str = 'gpus') -> np.ndarray :
+        """Area under the step function before time, e.g. gpu seconds
+
+        Args :
+            time   : s since EPOCH, scalar or array
+            name   : 'total' or node name
+            column : see curve()
+
+        Returns :
+            float64 np.ndarray, same shape as time
+
+        Raises :
+
+        """
+        (knotV, valueV) = self.curve(name, column)
+        time = np.asarray(time, dtype=np.float64)
+        if knotV.shape[0] == 0:
+            return np.zeros_like(time)
+        areaV = np.zeros(knotV.shape[0])
+        areaV[1:] = np.cumsum(valueV[:-1] * np.diff(knotV))
+        kV = np.searchsorted(knotV, time, side='right') - 1
+        k  = np.maximum(kV, 0)
+        return np.where(kV < 0, 0, areaV[k] + valueV[k] * (time - knotV[k]))
+
+
+    def peak(self, mintime : datetime.datetime = None,
+             maxtime : datetime.datetime = None, name : str = 'total',
+             column : str = 'gpus'):
+        """Largest value in [mintime, maxtime) and when it was first reached
+
+        Args :
+            mintime : start of window
+            maxtime : end of window
+            name    : 'total' or node name
+            column  : see curve()
+
+        Returns :
+            (peak, datetime the peak started, clipped to mintime)
+
+        Raises :
+            ValueError if maxtime <= mintime
+
+        """
+        (start, end) = (to_epoch(mintime), to_epoch(maxtime))
+        if end <= start:
+            raise ValueError("ERROR!!! maxtime ({}) <= mintime ({})".format(
+                             maxtime, mintime))
+        (knotV, valueV) = self.curve(name, column)
+        # The step holding at mintime, then every knot before maxtime
+        lo = np.searchsorted(knotV, start, side='right') - 1
+        hi = np.searchsorted(knotV, end, side='left')
+        stepV = valueV[max(lo, 0):hi]
+        if lo < 0:
+            stepV = np.concatenate([[0], stepV])
+        k = int(np.argmax(stepV))
+        if k == 0:
+            return (int(stepV[0]), mintime)
+        return (int(stepV[k]), from_epoch(knotV[max(lo, 0) + k - (lo < 0)]))
+
+
+    def peak_all(self, mintime : datetime.datetime = None,
+                 maxtime : datetime.datetime = None,
+                 column : str = 'gpus') -> pd.DataFrame :
+        """peak() and time averaged value for every curve
+
+        Args :
+            mintime : start of window
+            maxtime : end of window
+            column  : see curve()
+
+        Returns :
+            pd.DataFrame indexed by name ('total' and nodes), columns 'peak',
+            'peaktime' and 'mean', nodes sorted by decreasing peak
+
+        Raises :
+
+        """
+        (start, end) = (to_epoch(mintime), to_epoch(maxtime))
+        rowL = []
+        for name in self.nameL:
+            (peak, peaktime) = self.peak(mintime, maxtime, name, column)
+            areaV = self.integral([start, end], name, column)
+            rowL.append((peak, peaktime, (areaV[1] - areaV[0]) / (end - start)))
+        df = pd.DataFrame(rowL, index=self.nameL, columns=['peak', 'peaktime', 'mean'])
+        return pd.concat([df.iloc[:1], df.iloc[1:].sort_values('peak', ascending=False,
+                                                               kind='stable')])
+
+
+    def heatmap(self, mintime : datetime.datetime = None,
+                maxtime : datetime.datetime = None, interval : float = None,
+                column : str = 'gpus'):
+        """Node x time grid of time averaged values, for an occupancy heatmap
+
+        Args :
+            mintime  : start of first interval
+            maxtime  : last interval starts at or before maxtime, same grid as
+                       bin_job_overlap()
+            interval : width of interval in s
+            column   : see curve()
+
+        Returns :
+            (edgeV, nodeL, gridV), edgeV are the float64 interval edges in s
+            since EPOCH from time_grid(), gridV is float64 len(nodeL) x
+            (len(edgeV) - 1)
+
+        Raises :
+            ValueError if interval isn't positive or maxtime < mintime
+        """
+        (edgeV, _) = time_grid(mintime, maxtime, interval)
+        nodeL = self.nameL[1:]
+        gridV = np.zeros((len(nodeL), edgeV.shape[0] - 1))
+        for i, name in enumerate(nodeL):
+            gridV[i] = np.diff(self.integral(edgeV, name, column)) / np.diff(edgeV)
+        return (edgeV, nodeL, gridV)
+
+
+def util_line_time(line : bytes = None, path : str = None) -> int :
+    """s since EPOCH of a dumpmonitoringdata data line, sub-seconds dropped"""
+    try:
+        return to_epoch(datetime.datetime.strptime(line[:19].decode(),
+                                                   "%Y/%m/%d %H:%M:%S"))
+    except ValueError:
+        raise ValueError("ERROR!!! Parsing {}, line is : {}".format(
+                         path, line.decode(errors='replace').rstrip()))
+
+
+def util_file_region(fin, datastart : int = None, size : int = None,
+                     time : int = None, path : str = None) -> int :
+    """Byte offset of the first data line at or after time, by bisecting the
+       file on byte offsets. Only O(log size) lines are read.
+
+    Args :
+        fin       = file opened in binary mode
+        datastart = offset of the first data line, i.e. after the header
+        size      = size of the file
+        time      = s since EPOCH
+        path      = for error messages
+
+    Returns :
+        offset of the line, size if every line is before time
+
+    Raises :
+        ValueError if a probed line can't be parsed
+    """
+    def line_after(offset):
+        # Start of the first line at or after offset
+        if offset > datastart:
+            fin.seek(offset - 1)
+            fin.readline()
+        else:
+            fin.seek(datastart)
+        linestart = fin.tell()
+        line = fin.readline()
+        while line.strip() == b'' and line != b'':
+            linestart = fin.tell()
+            line = fin.readline()
+        return(linestart, line)
+
+    lo = datastart
+    hi = size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        (linestart, line) = line_after(mid)
+        if line == b'' or util_line_time(line, path) >= time:
+            hi = mid
+        else:
+            lo = mid + 1
+    return line_after(lo)[0]
+
+
+def read_util_file(path : str = None, start : int = None, end : int = None):
+    """Read a dumpmonitoringdata file, e.g. node*_gpuutil_gpu*.txt, in bulk. Data
+       lines look like
+           2024/11/01 00:00:10.123  45%
+           2024/11/01 00:00:20.123  no data
+       and header lines start with '#'. Sub-second parts of times are dropped.
+       With a window only the lines in [start, end) plus the one sample before
+       and after it are parsed, the rest of the file is skipped by bisection.
+       That is enough for exact integrals inside the window. Files compressed
+       with gzip / xz / zstd (see compressed_io.py) are decompressed while
+       parsed, all of it, and windowed afterwards.
+
+    Args :
+        path  = path to file
+        start = s since EPOCH, None reads from the beginning
+        end   = s since EPOCH, None reads to the end
+
+    Returns :
+        timeV   = int64 s since EPOCH
+        utilV   = float32 utilization in %, NaN for 'no data'
+        headerL = list of header lines
+
+    Raises :
+        ValueError listing the first bad line if a line can't be parsed
+    """
+    headerL = []
+    compressed = compression_of(path) is not None
+    with open_input(path) as fin:
+        datastart = 0
+        while fin.peek(1)[:1] == b'#':
+            line = fin.readline()
+            headerL.append(line.decode())
+            datastart += len(line)
+        source = fin
+        # Compressed files can't be bisected, they are windowed after parsing
+        if (start is not None or end is not None) and not compressed:
+            size = os.fstat(fin.fileno()).st_size
+            lo = datastart
+            if start is not None:
+                lo = util_file_region(fin, datastart, size, start, path)
+                # Include the sample holding at start, unless it lands on start
+                fin.seek(lo)
+                line = fin.readline()
+                if lo > datastart and (line == b'' or util_line_time(line, path) > start):
+                    fin.seek(max(datastart, lo - 4096))
+                    lo = fin.tell() + fin.read(lo - fin.tell())[:-1].rfind(b'\n') + 1
+                    lo = max(lo, datastart)
+            hi = size
+            if end is not None:
+                hi = util_file_region(fin, datastart, size, end, path)
+                # Include the sample after end, it bounds the last span
+                fin.seek(hi)
+                hi += len(fin.readline())
+            if hi <= lo:
+                return(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32),
+                       headerL)
+            fin.seek(lo)
+            source = io.BytesIO(fin.read(hi - lo))
+        df = pd.read_csv(source, sep=r'\s+', comment='#', header=None, dtype=str,
+                         names=['date', 'time', 'util', 'extra'],
+                         skip_blank_lines=True)
+    if df.shape[0] == 0:
+        return(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32), headerL)
+    # Few distinct days and utilizations, parse each once
+    datecodeV, dateuniqV = pd.factorize(df['date'])
+    dayV  = pd.to_datetime(pd.Series(dateuniqV, dtype=object), format=UTIL_DATE_FORMAT,
+                           errors='coerce').to_numpy()
+    # HH:MM:SS from the fixed width characters, the sub-second part is dropped
+    # (i.e. floor) by only keeping 8 characters
+    digitM = (df['time'].to_numpy(dtype='U8').view(np.uint32).reshape(-1, 8)
+              .astype(np.int64) - ord('0'))
+    clockV = digitM[:, [2, 5]]
+    digitM = digitM[:, [0, 1, 3, 4, 6, 7]]
+    secV  = ((digitM[:, 0] * 10 + digitM[:, 1]) * 3600 +
+             (digitM[:, 2] * 10 + digitM[:, 3]) * 60 + digitM[:, 4] * 10 + digitM[:, 5])
+    utilcodeV, utiluniqV = pd.factorize(df['util'])
+    utiluniqV = pd.to_numeric(pd.Series(utiluniqV, dtype=object).str.rstrip('%'),
+                              errors='coerce').to_numpy(dtype=np.float32)
+    utilV = utiluniqV[utilcodeV]
+    nodataV = ((df['util'].str.lower() == 'no') &
+               (df['extra'].str.lower() == 'data')).to_numpy()
+    badV = (np.isnat(dayV[datecodeV]) | np.any(clockV != ord(':') - ord('0'), axis=1) |
+            np.any((digitM < 0) | (digitM > 9), axis=1) | (np.isnan(utilV) & ~nodataV))
+    if np.any(badV):
+        row = df[badV].iloc[0]
+        raise ValueError("ERROR!!! Parsing {} lines in {}, first is : {}".format(
+                         int(np.sum(badV)), path,
+                         " ".join(row.dropna().astype(str).tolist())))
+    timeV = ((dayV - np.datetime64(EPOCH)) // np.timedelta64(1, 's'))[datecodeV] + secV
+    timeV = timeV.astype(np.int64)
+    if compressed and (start is not None or end is not None):
+        lo = 0 if start is None else max(np.searchsorted(timeV, start, 'right') - 1, 0)
+        hi = timeV.shape[0] if end is None else np.searchsorted(timeV, end, 'left') + 1
+        (timeV, utilV) = (timeV[lo:hi], utilV[lo:hi])
+    return(timeV, utilV, headerL)
+
+
+class UtilSeries :
+    """Utilization samples of one file (or a window of it) and their cumulative
+       integrals, see Gpu"""
+
+    def __init__(self, path : str = None, start : int = None, end : int = None):
+        """Read path, see read_util_file()
+
+        Args :
+            path  : path to node*_gpuutil_gpu*.txt or totalgpuutilization_*.txt,
+                    None leaves the series empty, see from_arrays()
+            start : s since EPOCH, None reads from the beginning
+            end   : s since EPOCH, None reads to the end
+
+        Returns :
+
+        Raises :
+            ValueError if the utilization is not sorted by date
+        """
+        self.start = None
+        self.end = None
+        if path is None:
+            return
+        (self.timeV, self.utilV, headerL) = read_util_file(path, start, end)
+        for line in headerL:
+            strL = line.split()
+            datestr = " ".join(strL[4:8])
+            datestr = datestr.split('.')[0]
+
+            # https://docs.python.org/3/library/datetime.html#strftime-strptime-behavior
+            if 'Start' in line :
+                self.start = datetime.datetime.strptime(datestr, "%b %d %H:%M:%S %Y")
+            if 'End' in line :
+                self.end= datetime.datetime.strptime(datestr, "%b %d %H:%M:%S %Y")
+        if not bool(np.all(self.timeV[1:] >= self.timeV[:-1])):
+            raise ValueError("ERROR!!! {} has unsorted gpu utilization".format(path))
+        self.build_integral()
+
+
+    @classmethod
+    def from_arrays(cls, timeV : np.ndarray = None, utilV : np.ndarray = None,
+                    period : int = None, cumutilV : np.ndarray = None,
+                    cumcoverV : np.ndarray = None, start : datetime.datetime = None,
+                    end : datetime.datetime = None) -> 'UtilSeries' :
+        """Series over existing arrays, e.g. memory maps from util_store.py. No
+           copy is made, and if period / cumutilV / cumcoverV are given nothing
+           is computed either, s.t. only the pages a query touches are read.
+
+        Args :
+            timeV     : sorted int64 s since EPOCH
+            utilV     : float32 %, NaN for 'no data'
+            period    : see build_integral(), computed if None
+            cumutilV  : see build_integral(), computed if None
+            cumcoverV : see build_integral(), computed if None
+            start     : start time from the file header
+            end       : end time from the file header
+
+        Returns :
+            UtilSeries
+
+        Raises :
+
+        """
+        series = cls()
+        series.timeV = timeV
+        series.utilV = utilV
+        series.start = start
+        series.end = end
+        if period is None or cumutilV is None or cumcoverV is None:
+            series.build_integral(period)
+        else:
+            series.period = period
+            series.cumutilV = cumutilV
+            series.cumcoverV = cumcoverV
+        return series
+
+
+    @property
+    def validV(self) -> np.ndarray :
+        """False where the utilization is 'no data'"""
+        return ~np.isnan(self.utilV)
+
+
+    def span(self, kV : np.ndarray = None) -> np.ndarray :
+        """Length of time samples kV hold, see build_integral()
+
+        Args :
+            kV : int indices of samples
+
+        Returns :
+            int64 s, 0 for 'no data'
+
+        Raises :
+
+        """
+        nextV = self.timeV[np.minimum(kV + 1, self.timeV.shape[0] - 1)]
+        spanV = np.where(kV + 1 < self.timeV.shape[0],
+                         np.minimum(nextV - self.timeV[kV], self.period), self.period)
+        return np.where(np.isnan(self.utilV[kV]), 0, spanV)
+
+
+    def build_integral(self, period : int = None):
+        """Precompute the cumulative integral of the utilization s.t. any window
+           is two binary searches. Sample i is taken to hold over
+           [t_i, t_i + min(t_(i+1) - t_i, period)), where period is the median
+           sample spacing. Gaps longer than a period and 'no data' samples are
+           not covered, i.e. they are excluded from averages and show up in the
+           coverage instead.
+
+        Args :
+            period : s, None is the median sample spacing
+
+        Returns :
+
+        Raises :
+
+        """
+        diffV = np.diff(self.timeV)
+        if period is not None:
+            self.period = int(period)
+        elif np.any(diffV > 0):
+            self.period = int(np.median(diffV[diffV > 0]))
+        else:
+            self.period = 0
+        spanV = self.span(np.arange(self.timeV.shape[0]))
+        utilV = np.where(np.isnan(self.utilV), 0, self.utilV).astype(np.float64)
+        self.cumutilV  = np.zeros(self.timeV.shape[0] + 1)
+        self.cumutilV[1:] = np.cumsum(utilV * spanV)
+        self.cumcoverV = np.zeros(self.timeV.shape[0] + 1)
+        self.cumcoverV[1:] = np.cumsum(spanV)
+
+
+@functools.lru_cache(maxsize=UTIL_CACHE_SIZE)
+def load_util_series(path : str = None, start : int = None,
+                     end : int = None) -> UtilSeries :
+    """UtilSeries(path, start, end), the UTIL_CACHE_SIZE most recently used are
+       kept s.t. lazy Gpus don't re-read files and memory stays bounded. Call
+       load_util_series.cache_clear() if files change on disk."""
+    return UtilSeries(path, start, end)
+
+
+def resample_integral(integralV : np.ndarray = None, coverV : np.ndarray = None,
+                      edgeV : np.ndarray = None, ngpu : int = 1):
+    """Time weighted means of bins [edge_k, edge_(k+1)) from cumulative
+       integrals evaluated at the bin edges, see Gpu.util_integral()
+
+    Args :
+        integralV = % * s at each edge
+        coverV    = gpu * s with data at each edge
+        edgeV     = sorted s since EPOCH, nbin + 1
+        ngpu      = number of gpus integrated, scales the coverage
+
+    Returns :
+        meanV     = float64 % of nbin, NaN where no gpu has data
+        coverageV = float64 fraction of gpu * bin with data, [0, 1]
+
+    Raises :
+
+    """
+    binintV = np.diff(integralV)
+    bincovV = np.diff(coverV)
+    durationV = np.diff(np.asarray(edgeV, dtype=np.float64)) * ngpu
+    meanV = np.full(bincovV.shape, np.nan)
+    np.divide(binintV, bincovV, out=meanV, where=bincovV > 0)
+    coverageV = np.zeros(bincovV.shape)
+    np.divide(bincovV, durationV, out=coverageV, where=durationV > 0)
+    return(meanV, coverageV)
 
 
 class Gpu :
-    """Class that maps to a single Slurm job"""
+    """Class that maps to the utilization of a single gpu (or the total) over time.
+       Nothing is read until the samples are first used, they are then held by
+       the load_util_series() LRU unless load() pinned them to the Gpu."""
 
-    def __init__(self, gpupath : str = None):
+    def __init__(self, gpupath : str = None, start : int = None, end : int = None,
+                 lazy : bool = False):
 
         """Initialize Gpu Class
 
         Args :
+            gpupath : path to node*_gpuutil_gpu*.txt or totalgpuutilization_*.txt
+            start   : s since EPOCH, only read samples needed after this
+            end     : s since EPOCH, only read samples needed before this. Queries
+                      outside [start, end) see no data.
+            lazy    : if False, read and pin the file now, as before
 
         Returns :
 
         Raises :
             ValueError if the utilization is not sorted by date
-
         """
-        fin = open(gpupath, 'r')
         if 'totalgpuutilization' not in gpupath:
             gidx = gpupath.split("/")[-1]
             gidx = gidx.split(".")[0]
@@ -385,74 +1735,241 @@ class Gpu :
             self.gidx = gidx
         else :
             self.gidx = -1
-        self.utilL = []
         self.healthy = True
-        for line in fin:
-            if line[0] == '#':
-                strL = line.split()
-                datestr = " ".join(strL[4:8])
-                datestr = datestr.split('.')[0]
+        self.gpupath = gpupath
+        self.window = (start, end)
+        self.pinned = None
+        if lazy is False:
+            self.load()
+
+
+    @classmethod
+    def from_series(cls, gpupath : str = None, series : UtilSeries = None) -> 'Gpu' :
+        """Gpu over an existing series, e.g. memory mapped by util_store.py
+
+        Args :
+            gpupath : name of the original node*_gpuutil_gpu*.txt or
+                      totalgpuutilization_*.txt, gives the gpu index
+            series  : UtilSeries, pinned to the Gpu without a copy
+
+        Returns :
+            Gpu
+
+        Raises :
+
+        """
+        gpu = cls(gpupath, lazy=True)
+        gpu.pinned = series
+        return gpu
+
+
+    def load(self) -> 'Gpu' :
+        """Read the samples now and keep them with the Gpu, outside of the LRU"""
+        self.pinned = UtilSeries(self.gpupath, *self.window)
+        return self
+
+
+    @property
+    def series(self) -> UtilSeries :
+        """Samples and integrals, read on first use"""
+        if self.pinned is not None:
+            return self.pinned
+        return load_util_series(self.gpupath, *self.window)
+
+
+    @property
+    def timeV(self) -> np.ndarray :
+        return self.series.timeV
+
+
+    @property
+    def utilV(self) -> np.ndarray :
+        return self.series.utilV
+
+
+    @property
+    def validV(self) -> np.ndarray :
+        """False where the utilization is 'no data'"""
+        return self.series.validV
 
-                # https://docs.python.org/3/library/datetime.html#strftime-strptime-behavior
-                if 'Start' in line :
-                    self.start = datetime.datetime.strptime(datestr, "%b %d %H:%M:%S %Y")
-                if 'End' in line :
-                    self.end= datetime.datetime.strptime(datestr, "%b %d %H:%M:%S %Y")
-            else :
-                util = Util(line)
-                self.utilL.append(util)
-        if self.is_sorted(self.utilL) == False:
-            raise ValueError("ERROR!!! {} has unsorted gpu utilization".format(gpupath))
-        fin.close()
 
+    @property
+    def start(self) -> datetime.datetime :
+        """Start time from the file header"""
+        return self.series.start
 
-    def is_sorted(self, utilL : List[Util] = None) -> bool :
-        """Test to see if sorted
+
+    @property
+    def end(self) -> datetime.datetime :
+        """End time from the file header"""
+        return self.series.end
+
+
+    def __len__(self) -> int :
+        return self.timeV.shape[0]
+
+
+    def is_sorted(self, timeV : np.ndarray = None) -> bool :
+        """Test to see if sorted, O(n)
 
         Args :
-            utilL : List of Util objects
+            timeV : times, e.g. self.timeV
 
         Returns :
             bool on if it is sorted or not
 
         Raises :
         """
-        tmpL = sorted(utilL)
-        return tmpL == utilL
+        return bool(np.all(timeV[1:] >= timeV[:-1]))
+
+
+    def util_integral(self, timeV : np.ndarray = None):
+        """Integral of utilization and covered time from the first sample up to
+           each time, O(log n) per time
+
+        Args :
+            timeV : s since EPOCH, any shape
+
+        Returns :
+            integralV = float64 % * s
+            coverV    = float64 s with data
+
+        Raises :
+
+        """
+        series = self.series
+        timeV = np.asarray(timeV, dtype=np.float64)
+        if series.timeV.shape[0] == 0:
+            return(np.zeros(timeV.shape), np.zeros(timeV.shape))
+        # Sample holding at each time, -1 if before the first sample
+        kV = np.searchsorted(series.timeV, timeV, side='right') - 1
+        validV = kV >= 0
+        kV = np.maximum(kV, 0)
+        partV = np.where(validV, np.clip(timeV - series.timeV[kV], 0,
+                                         series.span(kV)), 0)
+        utilV = series.utilV[kV]
+        utilV = np.where(np.isnan(utilV), 0, utilV)
+        integralV = np.where(validV, series.cumutilV[kV], 0) + utilV * partV
+        coverV = np.where(validV, series.cumcoverV[kV], 0) + partV
+        return(integralV, coverV)
+
+
+    def resample(self, edgeV : np.ndarray = None):
+        """Time weighted mean utilization on a fixed grid, each edge is one
+           binary search, see resample_integral()
+
+        Args :
+            edgeV : sorted bin edges, s since EPOCH, e.g. from time_grid()
+
+        Returns :
+            meanV, coverageV = of each bin, see resample_integral()
+
+        Raises :
+
+        """
+        (integralV, coverV) = self.util_integral(edgeV)
+        return resample_integral(integralV, coverV, edgeV)
+
+
+    def gaps(self, periods : float = GAP_PERIODS):
+        """Runs of 'no data' samples and jumps between samples longer than
+           periods * period, i.e. where BCM lost the gpu
+
+        Args :
+            periods : see GAP_PERIODS
+
+        Returns :
+            pd.DataFrame with start, end (s since EPOCH), nsample (number of
+            'no data' samples, 0 for jumps) and kind ('nodata' or 'missing'),
+            sorted by start
+
+        Raises :
+
+        """
+        series = self.series
+        timeV = np.asarray(series.timeV)
+        nodataV = np.isnan(np.asarray(series.utilV)).astype(np.int8)
+        edgeV = np.diff(np.concatenate([[0], nodataV, [0]]))
+        beginV = np.flatnonzero(edgeV == 1)
+        stopV = np.flatnonzero(edgeV == -1)
+        # A run ends at the next sample, or one period after the last
+        runendV = np.where(stopV < timeV.shape[0],
+                           timeV[np.minimum(stopV, timeV.shape[0] - 1)],
+                           timeV[stopV - 1] + series.period)
+        jumpV = np.flatnonzero(np.diff(timeV) > periods * series.period)
+        df = pd.DataFrame({'start' : np.concatenate([timeV[beginV], timeV[jumpV] +
+                                                     series.period]),
+                           'end' : np.concatenate([runendV, timeV[jumpV + 1]]),
+                           'nsample' : np.concatenate([stopV - beginV,
+                                                       np.zeros(jumpV.shape[0],
+                                                                dtype=np.int64)]),
+                           'kind' : ['nodata'] * beginV.shape[0] +
+                                    ['missing'] * jumpV.shape[0]})
+        return df.sort_values('start', kind='stable', ignore_index=True)
+
+
+    def mean_util(self, startV : np.ndarray = None, endV : np.ndarray = None):
+        """Time weighted mean utilization over many windows [start, end)
+
+        Args :
+            startV : s since EPOCH
+            endV   : s since EPOCH, same shape as startV
+
+        Returns :
+            meanV     = float64 %, NaN where the window has no data
+            coverageV = float64 fraction of the window with data, [0, 1]
+
+        Raises :
+
+        """
+        (startintV, startcovV) = self.util_integral(startV)
+        (endintV, endcovV) = self.util_integral(endV)
+        coverV = endcovV - startcovV
+        durationV = np.asarray(endV) - np.asarray(startV)
+        meanV = np.full(coverV.shape, np.nan)
+        np.divide(endintV - startintV, coverV, out=meanV, where=coverV > 0)
+        coverageV = np.zeros(coverV.shape)
+        np.divide(coverV, durationV, out=coverageV, where=durationV > 0)
+        return(meanV, coverageV)
 
 
     def mean_util_over_interval(self, start : datetime.datetime = None,
                                 end : datetime.datetime = None,
                                 Verbose : bool = True) -> float :
-        """Calculate average utilization for gpu over some time interval
+        """Calculate average utilization for gpu over some time interval, see
+           mean_util()
 
         Args :
             start : start of interval
             end   : end of interval
 
         Returns :
-            (float) of average utilization over a time interval
+            (float) of time weighted average utilization over a time interval,
+            NaN if there is no data in it
 
         Raises :
         """
-        # self.utilL must be sorted for this to work
-        # https://stackoverflow.com/a/2701189/4021436
-
-
-        #for util in self.utilL:
-
-        print('the end')
+        (meanV, coverageV) = self.mean_util(np.array([to_epoch(start)]),
+                                            np.array([to_epoch(end)]))
+        if Verbose is True and coverageV[0] < 1:
+            print("WARNING!!! gpu{} only has data for {:.1f}% of {} -> {}".format(
+                  self.gidx, coverageV[0] * 100, start, end))
+        return float(meanV[0])
 
 
 class Node :
     """Take list of gpuutil files, read in and allocate gpus"""
 
-    def __init__(self, gpupathL : str = None):
+    def __init__(self, gpupathL : str = None, gpuL : List['Gpu'] = None,
+                 start : int = None, end : int = None, lazy : bool = False):
         """Initialize Node Class,
 
         Args :
-            gpuL = list of node*_gpuutil_*.txt files, used to allocate Gpu class and
-                   read the data
+            gpupathL = list of node*_gpuutil_*.txt files, used to allocate Gpu class
+                       and read the data
+            gpuL     = already allocated Gpu of each file in gpupathL, e.g. from a
+                       process pool, skips reading the files
+            start, end, lazy = passed to each Gpu, see Gpu.__init__()
 
         Returns :
 
@@ -464,8 +1981,9 @@ class Node :
         consolidator = (name.split('_')[3]).split('.')[0]
         name = name.split("_")[0]
         self.name = name
-        for gpupath in gpupathL:
-            gpu = Gpu(gpupath)
+        if gpuL is None:
+            gpuL = [Gpu(gpupath, start, end, lazy) for gpupath in gpupathL]
+        for gpu in gpuL:
             if gpu.healthy is False :
                 print("{} : gpu{}".format(self.name, gpu.gidx))
             self.gpuL.append(gpu)
@@ -473,36 +1991,128 @@ class Node :
         self.consolidator = consolidator
 
 
+    def util_matrix(self):
+        """Utilization of every gpu on a common time axis
+
+        Args :
+
+        Returns :
+            timeV = int64 union of the times of every gpu
+            utilM = float32 (len(self.gpuL), len(timeV)), NaN where a gpu has
+                    no sample or 'no data'
+
+        Raises :
+
+        """
+        timeV = np.unique(np.concatenate([gpu.timeV for gpu in self.gpuL]))
+        utilM = np.full((len(self.gpuL), timeV.shape[0]), np.nan, dtype=np.float32)
+        for i, gpu in enumerate(self.gpuL):
+            utilM[i, np.searchsorted(timeV, gpu.timeV)] = gpu.utilV
+        return(timeV, utilM)
+
+
+    def util_integral(self, timeV : np.ndarray = None):
+        """Sum of Gpu.util_integral() over the node's gpus
+
+        Args :
+            timeV : s since EPOCH, any shape
+
+        Returns :
+            integralV = float64 % * s
+            coverV    = float64 gpu * s with data
+
+        Raises :
+
+        """
+        integralV = np.zeros(np.shape(timeV))
+        coverV = np.zeros(np.shape(timeV))
+        for gpu in self.gpuL:
+            (gpuintV, gpucovV) = gpu.util_integral(timeV)
+            integralV += gpuintV
+            coverV += gpucovV
+        return(integralV, coverV)
+
+
+    def mean_util(self, startV : np.ndarray = None, endV : np.ndarray = None):
+        """Time weighted mean utilization of all gpus over many windows, see
+           Gpu.mean_util(). Gpus are weighted by the time they have data
+
+        Args :
+            startV : s since EPOCH
+            endV   : s since EPOCH, same shape as startV
+
+        Returns :
+            meanV     = float64 %, NaN where no gpu has data
+            coverageV = float64 fraction of gpu * window with data, [0, 1]
+
+        Raises :
+
+        """
+        (startintV, startcovV) = self.util_integral(startV)
+        (endintV, endcovV) = self.util_integral(endV)
+        coverV = endcovV - startcovV
+        durationV = (np.asarray(endV) - np.asarray(startV)) * len(self.gpuL)
+        meanV = np.full(coverV.shape, np.nan)
+        np.divide(endintV - startintV, coverV, out=meanV, where=coverV > 0)
+        coverageV = np.zeros(coverV.shape)
+        np.divide(coverV, durationV, out=coverageV, where=durationV > 0)
+        return(meanV, coverageV)
+
+
+    def resample(self, edgeV : np.ndarray = None):
+        """Time weighted mean utilization of all gpus on a fixed grid, see
+           Gpu.resample()
+
+        Args :
+            edgeV : sorted bin edges, s since EPOCH
+
+        Returns :
+            meanV, coverageV = of each bin, coverage is of gpu * bin
+
+        Raises :
+
+        """
+        (integralV, coverV) = self.util_integral(edgeV)
+        return resample_integral(integralV, coverV, edgeV, len(self.gpuL))
+
+
     def calc_util_over_interval(self, start : datetime.datetime = None,
-                                end : datetime.datetime = None):
+                                end : datetime.datetime = None,
+                                Verbose : bool = True) -> float :
         """Calculate average utilization for entire node over some time interval
 
         Args :
-            gpuL = list of node*_gpuutil_*.txt files, used to allocate Gpu class and
-                   read the data
+            start : start of interval
+            end   : end of interval
 
         Returns :
+            (float) time weighted average utilization of the node's gpus, NaN if
+            there is no data in the interval
 
         Raises :
 
         """
-        total = 0
-        for gpu in self.gpuL:
-            gpumeanutil = gpu.mean_util_over_interval(start, end)
-            total += gpumeanutil
-        print('the end again')
+        (meanV, coverageV) = self.mean_util(np.array([to_epoch(start)]),
+                                            np.array([to_epoch(end)]))
+        if Verbose is True and coverageV[0] < 1:
+            print("WARNING!!! {} only has data for {:.1f}% of {} -> {}".format(
+                  self.name, coverageV[0] * 100, start, end))
+        return float(meanV[0])
 
 
 
 class TotalGpu :
     """Take totalgpuutilization_1d.txt, read it"""
 
-    def __init__(self, path : str = None):
+    def __init__(self, path : str = None, totalgpu : 'Gpu' = None, start : int = None,
+                 end : int = None, lazy : bool = False):
 
         """Initialize Total Class,
 
         Args :
-            path = path to total gpu utilization
+            path     = path to total gpu utilization
+            totalgpu = already allocated Gpu of path, skips reading the file
+            start, end, lazy = passed to Gpu, see Gpu.__init__()
 
         Returns :
 
@@ -515,20 +2125,46 @@ class TotalGpu :
         self.name = name
         self.consolidator = consolidator
         # Isn't really a GPU, but the file is basically the same.
-        self.totalgpu = Gpu(path)
+        if totalgpu is None:
+            totalgpu = Gpu(path, start, end, lazy)
+        self.totalgpu = totalgpu
         # Set consolidator
 
 
+    @property
+    def timeV(self) -> np.ndarray :
+        return self.totalgpu.timeV
+
+
+    @property
+    def utilV(self) -> np.ndarray :
+        return self.totalgpu.utilV
+
+
+    @property
+    def validV(self) -> np.ndarray :
+        return self.totalgpu.validV
+
+
+    def resample(self, edgeV : np.ndarray = None):
+        """See Gpu.resample()"""
+        return self.totalgpu.resample(edgeV)
+
+
 class Cluster :
     """Take list of Nodes"""
 
-    def __init__(self, nodeL : List[Node] = None, totalpath : str = None):
+    def __init__(self, nodeL : List[Node] = None, totalpath : str = None,
+                 total : TotalGpu = None, start : int = None, end : int = None,
+                 lazy : bool = False):
 
         """Initialize Cluster Class,
 
         Args :
-            gpuL = list of node*_gpuutil_*.txt files, used to allocate Gpu class and
-                   read the data
+            nodeL     = list of Node
+            totalpath = path to totalgpuutilization_*.txt
+            total     = already allocated TotalGpu, totalpath is ignored if given
+            start, end, lazy = passed to the TotalGpu, see Gpu.__init__()
 
         Returns :
 
@@ -536,18 +2172,111 @@ class Cluster :
 
         """
         self.nodeL = nodeL
-        self.total = TotalGpu(totalpath)
+        if total is None:
+            total = TotalGpu(totalpath, None, start, end, lazy)
+        self.total = total
+
+
+    @property
+    def gpuL(self) -> List[Gpu] :
+        """Every Gpu of the cluster, the total last"""
+        return [gpu for node in self.nodeL for gpu in node.gpuL] + [self.total.totalgpu]
 
 
-    def validate(self):
+    def validate(self, tolerance : float = 1.0):
 
-        """Validate that the total GPU is the the average across all nodes
+        """Validate that the total GPU is the the average across all nodes. Each
+           total sample i is compared with the time weighted mean of every gpu
+           over [t_i, t_(i+1)), from the cumulative integrals of each gpu at the
+           total's sample times, i.e. one (ngpu, ntime) array and column sums.
 
         Args :
+            tolerance : max |total - mean| in % for a sample to be consistent
 
         Returns :
+            dict of
+                summary = dict with nsample, ncompared, noutlier, max / mean
+                          absolute deviation, scale (median total / mean, ~1 if
+                          total is the mean, ~ngpu if it is the sum) and valid
+                timedf  = pd.DataFrame per total sample : time, total, mean,
+                          deviation, coverage (fraction of gpu * s with data),
+                          ngpu (gpus with any data)
+                nodedf  = pd.DataFrame per node : node, ngpu, mean, coverage,
+                          share (fraction of the cluster's gpu * % * s)
+                gapdf   = pd.DataFrame of Gpu.gaps() with node and gidx
+                missingL = list of (node, gidx) of gpus other nodes have but
+                           this node has no file for
 
         Raises :
 
         """
+        gpuL = [gpu for node in self.nodeL for gpu in node.gpuL]
+        nodeV = np.repeat(np.arange(len(self.nodeL)),
+                          [len(node.gpuL) for node in self.nodeL])
+        totalV = np.asarray(self.total.utilV, dtype=np.float64)
+        timeV = np.asarray(self.total.timeV)
+        # Bin edges, the last sample holds for one period
+        edgeV = np.append(timeV, timeV[-1] + self.total.totalgpu.series.period
+                          if timeV.shape[0] > 0 else [])
+        intM = np.zeros((len(gpuL), timeV.shape[0]))
+        coverM = np.zeros((len(gpuL), timeV.shape[0]))
+        for i, gpu in enumerate(gpuL):
+            (integralV, coverV) = gpu.util_integral(edgeV)
+            intM[i] = np.diff(integralV)
+            coverM[i] = np.diff(coverV)
+        binV = np.diff(edgeV)
+        coverV = coverM.sum(axis=0)
+        meanV = np.full(timeV.shape[0], np.nan)
+        np.divide(intM.sum(axis=0), coverV, out=meanV, where=coverV > 0)
+        deviationV = totalV - meanV
+        coverageV = np.zeros(timeV.shape[0])
+        np.divide(coverV, binV * len(gpuL), out=coverageV, where=binV * len(gpuL) > 0)
+        timedf = pd.DataFrame({'time' : timeV, 'total' : totalV, 'mean' : meanV,
+                               'deviation' : deviationV, 'coverage' : coverageV,
+                               'ngpu' : (coverM > 0).sum(axis=0)})
+
+        # Per node, rows of the same node are contiguous
+        nodeintV = np.bincount(nodeV, weights=intM.sum(axis=1),
+                               minlength=len(self.nodeL))
+        nodecovV = np.bincount(nodeV, weights=coverM.sum(axis=1),
+                               minlength=len(self.nodeL))
+        ngpuV = np.array([len(node.gpuL) for node in self.nodeL])
+        nodemeanV = np.full(len(self.nodeL), np.nan)
+        np.divide(nodeintV, nodecovV, out=nodemeanV, where=nodecovV > 0)
+        span = binV.sum()
+        nodedf = pd.DataFrame({'node' : [node.name for node in self.nodeL],
+                               'ngpu' : ngpuV, 'mean' : nodemeanV,
+                               'coverage' : nodecovV / np.maximum(ngpuV * span, 1),
+                               'share' : nodeintV / max(nodeintV.sum(), 1)})
+
+        gapdfL = []
+        for node in self.nodeL:
+            for gpu in node.gpuL:
+                gapdf = gpu.gaps()
+                gapdf.insert(0, 'gidx', gpu.gidx)
+                gapdf.insert(0, 'node', node.name)
+                gapdfL.append(gapdf)
+        gapdf = pd.concat(gapdfL, ignore_index=True) if len(gapdfL) > 0 else \
+                pd.DataFrame(columns=['node', 'gidx', 'start', 'end', 'nsample', 'kind'])
+        gidxL = sorted(set(gpu.gidx for gpu in gpuL))
+        missingL = [(node.name, gidx) for node in self.nodeL for gidx in gidxL
+                    if gidx not in [gpu.gidx for gpu in node.gpuL]]
+
+        comparedV = ~np.isnan(deviationV)
+        absdevV = np.abs(deviationV[comparedV])
+        nonzeroV = comparedV & (meanV != 0)
+        ratioV = totalV[nonzeroV] / meanV[nonzeroV]
+        summaryD = {'nsample' : int(timeV.shape[0]),
+                    'ncompared' : int(comparedV.sum()),
+                    'noutlier' : int(np.sum(absdevV > tolerance)),
+                    'maxdeviation' : float(absdevV.max()) if absdevV.shape[0] > 0
+                                     else None,
+                    'meandeviation' : float(absdevV.mean()) if absdevV.shape[0] > 0
+                                      else None,
+                    'scale' : float(np.median(ratioV)) if ratioV.shape[0] > 0
+                              else None,
+                    'tolerance' : tolerance,
+                    'valid' : bool(np.all(absdevV <= tolerance))}
+        return {'summary' : summaryD, 'timedf' : timedf, 'nodedf' : nodedf,
+                'gapdf' : gapdf, 'missingL' : missingL}
 
@@ -1,27 +1,35 @@
 #!/bin/bash
  
  
-for((i=1; i<10; i++)); do
-    echo "${HOSTSTEM}g0${i}"
-    for((g=0; g<8; g++)); do
-        cmsh -c "device; dumpmonitoringdata -6d now gpu_utilization:gpu${g} -n ${HOSTSTEM}g0${i}" > ${HOSTSTEM}g0${i}_gpuutil_gpu${g}_10s.txt
-        cmsh -c "device; dumpmonitoringdata --consolidationinterval 1h -365d now gpu_utilization:gpu${g} -n ${HOSTSTEM}g0${i}" > ${HOSTSTEM}g0${i}_gpuutil_gpu${g}_1h.txt
-        cmsh -c "device; dumpmonitoringdata --consolidationinterval 1d -365d now gpu_utilization:gpu${g} -n ${HOSTSTEM}g0${i}" > ${HOSTSTEM}g0${i}_gpuutil_gpu${g}_1d.txt
-    done;
-done;
- 
-for((i=10; i<=31; i++)); do
-    echo "${HOSTSTEM}g${i}"
-    for((g=0; g<8; g++)); do
-        cmsh -c "device; dumpmonitoringdata -6d now gpu_utilization:gpu${g} -n ${HOSTSTEM}g${i}" > ${HOSTSTEM}g${i}_gpuutil_gpu${g}_10s.txt
-        cmsh -c "device; dumpmonitoringdata --consolidationinterval 1h -365d now gpu_utilization:gpu${g} -n ${HOSTSTEM}g${i}" > ${HOSTSTEM}g${i}_gpuutil_gpu${g}_1h.txt
-        cmsh -c "device; dumpmonitoringdata --consolidationinterval 1d -365d now gpu_utilization:gpu${g} -n ${HOSTSTEM}g${i}" > ${HOSTSTEM}g${i}_gpuutil_gpu${g}_1d.txt
-    done;
-done;
-
-
-cmsh -c "partition; dumpmonitoringdata -7d now totalgpuutilization" > totalgpuutilization_2min.txt
-cmsh -c "partition; dumpmonitoringdata --consolidationinterval 1h -365d now totalgpuutilization" > totalgpuutilization_1h.txt
-cmsh -c "partition; dumpmonitoringdata --consolidationinterval 1d -365d now totalgpuutilization" > totalgpuutilization_1d.txt
+# Dump the gpu utilization concurrently, only the samples newer than those
+# already in . are requested (see src/collect_gpu_util.py). NODES defaults to
+# every ${HOSTSTEM}g* node BCM knows, the gpus of each node are discovered.
+NODES=${NODES:-"${HOSTSTEM}g*"}
+# If ROLLUP_DIR is set, only the raw data is dumped and the 1h / 1d series are
+# consolidated locally into it (see src/rollup_gpu_util.py). Read them with
+# job_efficiency.py --utilrollup or validate_gpu_util.py --rollupdir
+RESOLUTIONS=2min,1h,1d
+if [ -n "${ROLLUP_DIR}" ]; then
+    RESOLUTIONS=2min
+fi
+python3 $(dirname $0)/collect_gpu_util.py --outdir . --nodes "${NODES}" --resolutions ${RESOLUTIONS}
+if [ -n "${ROLLUP_DIR}" ]; then
+    python3 $(dirname $0)/rollup_gpu_util.py --path . --rollupdir ${ROLLUP_DIR}
+fi
+# If ARCHIVE_DIR is set, keep the samples past BCM's retention in a month
+# partitioned archive, old months are rolled up (see src/archive_gpu_util.py)
+if [ -n "${ARCHIVE_DIR}" ]; then
+    python3 $(dirname $0)/archive_gpu_util.py --path . --archive ${ARCHIVE_DIR} --compact
+fi
 
-sacct --allusers -P -S 2024-01-01 --format="jobidraw,jobname,user,nodelist,elapsedraw,alloccpus,cputimeraw,maxrss,state,start,end,reqtres" > sacct_`date +'%Y-%m-%d'`
+# If SACCT_STORE is set, only dump jobs that can differ from the store (see
+# src/ingest_sacct.py) and merge them into it
+SINCE=2024-01-01
+if [ -n "${SACCT_STORE}" ]; then
+    HIGHWATER=$(python3 $(dirname $0)/ingest_sacct.py --store ${SACCT_STORE} --high_water)
+    SINCE=${HIGHWATER:-${SINCE}}
+fi
+sacct --allusers -P -S ${SINCE} --format="jobidraw,jobname,user,nodelist,elapsedraw,alloccpus,cputimeraw,maxrss,state,start,end,reqtres" > sacct_`date +'%Y-%m-%d'`
+if [ -n "${SACCT_STORE}" ]; then
+    python3 $(dirname $0)/ingest_sacct.py --store ${SACCT_STORE} --path sacct_`date +'%Y-%m-%d'`
+fi
@@ -0,0 +1,83 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Replace the serial cmsh loop of collect_data.sh with a concurrent,
+#      incremental collector
+#
+# Refs :
+#   a) bcm_collector.py
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import sys
+import argparse
+from bcm_collector import collect_gpu_util
+
+
+# Run on the head node, e.g.
+#   python src/collect_gpu_util.py --outdir data/util --nodes 'dgx*'
+# Rerunning it on the same --outdir only dumps the new samples
+def main():
+    """Dump the gpu utilization series from BCM
+
+    Args
+
+        N/A
+
+    Returns
+
+    Raises
+
+    """
+    parser = argparse.ArgumentParser(
+                description="Dump the per gpu and total gpu utilization from BCM, "
+                            "only the samples newer than those in --outdir")
+    parser.add_argument('--outdir', metavar='path/to/util/dir', type=str,
+                        default='.', help='Directory of the text files, default .')
+    parser.add_argument('--nodes', metavar='nodes', type=str,
+                        help='Node patterns, e.g. dgx[01-31] or dgx*, default is '
+                             'every node in `device; list`')
+    parser.add_argument('--exclude_nodes', metavar='exclude_nodes', type=str,
+                        help='Node patterns to skip')
+    parser.add_argument('--ngpu', metavar='ngpu', type=int,
+                        help='Gpus per node, default discovers them per node')
+    parser.add_argument('--resolutions', metavar='2min,1h,1d', type=str,
+                        default='2min,1h,1d', help='Comma separated resolutions')
+    parser.add_argument('--nworker', metavar='nworker', type=int, default=8,
+                        help='Concurrent cmsh calls, default 8')
+    parser.add_argument('--cmsh', metavar='path/to/cmsh', type=str, default='cmsh',
+                        help='cmsh executable')
+    parser.add_argument('--timeout', metavar='seconds', type=float, default=600,
+                        help='s before a cmsh call is killed, default 600')
+    parser.add_argument('--retries', metavar='retries', type=int, default=3,
+                        help='Retries of a failed cmsh call, default 3')
+    parser.add_argument('--backoff', metavar='seconds', type=float, default=2.0,
+                        help='s before the first retry, doubled after each one')
+    args = parser.parse_args()
+
+    cmshD = {'cmsh' : args.cmsh, 'timeout' : args.timeout, 'retries' : args.retries,
+             'backoff' : args.backoff}
+    countD = collect_gpu_util(args.outdir, args.nodes, args.exclude_nodes, args.ngpu,
+                              args.resolutions.split(','), args.nworker, cmshD)
+    print("{} series, {} samples dumped".format(countD['series'], countD['samples']))
+    for error in countD['failedL']:
+        print(error, file=sys.stderr)
+    sys.exit(0 if len(countD['failedL']) == 0 else 1)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,87 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Read archived sacct / dumpmonitoringdata files compressed with gzip,
+#      xz or zstd as they are, decompressing while reading
+#
+# Refs :
+#   a) https://docs.python.org/3/library/gzip.html
+#   b) https://python-zstandard.readthedocs.io/
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import io
+import gzip
+import lzma
+try:
+    import zstandard
+except ImportError:
+    # Only needed for .zst files
+    zstandard = None
+
+# Suffix : compression, anything else is read as plain text
+COMPRESSION_SUFFIXES = {'.gz' : 'gzip', '.xz' : 'xz', '.zst' : 'zstd'}
+# Optional compression suffix of a file name, for regular expressions
+COMPRESSION_PATTERN = r'(?:\.gz|\.xz|\.zst)?'
+# Decompressed bytes buffered per read of a compressed file
+READ_BUFFER = 1024**2
+
+
+def compression_of(path : str = None) -> str :
+    """Compression of path from its suffix
+
+    Args
+        path = path to file
+
+    Returns
+        'gzip', 'xz', 'zstd' or None for plain files
+
+    Raises
+    """
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+
+def open_input(path : str = None) -> io.BufferedReader :
+    """Open a plain or compressed file for reading, decompressing as it is read
+
+    Args
+        path = path to file, compression from its suffix, see compression_of()
+
+    Returns
+        binary, buffered file object (supports peek() and readline()). Only
+        plain files are seekable at a cost independent of the offset.
+
+    Raises
+        ValueError if path is .zst and zstandard isn't installed
+    """
+    compression = compression_of(path)
+    # Plain files keep the default buffer, they are bisected with small reads
+    if compression is None:
+        return open(path, 'rb')
+    if compression == 'gzip':
+        raw = gzip.open(path, 'rb')
+    elif compression == 'xz':
+        raw = lzma.open(path, 'rb')
+    else:
+        if zstandard is None:
+            raise ValueError("ERROR!!! Reading {} needs the zstandard package, "
+                             "pip install zstandard".format(path))
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'),
+                                                         closefd=True)
+    return io.BufferedReader(raw, buffer_size=READ_BUFFER)
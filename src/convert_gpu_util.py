@@ -0,0 +1,62 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Archive the gpu utilization text files in a memory mappable store
+#
+# Refs :
+#   a) util_store.py
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import sys
+import argparse
+from util_store import convert_util_dir
+
+
+# Run after every collect_data.sh, e.g.
+#   python src/convert_gpu_util.py --path data/2024-11-01 --store data/util_store
+def main():
+    """Convert a directory of gpu utilization files into a store
+
+    Args
+
+        N/A
+
+    Returns
+
+    Raises
+
+    """
+    parser = argparse.ArgumentParser(
+                description="Merge the text files from collect_data.sh into a "
+                            "binary store of gpu utilization")
+    parser.add_argument('--path', metavar='path/to/toplevel/data/dir', type=str,
+                        required=True, help='Directory with node*_gpuutil_gpu*.txt')
+    parser.add_argument('--store', metavar='path/to/util_store', type=str,
+                        required=True, help='Store directory, created if needed')
+    parser.add_argument('--excludenodes', metavar='excludenodes', nargs='?',
+                        type=str, help='Comma separated node names to skip')
+    args = parser.parse_args()
+
+    excludenodeL = None if args.excludenodes is None else args.excludenodes.split(',')
+    countD = convert_util_dir(args.path, args.store, excludenodeL)
+    print("{} series, {} new samples".format(countD['series'], countD['samples']))
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+
+    main()
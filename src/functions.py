@@ -19,15 +19,563 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 import os
+import re
 import sys
 import glob
 import random
 import datetime
+import concurrent.futures
 import numpy as np
 from numpy.typing import ArrayLike
 import pandas as pd
 from typing import List
-from classes import Job,Step,SacctObj,User,Node,Cluster
+from classes import Job,Step,SacctObj,User,Node,Cluster,JobTable,AllocationCurve
+from classes import OccupancyTimeline,OCCUPANCY_COLUMNS
+from classes import Gpu,TotalGpu,UtilSeries
+from classes import EPOCH,UNKNOWN_TIME,time_grid
+from classes import MAXRSS_TO_KB,parse_reqtres
+from hostlist import HostList,expand_hostlist
+from sacct_cache import load_cached_frame,store_cached_frame,MAX_CACHE_BYTES
+from compressed_io import COMPRESSION_PATTERN,open_input
+
+# Format of the Start / End fields from sacct
+SACCT_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+# Job ids are always read as str, a chunk holding only '12.0' would be a float
+SACCT_DTYPE = {'JobIDRaw' : str, 'JobID' : str}
+# Max number of offending job ids listed in an error message
+MAX_REPORTED_JOBS = 10
+# How final a job state is, when dumps disagree the most final record wins.
+# States not listed rank like RUNNING.
+SACCT_STATE_RANK = {'PENDING' : 0, 'REQUEUED' : 0, 'RUNNING' : 1, 'SUSPENDED' : 1,
+                    'COMPLETING' : 1, 'RESIZING' : 1, 'BOOT_FAIL' : 2,
+                    'CANCELLED' : 2, 'COMPLETED' : 2, 'DEADLINE' : 2, 'FAILED' : 2,
+                    'NODE_FAIL' : 2, 'OUT_OF_MEMORY' : 2, 'PREEMPTED' : 2,
+                    'REVOKED' : 2, 'TIMEOUT' : 2}
+# Resolutions of the utilization files from collect_data.sh, see read_gpu_util()
+UTIL_RESOLUTIONS = ('2min', '1h', '1d')
+# The raw per gpu files are named _10s, the raw total _2min
+UTIL_RESOLUTION_ALIAS = {'10s' : '2min'}
+# <node>_gpuutil_gpu<N>_<res>.txt and totalgpuutilization_<res>.txt, optionally
+# compressed, e.g. .txt.gz
+GPU_UTIL_FILE = re.compile(r'^(.+?)_gpuutil_gpu(\d+)_([^_.]+)\.txt' +
+                           COMPRESSION_PATTERN + '$')
+TOTAL_UTIL_FILE = re.compile(r'^totalgpuutilization_([^_.]+)\.txt' +
+                             COMPRESSION_PATTERN + '$')
+
+def read_sacct_frame(path : str = None, cache : bool = True, cachedir : str = None,
+                     maxcachebytes : int = MAX_CACHE_BYTES) -> pd.DataFrame :
+    """Read parsable sacct output into a data frame. The parsed frame is cached
+       in a binary file next to path (see sacct_cache.py) and re-used while the
+       file's size, mtime and content hash are unchanged.
+
+    Args
+        path     = path to parsable sacct file, may be compressed, see
+                   compressed_io.py
+        cache    = set False to always read the text
+        cachedir = cache directory, default is .sacct_cache next to path
+        maxcachebytes = evict least recently used entries above this size
+
+    Returns
+        data frame, same as pd.read_csv(path, sep='|', na_filter=False)
+
+    Raises
+    """
+    if cache is True:
+        df = load_cached_frame(path, cachedir)
+        if df is not None:
+            return df
+    with open_input(path) as fin:
+        df = pd.read_csv(fin, sep='|', na_filter=False, dtype=SACCT_DTYPE)
+    if cache is True:
+        store_cached_frame(df, path, cachedir, maxcachebytes)
+    return df
+
+
+def jobidraw_column(df : pd.DataFrame = None) -> pd.Series :
+    """Return the raw job id column of a sacct data frame as str
+
+    Args
+        df = data frame from pd.read_csv() of sacct output
+
+    Returns
+        pd.Series of str, e.g. '1234', '1234.batch', '1234.0'
+
+    Raises
+        KeyError if neither JobIDRaw or JobID are present
+    """
+    # make_fake_data.py writes 'JobID', collect_data.sh writes 'JobIDRaw'
+    try :
+        return df['JobIDRaw'].astype(str)
+    except KeyError :
+        return df['JobID'].astype(str)
+
+
+def offending_jobs(jobidrawS : pd.Series = None, badV : np.ndarray = None) -> str :
+    """Format the job ids where badV is True for an error message
+
+    Args
+        jobidrawS = pd.Series of JobIDRaw, None if not known
+        badV      = bool np.ndarray, same length
+
+    Returns
+        str, e.g. '7, 12.batch (+3 more)'
+
+    Raises
+    """
+    nbad = int(np.sum(badV))
+    if jobidrawS is None:
+        return "{} rows".format(nbad)
+    badL = jobidrawS[badV].astype(str).tolist()[:MAX_REPORTED_JOBS]
+    if nbad > len(badL):
+        return "{} (+{} more)".format(', '.join(badL), nbad - len(badL))
+    return ', '.join(badL)
+
+
+def jobid_order(jobidV : np.ndarray = None) -> np.ndarray :
+    """Order job ids by job number, then as str. Array and het job ids, e.g.
+       1234_5, 1234_[1-3] or 1234+0, sort next to job 1234.
+
+    Args
+        jobidV = np.ndarray of str job ids, steps already split off
+
+    Returns
+        int64 indices that sort jobidV
+
+    Raises
+    """
+    jobidS = pd.Series(jobidV, dtype=object).astype(str)
+    numV   = pd.to_numeric(jobidS.str.extract(r'^(\d+)', expand=False),
+                           errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+    return np.lexsort((jobidS.to_numpy(dtype=str), numV))
+
+
+def sacct_time_to_epoch(timeS : pd.Series = None,
+                        jobidrawS : pd.Series = None) -> np.ndarray :
+    """Convert a column of sacct Start / End strings to int64 seconds since EPOCH
+       in one vectorized call
+
+    Args
+        timeS     = pd.Series of YYYY-MM-DDTHH:MM:SS, 'None' or 'Unknown'
+        jobidrawS = JobIDRaw of each row, only used to report errors
+
+    Returns
+        np.ndarray of int64, UNKNOWN_TIME where the time is 'None' / 'Unknown'
+
+    Raises
+        ValueError listing the jobs whose time does not match SACCT_TIME_FORMAT
+    """
+    timeS  = timeS.astype(str)
+    validV = (~timeS.isin(['None', 'Unknown', ''])).to_numpy()
+    epochV = np.full(timeS.shape[0], UNKNOWN_TIME, dtype=np.int64)
+    dateS  = pd.to_datetime(timeS[validV], format=SACCT_TIME_FORMAT, errors='coerce')
+    badV   = np.zeros(timeS.shape[0], dtype=bool)
+    badV[validV] = dateS.isna().to_numpy()
+    if np.any(badV):
+        raise ValueError("ERROR!!! Times not in {} for jobs : {}".format(
+                         SACCT_TIME_FORMAT, offending_jobs(jobidrawS, badV)))
+    epochV[validV] = ((dateS.to_numpy() - np.datetime64(EPOCH)) //
+                      np.timedelta64(1, 's'))
+    return epochV
+
+
+def epoch_to_datetimes(epochV : np.ndarray = None) -> List[datetime.datetime] :
+    """Vectorized from_epoch()
+
+    Args
+        epochV = int64 seconds since EPOCH
+
+    Returns
+        list of datetime, None where epochV == UNKNOWN_TIME
+
+    Raises
+    """
+    dateV = epochV.astype('datetime64[s]').astype(object)
+    dateV[epochV == UNKNOWN_TIME] = None
+    return dateV.tolist()
+
+
+def sacct_maxrss_to_kb(maxrssS : pd.Series = None,
+                       jobidrawS : pd.Series = None) -> np.ndarray :
+    """Vectorized classes.maxrss_to_kb(), e.g. 10M -> 10240
+
+    Args
+        maxrssS   = pd.Series of MaxRSS, may be empty
+        jobidrawS = JobIDRaw of each row, only used to report errors
+
+    Returns
+        float64 np.ndarray of K, NaN where MaxRSS is empty
+
+    Raises
+        ValueError listing the jobs whose MaxRSS has no K/M/G/T suffix
+    """
+    maxrssS = maxrssS.astype(str)
+    emptyV  = (maxrssS == '').to_numpy()
+    multV   = maxrssS.str[-1].str.lower().map(MAXRSS_TO_KB).to_numpy(dtype=np.float64)
+    valueV  = pd.to_numeric(maxrssS.str[:-1], errors='coerce').to_numpy(dtype=np.float64)
+    badV    = ~emptyV & (np.isnan(multV) | np.isnan(valueV))
+    if np.any(badV):
+        raise ValueError("ERROR!!! Invalid maxrss for jobs : {}".format(
+                         offending_jobs(jobidrawS, badV)))
+    kbV = valueV * multV
+    kbV[emptyV] = np.nan
+    return kbV
+
+
+def sacct_reqtres_columns(reqtresS : pd.Series = None) -> pd.DataFrame :
+    """Expand a column of ReqTRES into typed columns. Each distinct ReqTRES is
+       only split once (see classes.parse_reqtres()), most jobs share a handful.
+
+    Args
+        reqtresS = pd.Series of ReqTRES, e.g. billing=2,cpu=2,gres/gpu=1,mem=10G,node=1
+
+    Returns
+        data frame, same index, with nullable Int64 columns billing, cpu, gpu,
+        node and float64 memgb. Missing keys are <NA> / NaN
+
+    Raises
+        ValueError if mem has unexpected units
+    """
+    codeV, uniqL = pd.factorize(reqtresS.astype(str))
+    uniqdf = pd.DataFrame([parse_reqtres(reqtres) for reqtres in uniqL],
+                          columns=['billing', 'cpu', 'gpu', 'memgb', 'node'])
+    uniqdf = uniqdf.astype({'billing' : 'Int64', 'cpu' : 'Int64', 'gpu' : 'Int64',
+                            'memgb' : np.float64, 'node' : 'Int64'})
+    return uniqdf.take(codeV).set_index(reqtresS.index)
+
+
+def sacct_frame_columns(df : pd.DataFrame = None) -> pd.DataFrame :
+    """Convert every field of a sacct frame that SacctObj / Job parse per row in
+       bulk, and run their sanity checks on whole columns
+
+    Args
+        df = data frame from pd.read_csv(path, sep='|', na_filter=False)
+
+    Returns
+        data frame, same rows, with
+            JobIDRaw   = str
+            JobNum     = str job number, JobIDRaw without '.<step>'
+            Step       = str step, '' for the toplevel job
+            ElapsedRaw, AllocCPUS, CPUTimeRAW = int64
+            MaxRSS     = float64 K, NaN if empty
+            State      = str, 'CANCELLED by uid' -> 'CANCELLED'
+            Start, End = int64 seconds since EPOCH or UNKNOWN_TIME, End is
+                         UNKNOWN_TIME for RUNNING jobs
+        JobName, User, NodeList and ReqTRES are kept as is
+
+    Raises
+        ValueError listing the offending jobs if cputimeraw != alloccpus*elapsedraw,
+        start > end or times / maxrss can't be parsed
+    """
+    jobidrawS = jobidraw_column(df)
+    # An empty (header only) frame partitions into no columns at all
+    splitdf   = jobidrawS.str.partition('.').reindex(columns=[0, 1, 2], fill_value='')
+    stateS    = df['State'].astype(str)
+    runningV  = (stateS == 'RUNNING').to_numpy()
+    # Sometimes see things like 'CANCELLED by uid'
+    stateS    = stateS.where(~stateS.str.contains('CANCELLED', regex=False), 'CANCELLED')
+    elapsedrawV = df['ElapsedRaw'].to_numpy(dtype=np.int64)
+    alloccpusV  = df['AllocCPUS'].to_numpy(dtype=np.int64)
+    cputimerawV = df['CPUTimeRAW'].to_numpy(dtype=np.int64)
+    startV = sacct_time_to_epoch(df['Start'], jobidrawS)
+    endV   = sacct_time_to_epoch(df['End'], jobidrawS)
+    endV[runningV] = UNKNOWN_TIME
+    # Same sanity checks as SacctObj, but on whole arrays
+    badV = ~np.isclose(cputimerawV, alloccpusV * elapsedrawV)
+    if np.any(badV):
+        raise ValueError("ERROR!!! cputimeraw != alloccpus*elapsedraw for jobs : "
+                         "{}".format(offending_jobs(jobidrawS, badV)))
+    badV = (startV != UNKNOWN_TIME) & (endV != UNKNOWN_TIME) & (startV > endV)
+    if np.any(badV):
+        raise ValueError("ERROR!!! start > end, makes no sense for jobs : "
+                         "{}".format(offending_jobs(jobidrawS, badV)))
+    return pd.DataFrame({'JobIDRaw' : jobidrawS.to_numpy(),
+                         'JobNum' : splitdf[0].to_numpy(),
+                         'Step' : splitdf[2].to_numpy(),
+                         'JobName' : df['JobName'].to_numpy(),
+                         'User' : df['User'].to_numpy(),
+                         'NodeList' : df['NodeList'].astype(str).to_numpy(),
+                         'ElapsedRaw' : elapsedrawV, 'AllocCPUS' : alloccpusV,
+                         'CPUTimeRAW' : cputimerawV,
+                         'MaxRSS' : sacct_maxrss_to_kb(df['MaxRSS'], jobidrawS),
+                         'State' : stateS.to_numpy(), 'Start' : startV,
+                         'End' : endV, 'ReqTRES' : df['ReqTRES'].astype(str).to_numpy()})
+
+
+def nodelist_to_csr(nodelistS : pd.Series = None, hostlist : HostList = None):
+    """Expand a column of Slurm nodelists into a CSR node index. Each distinct
+       nodelist string is only expanded once.
+
+    Args
+        nodelistS = pd.Series of nodelists, e.g. node[06-08,13]
+        hostlist  = HostList to intern node names in, share one between tables
+                    to get the same node ids. Default is a new one
+
+    Returns
+        nodeptrV  = int64 offsets, len(nodelistS) + 1
+        nodeidxV  = int32 codes into nodenameL
+        nodenameL = list of node names
+
+    Raises
+    """
+    if hostlist is None:
+        hostlist = HostList()
+    (nodeptrV, nodeidxV) = hostlist.encode(nodelistS)
+    return(nodeptrV, nodeidxV, list(hostlist.nameL))
+
+
+def sacct_frame_to_jobs(df : pd.DataFrame = None) -> List[Job] :
+    """Group the rows of a sacct frame into Job objects.
+
+    JobIDRaw is split ONCE into the job number and the step suffix, rows are
+    grouped by exact job number in a single pass.  This is O(rows) rather
+    than scanning the whole frame for every job.
+
+    Args
+        df = sacct data frame, every job's toplevel row must be in it
+
+    Returns
+        jobL = list of Job objects sorted by job number (as str)
+
+    Raises
+        ValueError if a job has no toplevel entry, see sacct_frame_columns()
+    """
+    coldf = sacct_frame_columns(df)
+    ## group by jobid, '.ext', '.batch' and step number appende by sact are
+    ## already split off
+    stepL    = coldf['Step'].tolist()
+    ## Get unique job numbers, exact match. Sorted as str like np.unique()
+    codeV, uniqjobnumV = pd.factorize(coldf['JobNum'].to_numpy(), sort=True)
+    orderV  = np.argsort(codeV, kind='stable')
+    boundV  = np.searchsorted(codeV[orderV], np.arange(len(uniqjobnumV) + 1))
+    orderL  = orderV.tolist()
+    # Pull columns out once, indexing python lists is much cheaper than .iloc
+    jobnameL    = coldf['JobName'].tolist()
+    userL       = coldf['User'].tolist()
+    elapsedrawL = coldf['ElapsedRaw'].tolist()
+    alloccpusL  = coldf['AllocCPUS'].tolist()
+    cputimerawL = coldf['CPUTimeRAW'].tolist()
+    maxrssV     = coldf['MaxRSS'].to_numpy().astype(object)
+    maxrssV[np.isnan(coldf['MaxRSS'].to_numpy())] = None
+    maxrssL     = maxrssV.tolist()
+    stateL      = coldf['State'].tolist()
+    startL      = epoch_to_datetimes(coldf['Start'].to_numpy())
+    endL        = epoch_to_datetimes(coldf['End'].to_numpy())
+    reqtresL    = coldf['ReqTRES'].tolist()
+    # Expand each distinct nodelist / reqtres once
+    nodecodeV, nodeuniqL = pd.factorize(coldf['NodeList'])
+    nodeuniqL   = [expand_hostlist(nodelist) for nodelist in nodeuniqL]
+    nodecodeL   = nodecodeV.tolist()
+    trescodeV, tresuniqL = pd.factorize(coldf['ReqTRES'])
+    tresuniqL   = [parse_reqtres(reqtres) for reqtres in tresuniqL]
+    trescodeL   = trescodeV.tolist()
+    jobL = []
+
+    for k in range(len(uniqjobnumV)):
+        jobid = uniqjobnumV[k]
+        rowL  = orderL[boundV[k]:boundV[k+1]]
+        #### get toplevel job...
+        topL  = [i for i in rowL if stepL[i] == '']   # top level job does not contain
+        if len(topL) == 0:
+            raise ValueError("ERROR!!! Job {} has no toplevel entry".format(jobid))
+        i = topL[0]
+        jobobj = Job.from_parsed(jobid=jobid, jobname=jobnameL[i], user=userL[i],
+                     nodelist=list(nodeuniqL[nodecodeL[i]]),
+                     elapsedraw=elapsedrawL[i], alloccpus=alloccpusL[i],
+                     cputimeraw=cputimerawL[i], maxrss=maxrssL[i],
+                     state=stateL[i], start=startL[i], end=endL[i],
+                     reqtres=reqtresL[i], tresD=tresuniqL[trescodeL[i]])
+        ### Get job steps, batch/bash, extern
+        for i in rowL:
+            step = stepL[i]
+            if step == '':
+                continue
+            sacctobj = SacctObj.from_parsed(jobid=jobid, jobname=jobnameL[i],
+                         nodelist=list(nodeuniqL[nodecodeL[i]]),
+                         elapsedraw=elapsedrawL[i], alloccpus=alloccpusL[i],
+                         cputimeraw=cputimerawL[i], maxrss=maxrssL[i],
+                         state=stateL[i], start=startL[i], end=endL[i])
+            if 'batch' in step:
+                jobobj.batchL.append(sacctobj)
+            elif 'extern' in step:
+                jobobj.externL.append(sacctobj)
+            # Everything else must be a 'step', might screw me later.
+            else:
+                jobobj.stepL.append(sacctobj)
+        jobL.append(jobobj)
+    return jobL
+
+
+def iter_sacct_frames(path : str = None, chunksize : int = 100000):
+    """Read a sacct file chunksize rows at a time. Yields frames that only hold
+       complete jobs; the rows of the last job in a chunk are carried over to
+       the next chunk since its .batch / .extern / step rows may follow.
+       Peak memory is bounded by chunksize plus the carried over rows.
+
+       Assumes, like sacct writes it, that a job's rows are contiguous
+
+    Args
+        path      = path to parsable sacct file, may be compressed
+        chunksize = rows per read
+
+    Returns
+        generator of data frames
+
+    Raises
+    """
+    carrydf = None
+    with open_input(path) as fin:
+        for chunkdf in pd.read_csv(fin, sep='|', na_filter=False,
+                                   dtype=SACCT_DTYPE, chunksize=chunksize):
+            if carrydf is not None:
+                chunkdf = pd.concat([carrydf, chunkdf], ignore_index=True)
+            jobnumV = jobidraw_column(chunkdf).str.partition('.')[0].to_numpy()
+            # Rows of the last job number in the chunk may continue in the next one
+            lastV   = jobnumV == jobnumV[-1]
+            carrydf = chunkdf[lastV]
+            if not np.all(lastV):
+                yield chunkdf[~lastV]
+    if carrydf is not None and carrydf.shape[0] > 0:
+        yield carrydf
+
+
+def sacct_paths(pathS : str = None) -> List[str] :
+    """Expand comma separated sacct paths / globs, e.g. 'data/sacct_2025-0[1-3]*'
+
+    Args
+        pathS = paths or globs, the matches of a glob are sorted by name
+
+    Returns
+        list of paths, in the order given. Later paths are taken as newer dumps,
+        see merge_sacct_frames()
+
+    Raises
+        ValueError if a glob matches nothing
+    """
+    pathL = []
+    for pattern in pathS.split(','):
+        if any(char in pattern for char in '*?['):
+            matchL = sorted(glob.glob(pattern))
+            if len(matchL) == 0:
+                raise ValueError("ERROR!!! No sacct file matches {}".format(pattern))
+            pathL.extend(matchL)
+        else:
+            pathL.append(pattern)
+    return pathL
+
+
+def sacct_state_rank(stateS : pd.Series = None) -> np.ndarray :
+    """SACCT_STATE_RANK of each State, e.g. 'CANCELLED by 1234' is CANCELLED
+
+    Args
+        stateS = State column of a sacct frame
+
+    Returns
+        np.ndarray of int8
+
+    Raises
+    """
+    codeV, uniqL = pd.factorize(stateS)
+    rankV = np.array([SACCT_STATE_RANK.get(str(state).split(' ')[0], 1)
+                      for state in uniqL] + [1], dtype=np.int8)
+    return rankV[codeV]
+
+
+def merge_sacct_frames(dfL : List[pd.DataFrame] = None) -> pd.DataFrame :
+    """Merge sacct frames of overlapping dumps, one record per job. A job is
+       taken whole (toplevel and steps) from the dump whose toplevel row has
+       the most final state, see SACCT_STATE_RANK, ties go to the later dump.
+       E.g. a COMPLETED record wins over an older or newer RUNNING one.
+
+       O(rows) : the (rank, dump) priority fits in 16 bits, for which numpy's
+       stable sort is a radix sort, and the rest is hashing.
+
+    Args
+        dfL = sacct frames, oldest dump first
+
+    Returns
+        data frame like read_sacct_frame(), with a JobIDRaw column
+
+    Raises
+        ValueError if there are too many frames for a 16 bit priority
+    """
+    nframe = len(dfL)
+    # Ranks are 0 for steps and 1 + SACCT_STATE_RANK for toplevel rows
+    if 4 * nframe > np.iinfo(np.uint16).max:
+        raise ValueError("ERROR!!! Can't merge more than {} sacct frames".format(
+                         np.iinfo(np.uint16).max // 4))
+    frameL = []
+    for df in dfL:
+        # Normalize s.t. every frame has the same key column name
+        df = df.assign(JobIDRaw = jobidraw_column(df).to_numpy())
+        if 'JobID' in df.columns:
+            df = df.drop(columns=['JobID'])
+        frameL.append(df)
+    df = pd.concat(frameL, ignore_index=True)
+    frameV = np.repeat(np.arange(nframe, dtype=np.uint16),
+                       [frame.shape[0] for frame in frameL])
+    (jobnumS, dotS, _) = (df['JobIDRaw'].str.partition('.')[col] for col in range(3))
+    jobnumV = jobnumS.to_numpy()
+    # Steps rank below every toplevel row, they only decide for jobs without one
+    rankV = np.where(dotS.to_numpy() == '', sacct_state_rank(df['State']) + 1, 0)
+    priorityV = (rankV.astype(np.uint16) * nframe + frameV).astype(np.uint16)
+    orderV = np.argsort(priorityV, kind='stable')
+    winV = ~pd.Series(jobnumV[orderV]).duplicated(keep='last').to_numpy()
+    winnerS = pd.Series(frameV[orderV][winV], index=jobnumV[orderV][winV])
+    keepV = winnerS.reindex(jobnumV).to_numpy() == frameV
+    df = df[keepV]
+    # Within one dump the last row of a JobIDRaw wins, like sacct_store.py
+    df = df[~df['JobIDRaw'].duplicated(keep='last').to_numpy()]
+    return df.reset_index(drop=True)
+
+
+def read_sacct_frames(pathL : List[str] = None, nproc : int = None,
+                      cache : bool = True) -> pd.DataFrame :
+    """Read many sacct dumps with a pool of nproc processes and merge them, see
+       merge_sacct_frames()
+
+    Args
+        pathL = paths, oldest dump first, e.g. from sacct_paths()
+        nproc = number of processes, default os.cpu_count(), 1 reads serially
+                in this process
+        cache = see read_sacct_frame(), each dump is cached on its own
+
+    Returns
+        merged data frame, one record per job
+
+    Raises
+        ValueError if pathL is empty
+    """
+    if len(pathL) == 0:
+        raise ValueError("ERROR!!! No sacct files to read")
+    if len(pathL) == 1:
+        return merge_sacct_frames([read_sacct_frame(pathL[0], cache)])
+    if nproc == 1:
+        dfL = [read_sacct_frame(path, cache) for path in pathL]
+    else:
+        nproc = os.cpu_count() if nproc is None else nproc
+        with concurrent.futures.ProcessPoolExecutor(max_workers=nproc) as pool:
+            dfL = list(pool.map(read_sacct_frame, pathL, [cache] * len(pathL)))
+    return merge_sacct_frames(dfL)
+
+
+def iter_sacct_jobs(path : str = None, chunksize : int = 100000):
+    """Stream Job objects from a sacct file without holding the whole file, see
+       iter_sacct_frames()
+
+    Args
+        path      = path to parsable sacct file
+        chunksize = rows per read
+
+    Returns
+        generator of Job, in file order of the chunks
+
+    Raises
+        ValueError if a job has no toplevel entry
+    """
+    for df in iter_sacct_frames(path, chunksize):
+        for job in sacct_frame_to_jobs(df):
+            yield job
+
 
 # Parses output created by :
 #   sacct -p -a -S 2024-09-01 --format="job,jobname,user,node,elapsedraw,alloccpus,cputimeraw,maxrss,state,start,end,reqtres"
@@ -35,26 +583,45 @@ from classes import Job,Step,SacctObj,User,Node,Cluster
 #   1. Most job entries 3 entris
 #       a) There is a toplevel is the job
 #           #. Only line that has a username and a non-entry for reqtres
-#       #)
+#       #) Then the steps, e.g. 1234.batch, 1234.extern, 1234.0, ...
 #
-def parse_sacct_file(path : str = None):
+def parse_sacct_file(path : str = None, df : pd.DataFrame = None,
+                     chunksize : int = None, nproc : int = None):
     """Takes output from sacct in parsable mode, returns stuff
 
     Args
-
+        path = path to parsable sacct file, or comma separated paths / globs of
+               many dumps, see sacct_paths() and read_sacct_frames()
+        df   = already read sacct frame (e.g. from a sacct_store), path is
+               ignored if given
+        chunksize = if set, stream path chunksize rows at a time instead of
+                    reading it whole, see iter_sacct_jobs(). Many dumps are
+                    always read whole, they are merged per job.
+        nproc     = processes reading many dumps, see read_sacct_frames()
 
     Returns
+        totalgpuraw = sum of gputimeraw over all toplevel jobs
+        totalcpuraw = sum of cputimeraw over all toplevel jobs
+        jobL        = list of Job objects sorted by job number (as str), with
+                      chunksize only sorted within each chunk
+        starttime   = earliest start time
+        endtime     = latest end time
 
     Raises
+        ValueError if a job has no toplevel entry
 
     """
-    df = pd.read_csv(path, sep='|', na_filter=False)
-    ## group by jobid, strip off '.ext', '.batch' and step number appende by sact
-    #jobnum = df['JobIDRaw'].str.split('.', expand=True)[0]
-    #df['jobnum'] = jobnum
-    ## Get unique job numbers
-    jobL = []
-    uniqjobnumV = np.unique(df['JobIDRaw'].str.split('.', expand=True)[0])
+    if df is None:
+        pathL = sacct_paths(path)
+        if len(pathL) > 1:
+            df = read_sacct_frames(pathL, nproc)
+        path = pathL[0]
+    if df is not None:
+        jobL = sacct_frame_to_jobs(df)
+    elif chunksize is not None:
+        jobL = list(iter_sacct_jobs(path, chunksize))
+    else:
+        jobL = sacct_frame_to_jobs(read_sacct_frame(path))
     #if df['End'].iloc[0] != 'Unknown':
     #endtime   = datetime.datetime.strptime(df['End'].iloc[0], "%Y-%m-%dT%H:%M:%S")
     ### Pick absurd date in case first job is 'RUNNING'
@@ -63,66 +630,20 @@ def parse_sacct_file(path : str = None):
     #    endtime   = None
     #else:
     #raise ValueError("ERROR!!! endtime = {}".format(df['End'].iloc[0]))
-    starttime = datetime.datetime.strptime(df['Start'].iloc[0], "%Y-%m-%dT%H:%M:%S")
-
-    for jobid in uniqjobnumV:
-        jobdf = df[df['JobIDRaw'].str.contains(jobid)]
-        #### get toplevel job...
-        job = jobdf[~jobdf['JobIDRaw'].str.contains('\.')]       # top level job does not contain
-        jobname = job['JobName'].values[0]
-        user    = job['User'].values[0]
-        nodelist= job['NodeList'].values[0]
-        elapsedraw = job['ElapsedRaw'].values[0]
-        alloccpus  = job['AllocCPUS'].values[0]
-        cputimeraw = job['CPUTimeRAW'].values[0]
-        maxrss     = job['MaxRSS'].values[0]
-        state      = job['State'].values[0]
-        start      = job['Start'].values[0]
-        end        = job['End'].values[0]
-        reqtres    = job['ReqTRES'].values[0]
-        #
-        jobobj = Job(jobid=jobid, jobname=jobname, user=user, nodelist=nodelist,
-                     elapsedraw=elapsedraw, alloccpus=alloccpus,
-                     cputimeraw=cputimeraw, maxrss=maxrss, state=state,
-                     start=start, end=end, reqtres=reqtres)
-        ### Get job steps, batch/bash, extern
-        for line in jobdf[jobdf['JobIDRaw'].str.contains('\.')].iterrows() :
-            #job = # top level job does not contain
-            #line.jobid
-            jobname = line[1]['JobName']
-            user    = line[1]['User']
-            nodelist= line[1]['NodeList']
-            elapsedraw = line[1]['ElapsedRaw']
-            alloccpus  = line[1]['AllocCPUS']
-            cputimeraw = line[1]['CPUTimeRAW']
-            maxrss     = line[1]['MaxRSS']
-            state      = line[1]['State']
-            start      = line[1]['Start']
-            end        = line[1]['End']
-            reqtres    = line[1]['ReqTRES']
-            #jobid = jobid
-            sacctobj = SacctObj(jobid=jobid, jobname=jobname, nodelist=nodelist,
-                         elapsedraw=elapsedraw, alloccpus=alloccpus,
-                         cputimeraw=cputimeraw, state=state,
-                         start=start, end=end)
-            if 'batch' in line[1]['JobIDRaw']:
-                jobobj.batchL.append(sacctobj)
-            elif 'extern' in line[1]['JobIDRaw']:
-                jobobj.externL.append(sacctobj)
-            # Everything else must be a 'step', might screw me later.
-            else:
-                jobobj.stepL.append(sacctobj)
-        jobL.append(jobobj)
-
+    starttime = None
 
-        if jobobj.state != 'RUNNING' and endtime < jobobj.end:
+    for jobobj in jobL:
+        # PENDING jobs have neither start nor end, RUNNING ones no end
+        if (jobobj.state != 'RUNNING' and jobobj.end is not None and
+            endtime < jobobj.end):
             endtime = jobobj.end
         if jobobj.start is not None and endtime < jobobj.start:
             endtime = jobobj.start
 
-        if jobobj.start is not None and starttime > jobobj.start:
+        if jobobj.start is not None and (starttime is None or starttime > jobobj.start):
             starttime = jobobj.start
-        if jobobj.state != 'RUNNING' and starttime > jobobj.end:
+        if (jobobj.state != 'RUNNING' and jobobj.end is not None and
+            starttime is not None and starttime > jobobj.end):
             raise ValueError("ERROR!!! Does this ever happen?")
             starttime = jobobj.end
     print("Earliest Time : {}".format(starttime))
@@ -136,6 +657,94 @@ def parse_sacct_file(path : str = None):
     return(totalgpuraw, totalcpuraw, jobL, starttime, endtime)
 
 
+def sacct_frame_to_table(df : pd.DataFrame = None) -> JobTable :
+    """Build a JobTable from the toplevel rows of a sacct data frame
+
+    Args
+        df = data frame from pd.read_csv(path, sep='|', na_filter=False)
+
+    Returns
+        JobTable sorted by job number, see jobid_order()
+
+    Raises
+        ValueError listing the offending jobs, see sacct_frame_columns()
+    """
+    coldf = sacct_frame_columns(df)
+    topdf = coldf[(coldf['Step'] == '').to_numpy()]
+    # Keep job ids as str, array (1234_5) and het (1234+0) jobs aren't ints
+    topdf = topdf.iloc[jobid_order(topdf['JobNum'].to_numpy())]
+    userV, userL = pd.factorize(topdf['User'])
+    stateV, stateL = pd.factorize(topdf['State'])
+    startV = topdf['Start'].to_numpy()
+    endV   = topdf['End'].to_numpy()
+    elapsedrawV = topdf['ElapsedRaw'].to_numpy()
+    alloccpusV  = topdf['AllocCPUS'].to_numpy()
+    cputimerawV = topdf['CPUTimeRAW'].to_numpy()
+    ngpuV = sacct_reqtres_columns(topdf['ReqTRES'])['gpu'].fillna(0).to_numpy(dtype=np.int64)
+    (nodeptrV, nodeidxV, nodenameL) = nodelist_to_csr(topdf['NodeList'])
+    return JobTable(jobidV = topdf['JobNum'].to_numpy(), userV = userV,
+                    userL = list(userL), startV = startV, endV = endV,
+                    elapsedrawV = elapsedrawV, alloccpusV = alloccpusV,
+                    ngpuV = ngpuV, cputimerawV = cputimerawV,
+                    gputimerawV = ngpuV * elapsedrawV, stateV = stateV,
+                    stateL = list(stateL), nodeptrV = nodeptrV,
+                    nodeidxV = nodeidxV, nodenameL = nodenameL)
+
+
+def parse_sacct_table(path : str = None, df : pd.DataFrame = None,
+                      chunksize : int = None, nproc : int = None):
+    """Columnar alternative to parse_sacct_file(). Returns a JobTable instead of
+       a list of Job objects, steps are dropped.
+
+    Args
+        path = path to parsable sacct file, or comma separated paths / globs of
+               many dumps, see sacct_paths() and read_sacct_frames()
+        df   = already read sacct frame, path is ignored if given
+        chunksize = if set, stream path chunksize rows at a time, only the
+                    (much smaller) JobTable of each chunk is kept. Many dumps
+                    are always read whole, they are merged per job.
+        nproc     = processes reading many dumps, see read_sacct_frames()
+
+    Returns
+        totalgpuraw = sum of gputimeraw over all toplevel jobs
+        totalcpuraw = sum of cputimeraw over all toplevel jobs
+        jobtable    = JobTable
+        starttime   = earliest start time
+        endtime     = latest end time
+
+    Raises
+
+    """
+    if df is None:
+        pathL = sacct_paths(path)
+        if len(pathL) > 1:
+            df = read_sacct_frames(pathL, nproc)
+        path = pathL[0]
+    if df is not None:
+        jobtable = sacct_frame_to_table(df)
+    elif chunksize is not None:
+        jobtable = JobTable.concat([sacct_frame_to_table(chunkdf) for chunkdf in
+                                    iter_sacct_frames(path, chunksize)])
+        jobtable = jobtable[jobid_order(jobtable.jobidV)]
+    else:
+        jobtable = sacct_frame_to_table(read_sacct_frame(path))
+    startV = jobtable.startV[jobtable.startV != UNKNOWN_TIME]
+    endV   = jobtable.endV[jobtable.endV != UNKNOWN_TIME]
+    ### Same as parse_sacct_file() : no start if no job started (e.g. all
+    ### PENDING or a header only file), absurd end date if every job is 'RUNNING'
+    if len(startV) == 0:
+        starttime = None
+    else:
+        starttime = EPOCH + datetime.timedelta(seconds=int(np.min(startV)))
+    endtime   = EPOCH + datetime.timedelta(seconds=int(max(np.max(endV, initial=0),
+                                                          np.max(startV, initial=0))))
+    print("Earliest Time : {}".format(starttime))
+    print("Latest Time   : {}".format(endtime))
+    totalgpuraw = int(np.sum(jobtable.gputimerawV))
+    totalcpuraw = int(np.sum(jobtable.cputimerawV))
+    return(totalgpuraw, totalcpuraw, jobtable, starttime, endtime)
+
+
 def is_job_in_time_range(job : Job = None, mintime : datetime.datetime = None,
                          maxtime : datetime.datetime = None, verbose : bool = False):
     """Returns True or False if the job.start / job.end fall within the time range
@@ -224,6 +833,344 @@ def is_job_in_time_range(job : Job = None, mintime : datetime.datetime = None,
     return inrange,overlap
 
 
+def user_usage_table(jobtable : JobTable = None, mintime : datetime.datetime = None,
+                     maxtime : datetime.datetime = None) -> pd.DataFrame :
+    """Overlap weighted cpu / gpu time of every user in [mintime, maxtime] in one
+       pass over the jobs. Same numbers as calling is_job_in_time_range() on
+       every (user, job) pair, which is O(users x jobs).
+
+    Args
+        jobtable = JobTable
+        mintime  = start of time range
+        maxtime  = end of time range
+
+    Returns
+        pd.DataFrame indexed by user (sorted), every user in jobtable, with
+            njobs      = jobs in range with elapsedraw > 0
+            cputimeraw = cpu s in range
+            gputimeraw = gpu s in range
+
+    Raises
+    """
+    t0 = (mintime - EPOCH).total_seconds()
+    tn = (maxtime - EPOCH).total_seconds()
+    startV = jobtable.startV
+    endV   = jobtable.endV
+    elapsedV = jobtable.elapsedrawV
+    inrangeV = ((startV != UNKNOWN_TIME) & (endV != UNKNOWN_TIME) &
+                (endV >= t0) & (startV <= tn) & (elapsedV > 0))
+    overlapV = np.zeros(len(jobtable))
+    overlapV[inrangeV] = (np.minimum(endV[inrangeV], tn) -
+                          np.maximum(startV[inrangeV], t0)) / elapsedV[inrangeV]
+    nuser = len(jobtable.userL)
+    usagedf = pd.DataFrame({
+        'njobs'      : np.bincount(jobtable.userV, weights=inrangeV,
+                                   minlength=nuser).astype(np.int64),
+        'cputimeraw' : np.bincount(jobtable.userV, minlength=nuser,
+                                   weights=jobtable.cputimerawV * overlapV),
+        'gputimeraw' : np.bincount(jobtable.userV, minlength=nuser,
+                                   weights=jobtable.gputimerawV * overlapV)},
+        index=pd.Index(jobtable.userL, name='user'))
+    # Users without a job in the table (e.g. after subset()) are dropped
+    usedV = np.bincount(jobtable.userV, minlength=nuser) > 0
+    return usagedf[usedV].sort_index()
+
+
+def sort_user_usage(usagedf : pd.DataFrame = None, column : str = None):
+    """Users and their time by decreasing time, ties keep user order, ready for
+       plot_funcs.make_pie()
+
+    Args
+        usagedf = from user_usage_table()
+        column  = 'cputimeraw' or 'gputimeraw'
+
+    Returns
+        nameL = user names
+        timeL = time of each user
+
+    Raises
+    """
+    valueV = usagedf[column].to_numpy()
+    orderV = np.argsort(-valueV, kind='stable')
+    return([usagedf.index[i] for i in orderV], valueV[orderV].tolist())
+
+
+def job_gpu_utilization(jobtable : JobTable = None, nodeL : List[Node] = None,
+                        ) -> pd.DataFrame :
+    """Join jobs against the per gpu utilization of the nodes they ran on. For
+       every (job, node) pair the node's cumulative integrals are evaluated at
+       the job's start / end (two binary searches per gpu), then summed per job.
+       Cost is O(pairs * gpus * log(samples)), no loop over jobs.
+
+       sacct doesn't say WHICH gpus of a node a job held, so the mean is over
+       every gpu of the job's nodes. It is exact for jobs that fill their nodes
+       and includes other jobs' gpus otherwise.
+
+    Args
+        jobtable = JobTable
+        nodeL    = list of Node, e.g. Cluster.nodeL from read_gpu_util()
+
+    Returns
+        pd.DataFrame, one row per job with ngpu > 0 and a known start / end
+            jobid, user, ngpu, gputimeraw
+            meanutil     = time weighted mean % of the gpus, NaN without data
+            coverage     = fraction of gpu * job time with data
+            idlegputime  = gputimeraw * (1 - meanutil / 100), gpu s left idle
+
+    Raises
+    """
+    keepV = ((jobtable.ngpuV > 0) & (jobtable.startV != UNKNOWN_TIME) &
+             (jobtable.endV != UNKNOWN_TIME) & (jobtable.endV > jobtable.startV))
+    jobtable = jobtable.subset(keepV)
+    # (job, node) pairs from the CSR, node ids mapped onto nodeL
+    nodeD  = {node.name : i for i, node in enumerate(nodeL)}
+    mapV   = np.array([nodeD.get(name, -1) for name in jobtable.nodenameL] + [-1],
+                      dtype=np.int64)
+    pairjobV  = np.repeat(np.arange(len(jobtable)), np.diff(jobtable.nodeptrV))
+    pairnodeV = mapV[jobtable.nodeidxV]
+    integralV = np.zeros(len(jobtable))
+    coverV    = np.zeros(len(jobtable))
+    durationV = np.zeros(len(jobtable))
+    # Sort pairs by node s.t. each node's integrals are evaluated once
+    orderV = np.argsort(pairnodeV, kind='stable')
+    boundV = np.searchsorted(pairnodeV[orderV], np.arange(-1, len(nodeL) + 1))
+    for i, node in enumerate(nodeL):
+        idxV = pairjobV[orderV[boundV[i+1]:boundV[i+2]]]
+        if idxV.shape[0] == 0:
+            continue
+        (startintV, startcovV) = node.util_integral(jobtable.startV[idxV])
+        (endintV, endcovV) = node.util_integral(jobtable.endV[idxV])
+        np.add.at(integralV, idxV, endintV - startintV)
+        np.add.at(coverV, idxV, endcovV - startcovV)
+        np.add.at(durationV, idxV, (jobtable.endV[idxV] - jobtable.startV[idxV]) *
+                  len(node.gpuL))
+    # Nodes without utilization files count as not covered, with as many gpus
+    # as a typical node of nodeL (or the job's gpus per node without any)
+    idxV = pairjobV[orderV[boundV[0]:boundV[1]]]
+    if len(nodeL) > 0:
+        ngpuV = np.full(idxV.shape[0], np.median([len(node.gpuL) for node in nodeL]))
+    else:
+        ngpuV = jobtable.ngpuV[idxV] / np.diff(jobtable.nodeptrV)[idxV]
+    np.add.at(durationV, idxV, (jobtable.endV[idxV] - jobtable.startV[idxV]) * ngpuV)
+    meanV = np.full(len(jobtable), np.nan)
+    np.divide(integralV, coverV, out=meanV, where=coverV > 0)
+    coverageV = np.zeros(len(jobtable))
+    np.divide(coverV, durationV, out=coverageV, where=durationV > 0)
+    return pd.DataFrame({'jobid' : jobtable.jobidV,
+                         'user' : np.array(jobtable.userL + [''],
+                                           dtype=object)[jobtable.userV],
+                         'ngpu' : jobtable.ngpuV,
+                         'gputimeraw' : jobtable.gputimerawV,
+                         'meanutil' : meanV, 'coverage' : coverageV,
+                         'idlegputime' : jobtable.gputimerawV * (1 - meanV / 100)})
+
+
+def user_gpu_utilization(jobutildf : pd.DataFrame = None) -> pd.DataFrame :
+    """Per user summary of job_gpu_utilization(), jobs without data are skipped
+
+    Args
+        jobutildf = from job_gpu_utilization()
+
+    Returns
+        pd.DataFrame indexed by user, sorted by decreasing idlegputime
+            njobs       = jobs with data
+            gputimeraw  = gpu s allocated by those jobs
+            meanutil    = gpu time weighted mean % of those jobs
+            idlegputime = gpu s allocated but idle
+
+    Raises
+    """
+    df = jobutildf[jobutildf['coverage'] > 0]
+    df = df.assign(weighted = df['meanutil'] * df['gputimeraw'])
+    userdf = df.groupby('user').agg(njobs = ('jobid', 'size'),
+                                    gputimeraw = ('gputimeraw', 'sum'),
+                                    weighted = ('weighted', 'sum'),
+                                    idlegputime = ('idlegputime', 'sum'))
+    userdf['meanutil'] = userdf['weighted'] / userdf['gputimeraw']
+    userdf = userdf[['njobs', 'gputimeraw', 'meanutil', 'idlegputime']]
+    return userdf.sort_values('idlegputime', ascending=False, kind='stable')
+
+
+def resample_util(series = None, start : datetime.datetime = None,
+                  end : datetime.datetime = None,
+                  interval : float = None) -> pd.DataFrame :
+    """Time weighted mean utilization of a Gpu, Node or TotalGpu on the grid of
+       time_grid(). Irregular samples, consolidation boundaries and 'no data'
+       are handled by the cumulative integrals, see Gpu.util_integral(), so the
+       cost is one binary search per bin edge.
+
+    Args
+        series   = Gpu, Node or TotalGpu, anything with resample(edgeV)
+        start    = start of first interval
+        end      = last interval starts at or before end
+        interval = width of interval in s
+
+    Returns
+        pd.DataFrame indexed by the mid point of each interval with util (%, NaN
+        without data) and coverage (fraction of the interval with data)
+
+    Raises
+        ValueError if the grid is invalid
+    """
+    (edgeV, midV) = time_grid(start, end, interval)
+    (meanV, coverageV) = series.resample(edgeV)
+    return pd.DataFrame({'util' : meanV, 'coverage' : coverageV}, index=midV)
+
+
+def bin_job_overlap(jobtable : JobTable = None, start : datetime.datetime = None,
+                    end : datetime.datetime = None, interval : float = None,
+                    cpuorgpu : str = None):
+    """Overlap weighted cpu / gpu time of every job in every interval, per user.
+       Vectorized replacement for calling is_job_in_time_range() on every
+       (interval, job) pair. Cost is O(jobs + users * intervals).
+
+       Intervals are [start + k*interval, start + (k+1)*interval] for every k
+       with start + k*interval <= end. A job contributes
+       (gpu|cpu)timeraw * overlap / elapsedraw to each interval. Jobs with an
+       unknown start or end (e.g. RUNNING) are skipped, like in
+       is_job_in_time_range().
+
+    Args
+        jobtable = JobTable
+        start    = start of first interval
+        end      = last interval starts at or before end
+        interval = width of interval in s
+        cpuorgpu = 'cpu' or 'gpu'
+
+    Returns
+        pd.DataFrame indexed by the mid point of each interval, a column for each
+        user with a job in range and a 'total' column
+
+    Raises
+        ValueError for invalid cpuorgpu
+    """
+    if cpuorgpu.lower() == 'gpu':
+        rawV = jobtable.gputimerawV
+    elif cpuorgpu.lower() == 'cpu':
+        rawV = jobtable.cputimerawV
+    else:
+        raise ValueError("ERROR!!! Invalid value for cpuorgpu"
+                         " {}".format(cpuorgpu))
+    (edgeV, midV) = time_grid(start, end, interval)
+    nbin   = midV.shape[0]
+    width  = edgeV[1] - edgeV[0]
+    t0     = edgeV[0]
+    tn     = edgeV[-1]
+    print("{}   --->   {} : {} intervals".format(start.strftime("%Y-%m-%d"),
+          end.strftime("%Y-%m-%d"), nbin))
+
+    startV = jobtable.startV
+    endV   = jobtable.endV
+    # Same as 'inrange' in is_job_in_time_range() for at least one interval
+    inrangeV = ((startV != UNKNOWN_TIME) & (endV != UNKNOWN_TIME) &
+                (endV >= t0) & (startV <= tn))
+    idxV    = np.nonzero(inrangeV)[0]
+    # Rate, i.e. number of cpus or gpus. elapsedraw == 0 contributes nothing
+    elapsedV = jobtable.elapsedrawV[idxV]
+    rateV   = np.zeros(idxV.shape[0])
+    np.divide(rawV[idxV], elapsedV, out=rateV, where=elapsedV > 0)
+    csV     = np.maximum(startV[idxV], t0)
+    ceV     = np.minimum(endV[idxV], tn)
+    ksV     = np.clip(np.floor((csV - t0) / width).astype(np.int64), 0, nbin - 1)
+    keV     = np.clip(np.floor((ceV - t0) / width).astype(np.int64), 0, nbin - 1)
+    # Users are columns, keep order of first appearance
+    usercodeV, userV = pd.factorize(jobtable.userV[idxV])
+    nuser   = userV.shape[0]
+    userL   = [jobtable.userL[u] for u in userV]
+    rowV    = usercodeV * (nbin + 1)
+    size    = nuser * (nbin + 1)
+
+    # 1. Partial first / last interval, or the whole job if within one interval
+    sameV   = ksV == keV
+    firstV  = np.where(sameV, ceV - csV, edgeV[ksV + 1] - csV)
+    lastV   = np.where(sameV, 0, ceV - edgeV[keV])
+    partV   = (np.bincount(rowV + ksV, weights=rateV * firstV, minlength=size) +
+               np.bincount(rowV + keV, weights=rateV * lastV, minlength=size))
+    # 2. Fully covered intervals in between via a difference array
+    fullV   = ~sameV
+    diffV   = (np.bincount(rowV[fullV] + ksV[fullV] + 1,
+                           weights=rateV[fullV] * width, minlength=size) -
+               np.bincount(rowV[fullV] + keV[fullV],
+                           weights=rateV[fullV] * width, minlength=size))
+    partM   = partV.reshape(nuser, nbin + 1)
+    diffM   = diffV.reshape(nuser, nbin + 1)
+    userM   = (partM + np.cumsum(diffM, axis=1))[:, :nbin]
+
+    df = pd.DataFrame(userM.T, index=midV, columns=userL)
+    df['total'] = np.sum(userM, axis=0)
+    return df
+
+
+def print_allocation_query(curve : AllocationCurve = None,
+                           mintime : datetime.datetime = None,
+                           maxtime : datetime.datetime = None,
+                           totalsysgputime : float = None,
+                           totalsyscputime : float = None):
+    """Print gpu / cpu hours allocated per user in [mintime, maxtime]
+
+    Args
+        curve   = AllocationCurve
+        mintime = start of window
+        maxtime = end of window
+        totalsysgputime = gpu seconds available in window
+        totalsyscputime = cpu seconds available in window
+
+    Returns
+        pd.DataFrame from AllocationCurve.query_all()
+
+    Raises
+    """
+    df = curve.query_all(mintime, maxtime)
+    print("Allocation from {} to {}".format(mintime, maxtime))
+    print("\t{:<12} : {:>12} {:>8} {:>12} {:>8}".format("user", "gpu (h)", "gpu %",
+                                                       "cpu (h)", "cpu %"))
+    for name, row in df.iterrows():
+        print("\t{:<12} : {:>12.2f} {:>8.2f} {:>12.2f} {:>8.2f}".format(name,
+              row['gputimeraw'] / 3600, row['gputimeraw'] / totalsysgputime * 100,
+              row['cputimeraw'] / 3600, row['cputimeraw'] / totalsyscputime * 100))
+    return df
+
+
+def print_peak_query(timeline : OccupancyTimeline = None,
+                     mintime : datetime.datetime = None,
+                     maxtime : datetime.datetime = None,
+                     capacityD : dict = None):
+    """Print the peak and mean concurrent gpus, cpus, jobs and busy nodes in
+       [mintime, maxtime), then the peak gpus of every node
+
+    Args
+        timeline  = OccupancyTimeline
+        mintime   = start of window
+        maxtime   = end of window
+        capacityD = column : capacity, e.g. {'gpus' : nnodes * ngpupernode},
+                    columns without a capacity print no %
+
+    Returns
+        pd.DataFrame from OccupancyTimeline.peak_all() of the gpus
+
+    Raises
+    """
+    capacityD = dict() if capacityD is None else capacityD
+    print("Concurrency from {} to {}".format(mintime, maxtime))
+    print("\t{:<8} : {:>8} {:>8} {:>20} {:>10}".format("", "peak", "peak %",
+                                                      "peak time", "mean"))
+    for column in OCCUPANCY_COLUMNS:
+        df = timeline.peak_all(mintime, maxtime, column)
+        row = df.loc['total']
+        if column in capacityD:
+            percent = "{:>8.2f}".format(row['peak'] / capacityD[column] * 100)
+        else:
+            percent = "{:>8}".format("-")
+        print("\t{:<8} : {:>8} {} {:>20} {:>10.2f}".format(column, row['peak'],
+              percent, str(row['peaktime']), row['mean']))
+    df = timeline.peak_all(mintime, maxtime, 'gpus')
+    print("Peak gpus per node")
+    for name, row in df.iloc[1:].iterrows():
+        print("\t{:<12} : {:>4} at {:<20} mean {:.2f}".format(name, row['peak'],
+              str(row['peaktime']), row['mean']))
+    return df
+
+
 def group_users_by_usage(userL : List[str] = None, timeV : ArrayLike = None,
                          thresh : float = None):
     """Take a list of users and user cpu/gpu times and group s.t. you can plot
@@ -302,73 +1249,162 @@ def make_autopct(percentusertimeV : ArrayLike = None, usernameV : List[str] = No
     #return '{p"poop"
 
 
-def read_gpu_util(path : str = None, excludenodeL : list = None):
-    """Read directory with ALL node*_gputemp_gpu*.txt files
+def gpu_util_manifest(path : str = None, excludenodeL : list = None):
+    """List path once and map the utilization files from collect_data.sh to
+       (node, gpu, resolution). The per gpu raw files are *_10s.txt while the
+       total is totalgpuutilization_2min.txt, both are the '2min' resolution.
+       Compressed files (e.g. *_10s.txt.gz) are recognised too, the plain one
+       is used if both exist.
 
     Args :
-        path = path to directory with node*_gputemp_gpu*.txt file
+        path         = path to directory with node*_gpuutil_gpu*.txt files
+        excludenodeL = node names to skip
 
     Returns
+        gpuD   = {resolution : {node : {gidx : path}}}
+        totalD = {resolution : path of totalgpuutilization_*.txt}
 
     Raises
 
     """
-    fileL = os.listdir(path)
-
-    # Gather list of nodes
-    nodenameL = []
-    for fin in fileL:
-        if 'gpuutil' not in fin or '.swp' in fin:
+    excludeD = set([] if excludenodeL is None else excludenodeL)
+    gpuD = {resolution : dict() for resolution in UTIL_RESOLUTIONS}
+    totalD = dict()
+    for fin in sorted(os.listdir(path)):
+        match = GPU_UTIL_FILE.match(fin)
+        if match is not None:
+            resolution = UTIL_RESOLUTION_ALIAS.get(match.group(3), match.group(3))
+            if match.group(1) in excludeD or resolution not in gpuD:
+                continue
+            nodeD = gpuD[resolution].setdefault(match.group(1), dict())
+            # Sorted, so x.txt comes before x.txt.gz
+            nodeD.setdefault(int(match.group(2)), os.path.join(path, fin))
             continue
-        if excludenodeL is not None :
-            for excludenode in excludenodeL:
-                if excludenode in fin:
-                    continue
-        nodename = fin.split('_')[0]
-        if nodename not in nodenameL:
-            nodenameL.append(nodename)
+        match = TOTAL_UTIL_FILE.match(fin)
+        if match is not None:
+            resolution = UTIL_RESOLUTION_ALIAS.get(match.group(1), match.group(1))
+            totalD.setdefault(resolution, os.path.join(path, fin))
+    return(gpuD, totalD)
+
+
+def open_gpu_util(path : str = None, resolution : str = '2min',
+                  excludenodeL : list = None, start : int = None,
+                  end : int = None, manifest : tuple = None) -> Cluster :
+    """Cluster of one resolution without reading any utilization file, each
+       Gpu is read on first use (see Gpu). With a window only the part of each
+       file overlapping [start, end) is read.
+
+    Args :
+        path         = path to directory with node*_gpuutil_gpu*.txt file
+        resolution   = one of UTIL_RESOLUTIONS
+        excludenodeL = node names to skip, e.g. nodes with MIGs enabled
+        start        = s since EPOCH, None is the beginning of the files
+        end          = s since EPOCH, None is the end of the files
+        manifest     = (gpuD, totalD) from gpu_util_manifest(), saves listing
+                       path again
+
+    Returns
+        Cluster, nodes sorted by name and gpus by index
+
+    Raises
+        ValueError if the resolution is unknown, there are no node files or the
+        total file is missing
+    """
+    if resolution not in UTIL_RESOLUTIONS:
+        raise ValueError("ERROR!!! Invalid resolution {}, options : {}".format(
+                         resolution, ", ".join(UTIL_RESOLUTIONS)))
+    if manifest is None:
+        manifest = gpu_util_manifest(path, excludenodeL)
+    (gpuD, totalD) = manifest
+    if len(gpuD[resolution]) == 0:
+        raise ValueError("ERROR!! No {} files found".format(resolution))
+    if resolution not in totalD:
+        raise ValueError("ERROR!!! No totalgpuutilization_{}.txt in {}".format(
+                         resolution, path))
+    nodeL = []
+    for name in sorted(gpuD[resolution]):
+        nodeD = gpuD[resolution][name]
+        nodeL.append(Node([nodeD[gidx] for gidx in sorted(nodeD)], start=start,
+                          end=end, lazy=True))
+    return Cluster(nodeL, totalD[resolution], start=start, end=end, lazy=True)
+
+
+def load_util_file(gpupath : str = None, start : int = None,
+                   end : int = None) -> UtilSeries :
+    """UtilSeries(...), module level s.t. it can be sent to a process pool"""
+    return UtilSeries(gpupath, start, end)
+
+
+def load_gpus(gpuL : List[Gpu] = None, nproc : int = None):
+    """Read the files of many lazy Gpus with a pool of nproc processes and pin
+       the samples to them, see Gpu.load()
+
+    Args :
+        gpuL  = list of Gpu
+        nproc = number of processes, default os.cpu_count(), 1 reads serially
+                in this process
+
+    Returns
+
+    Raises
+        ValueError if a file can't be parsed
+    """
+    if nproc == 1 or len(gpuL) < 2:
+        for gpu in gpuL:
+            gpu.load()
+        return
+    nproc = os.cpu_count() if nproc is None else nproc
+    with concurrent.futures.ProcessPoolExecutor(max_workers=nproc) as pool:
+        seriesL = pool.map(load_util_file, [gpu.gpupath for gpu in gpuL],
+                           [gpu.window[0] for gpu in gpuL],
+                           [gpu.window[1] for gpu in gpuL],
+                           chunksize=max(1, len(gpuL) // (4 * nproc)))
+        for gpu, series in zip(gpuL, seriesL):
+            gpu.pinned = series
+
+
+def read_gpu_util(path : str = None, excludenodeL : list = None,
+                  nproc : int = None, resolutionL : List[str] = None):
+    """Read directory with ALL node*_gpuutil_gpu*.txt files. The directory is
+       listed once (see gpu_util_manifest()) and the files are parsed by a pool
+       of nproc processes. Nodes are sorted by name and gpus by index, whatever
+       order the files finish in.
+
+    Args :
+        path         = path to directory with node*_gpuutil_gpu*.txt file
+        excludenodeL = node names to skip, e.g. nodes with MIGs enabled
+        nproc        = number of processes, default os.cpu_count(), 1 reads
+                       serially in this process
+        resolutionL  = resolutions to read, default UTIL_RESOLUTIONS. The others
+                       aren't opened at all, their files may be missing
+
+    Returns
+        cluster2min, cluster1h, cluster1d = Cluster for each resolution, None
+                                            if not in resolutionL
+
+    Raises
+        ValueError if there are no node files or a total file of resolutionL is
+        missing
+    """
+    (gpuD, totalD) = gpu_util_manifest(path, excludenodeL)
+    nodenameL = sorted(set(name for nodeD in gpuD.values() for name in nodeD))
 
     # Only do utilization
     if len(nodenameL) == 0:
         raise ValueError("ERROR!! No files found")
     else:
         print("{} nodes found : ".format(len(nodenameL)))
-        for n in sorted(nodenameL):
+        for n in nodenameL:
             print("\t{}".format(n))
 
-    # 2min - THIS REALLY ISN'T 2min, more like 10s.
-    node2minL = []
-    for nodename in nodenameL:
-        if nodename == 'totalgpuutilization':
-            continue
-        gpupathL = glob.glob("{}/{}_gpuutil_*_2min.txt".format(path,nodename))
-        node = Node(gpupathL=gpupathL)
-        node2minL.append(node)
-    gpupath = "{}/totalgpuutilization_2min.txt".format(path,nodename)
-    cluster2min = Cluster(node2minL, gpupath)
-
-    # 1 hour
-    node1hL = []
-    for nodename in nodenameL:
-        if nodename == 'totalgpuutilization':
-            continue
-        gpupathL = glob.glob("{}/{}_gpuutil_*_1h.txt".format(path,nodename))
-        node = Node(gpupathL=gpupathL)
-        node1hL.append(node)
-    gpupath = "{}/totalgpuutilization_1h.txt".format(path,nodename)
-    cluster1h = Cluster(node1hL, gpupath)
-
-    # 1 day
-    node1dL = []
-    for nodename in nodenameL:
-        if nodename == 'totalgpuutilization':
-            continue
-        gpupathL = glob.glob("{}/{}_gpuutil_*_1d.txt".format(path,nodename))
-        node = Node(gpupathL=gpupathL)
-        node1dL.append(node)
-    gpupath = "{}/totalgpuutilization_1d.txt".format(path,nodename)
-    cluster1d = Cluster(node1dL, gpupath)
-
+    resolutionL = UTIL_RESOLUTIONS if resolutionL is None else resolutionL
+    clusterL = [open_gpu_util(path, resolution, manifest=(gpuD, totalD))
+                if resolution in resolutionL else None
+                for resolution in UTIL_RESOLUTIONS]
+    # One pool over every file s.t. it balances files, not nodes
+    load_gpus([gpu for cluster in clusterL if cluster is not None
+               for gpu in cluster.gpuL], nproc)
+    (cluster2min, cluster1h, cluster1d) = clusterL
     return(cluster2min, cluster1h, cluster1d)
 
 
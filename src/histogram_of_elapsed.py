@@ -39,6 +39,8 @@ from plot_funcs import plot_time_series_mpl
 from plot_funcs import plot_time_series_plotly
 from functions import make_autopct
 from functions import parse_sacct_file
+from functions import sacct_paths
+from functions import read_sacct_frames
 from functions import is_job_in_time_range
 
 
@@ -62,10 +64,11 @@ def main():
     parser = argparse.ArgumentParser(
                     description="This generates plots from output of `sacct`")
     parser.add_argument('--path', metavar='path/to/sacct_text_file', type=str,
-                        help='Path to parsable sacct file')
+                        help='Path to parsable sacct file, or comma separated '
+                             'paths / globs of overlapping dumps, merged per job')
     args = parser.parse_args()
     path = args.path
-    df = pd.read_csv(path, sep='|', na_filter=False)
+    df = read_sacct_frames(sacct_paths(path))
 
     fig = plt.figure()
     gs = fig.add_gridspec(1,1)
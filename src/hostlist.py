@@ -0,0 +1,337 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Expand Slurm hostlist expressions, e.g. node[06-08,13],gpu[1-2]-ib[0-1]
+#   2. Only expand each distinct nodelist once, map node names to integer ids
+#
+# Refs :
+#   a) `man scontrol`, see 'show hostnames'
+#   b) https://slurm.schedmd.com/sbatch.html#OPT_nodelist
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# There are only a few thousand distinct nodelists across millions of sacct
+# rows, so expansions are memoized by the nodelist string. A HostList interns
+# node names to int32 ids s.t. node filters / per node sums are array operations.
+#
+import fnmatch
+import functools
+import numpy as np
+import pandas as pd
+from typing import List
+
+# Max number of distinct nodelists kept by expand_hostlist()
+HOSTLIST_CACHE_SIZE = 2**16
+# Bits per word of the bitsets returned by HostList.bitsets()
+BITS_PER_WORD = 64
+
+
+def split_hostlist(expr : str = None) -> List[str] :
+    """Split a hostlist on the commas that are NOT inside brackets
+
+    Args
+        expr = hostlist, e.g. a[01-02,05],b03
+
+    Returns
+        list of host patterns, e.g. ['a[01-02,05]', 'b03']
+
+    Raises
+        ValueError if the brackets are unbalanced
+    """
+    patternL = []
+    depth = 0
+    begin = 0
+    for i, char in enumerate(expr):
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+            if depth < 0:
+                raise ValueError("ERROR!!! Unbalanced ']' in {}".format(expr))
+        elif char == ',' and depth == 0:
+            patternL.append(expr[begin:i])
+            begin = i + 1
+    if depth != 0:
+        raise ValueError("ERROR!!! Unbalanced '[' in {}".format(expr))
+    patternL.append(expr[begin:])
+    return patternL
+
+
+def expand_range(rangeS : str = None) -> List[str] :
+    """Expand the inside of one bracket group. Zero padding is taken from the
+       lower bound, i.e. 06-10 -> 06,07,...,10 and 6-10 -> 6,7,...,10
+
+    Args
+        rangeS = e.g. 06-08,13
+
+    Returns
+        list of str, e.g. ['06', '07', '08', '13']
+
+    Raises
+        ValueError if a range is not numeric or decreasing
+    """
+    valueL = []
+    for nr in rangeS.split(','):
+        if '-' not in nr:
+            valueL.append(nr)
+            continue
+        (lo, hi) = nr.split('-', 1)
+        if not lo.isdigit() or not hi.isdigit() or int(lo) > int(hi):
+            raise ValueError("ERROR!!! Invalid range {} in [{}]".format(nr, rangeS))
+        width = len(lo)
+        valueL.extend([str(i).zfill(width) for i in range(int(lo), int(hi) + 1)])
+    return valueL
+
+
+def expand_pattern(pattern : str = None) -> List[str] :
+    """Expand a single host pattern, every bracket group multiplies out, e.g.
+       r[1-2]n[01-02] -> r1n01,r1n02,r2n01,r2n02
+
+    Args
+        pattern = host pattern without top level commas
+
+    Returns
+        list of node names
+
+    Raises
+        ValueError if the brackets are unbalanced
+    """
+    begin = pattern.find('[')
+    if begin == -1:
+        return [pattern]
+    end = pattern.find(']', begin)
+    if end == -1:
+        raise ValueError("ERROR!!! Unbalanced '[' in {}".format(pattern))
+    stem = pattern[:begin]
+    tailL = expand_pattern(pattern[end+1:])
+    return ["{}{}{}".format(stem, value, tail) for value in
+            expand_range(pattern[begin+1:end]) for tail in tailL]
+
+
+@functools.lru_cache(maxsize=HOSTLIST_CACHE_SIZE)
+def _expand_hostlist(expr : str = None) -> tuple :
+    """Memoized part of expand_hostlist(), tuple s.t. callers can't mutate it"""
+    return tuple(node for pattern in split_hostlist(expr)
+                 for node in expand_pattern(pattern))
+
+
+def expand_hostlist(expr : str = None) -> List[str] :
+    """Expand a Slurm hostlist expression, e.g.
+       a[01-02],b03        -> [a01, a02, b03]
+       node[06-08,13]      -> [node06, node07, node08, node13]
+       r[1-2]-n[1-2]       -> [r1-n1, r1-n2, r2-n1, r2-n2]
+       Strings without brackets or commas, e.g. 'None assigned', are kept as is
+
+    Args
+        expr = hostlist from sacct NodeList
+
+    Returns
+        new list of node names
+
+    Raises
+        ValueError if the brackets or ranges are malformed
+    """
+    return list(_expand_hostlist(expr))
+
+
+def resolve_nodes(patternS : str = None, nameL : List[str] = None) -> List[str] :
+    """Resolve a comma separated list of node patterns to node names. Patterns
+       with '*' or '?' are globs matched against nameL, everything else is a
+       hostlist expression, e.g. 'rceabrg[01-02],dgx*'
+
+    Args
+        patternS = patterns, e.g. from --exclude_nodes
+        nameL    = known node names, only used by globs
+
+    Returns
+        list of unique node names, in pattern order
+
+    Raises
+        ValueError if a hostlist expression is malformed
+    """
+    nodeD = dict()
+    for pattern in split_hostlist(patternS):
+        if '*' in pattern or '?' in pattern:
+            matchL = fnmatch.filter(nameL, pattern)
+        else:
+            matchL = _expand_hostlist(pattern)
+        for name in matchL:
+            nodeD[name] = True
+    return list(nodeD.keys())
+
+
+def select_nodes(nameL : List[str] = None, includeS : str = None,
+                 excludeS : str = None):
+    """Resolve --include_nodes / --exclude_nodes style patterns, see
+       resolve_nodes()
+
+    Args
+        nameL    = known node names, e.g. JobTable.nodenameL
+        includeS = patterns of nodes to keep, None keeps every node
+        excludeS = patterns of nodes to drop, None drops none
+
+    Returns
+        includenodeL = resolved included nodes minus excluded ones, [] if
+                       includeS is None
+        excludenodeL = resolved excluded nodes
+
+    Raises
+        ValueError if a hostlist expression is malformed
+    """
+    excludenodeL = [] if excludeS is None else resolve_nodes(excludeS, nameL)
+    if includeS is None:
+        return([], excludenodeL)
+    excludeD = set(excludenodeL)
+    includenodeL = [name for name in resolve_nodes(includeS, nameL)
+                    if name not in excludeD]
+    return(includenodeL, excludenodeL)
+
+
+class HostList :
+    """Interns node names to int32 ids. Nodelists are expanded once each and
+       cached as id arrays, tables of nodelists become CSR arrays or bitsets"""
+
+    def __init__(self, nameL : List[str] = None):
+        """Initialize HostList
+
+        Args :
+            nameL : node names to intern first, keeps their ids stable
+
+        Returns :
+
+        Raises :
+
+        """
+        self.nameL = []
+        self.idD   = dict()
+        self.idsD  = dict()
+        for name in ([] if nameL is None else nameL):
+            self.intern(name)
+
+
+    def __len__(self) -> int :
+        return len(self.nameL)
+
+
+    def intern(self, name : str = None) -> int :
+        """Id of node name, a new id is assigned on first use"""
+        nodeid = self.idD.get(name)
+        if nodeid is None:
+            nodeid = len(self.nameL)
+            self.idD[name] = nodeid
+            self.nameL.append(name)
+        return nodeid
+
+
+    def ids(self, expr : str = None) -> np.ndarray :
+        """Node ids of a hostlist, memoized by expr
+
+        Args :
+            expr : hostlist, e.g. node[06-08,13]
+
+        Returns :
+            read only int32 np.ndarray
+
+        Raises :
+            ValueError if expr is malformed
+        """
+        idV = self.idsD.get(expr)
+        if idV is None:
+            idV = np.array([self.intern(name) for name in _expand_hostlist(expr)],
+                           dtype=np.int32)
+            idV.setflags(write=False)
+            self.idsD[expr] = idV
+        return idV
+
+
+    def lookup(self, nameL : List[str] = None) -> np.ndarray :
+        """Ids of already interned node names, unknown names are dropped"""
+        return np.array([self.idD[name] for name in nameL if name in self.idD],
+                        dtype=np.int32)
+
+
+    def encode(self, nodelistS : pd.Series = None):
+        """Expand a column of nodelists into a CSR node index. Each distinct
+           nodelist string is only expanded once.
+
+        Args :
+            nodelistS : pd.Series of nodelists
+
+        Returns :
+            nodeptrV  = int64 offsets, len(nodelistS) + 1
+            nodeidxV  = int32 ids, see self.nameL
+
+        Raises :
+
+        """
+        codeV, uniqL = pd.factorize(nodelistS)
+        uniqidL = [self.ids(nodelist) for nodelist in uniqL]
+        uniqcountV = np.array([idV.shape[0] for idV in uniqidL], dtype=np.int64)
+        uniqptrV = np.zeros(len(uniqidL) + 1, dtype=np.int64)
+        uniqptrV[1:] = np.cumsum(uniqcountV)
+        if len(uniqidL) > 0:
+            flatV = np.concatenate(uniqidL)
+        else:
+            flatV = np.zeros(0, dtype=np.int32)
+        # Gather the expanded node ids of each row without a python loop over rows
+        countV = uniqcountV[codeV]
+        nodeptrV = np.zeros(codeV.shape[0] + 1, dtype=np.int64)
+        nodeptrV[1:] = np.cumsum(countV)
+        offsetV = np.arange(nodeptrV[-1]) - np.repeat(nodeptrV[:-1], countV)
+        nodeidxV = flatV[np.repeat(uniqptrV[codeV], countV) + offsetV]
+        return(nodeptrV, nodeidxV)
+
+
+    def bitset(self, idV : np.ndarray = None, nword : int = None) -> np.ndarray :
+        """Bitset of node ids, bit i of word i // BITS_PER_WORD is node i
+
+        Args :
+            idV   : node ids
+            nword : number of words, default fits every interned node
+
+        Returns :
+            uint64 np.ndarray of nword
+
+        Raises :
+
+        """
+        if nword is None:
+            nword = (len(self) + BITS_PER_WORD - 1) // BITS_PER_WORD
+        bitV = np.zeros(nword, dtype=np.uint64)
+        np.bitwise_or.at(bitV, idV // BITS_PER_WORD,
+                         np.left_shift(np.uint64(1), (idV % BITS_PER_WORD).astype(np.uint64)))
+        return bitV
+
+
+    def bitsets(self, nodelistS : pd.Series = None) -> np.ndarray :
+        """Bitset of each nodelist in a column, see bitset()
+
+        Args :
+            nodelistS : pd.Series of nodelists
+
+        Returns :
+            uint64 np.ndarray of shape (len(nodelistS), nword)
+
+        Raises :
+
+        """
+        codeV, uniqL = pd.factorize(nodelistS)
+        uniqidL = [self.ids(nodelist) for nodelist in uniqL]
+        nword = (len(self) + BITS_PER_WORD - 1) // BITS_PER_WORD
+        uniqbitV = np.zeros((len(uniqidL), nword), dtype=np.uint64)
+        for i, idV in enumerate(uniqidL):
+            uniqbitV[i] = self.bitset(idV, nword)
+        return uniqbitV[codeV]
@@ -0,0 +1,81 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Merge a daily sacct dump into a persistent store, see sacct_store.py
+#
+# Refs :
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import sys
+import argparse
+from sacct_store import compact_store
+from sacct_store import store_high_water
+from sacct_store import ingest_sacct_file
+
+
+# Run via
+#   S=$(python src/ingest_sacct.py --store data/sacct_store --high_water)
+#   sacct --allusers -P -S ${S:-2024-01-01} --format="jobidraw,..." > sacct_today
+#   python src/ingest_sacct.py --store data/sacct_store --path sacct_today
+# or backfill from archived dumps
+#   python src/ingest_sacct.py --store data/sacct_store --path 'archive/sacct_2024-*.txt.gz'
+def main():
+    """Ingest a sacct dump into a store
+
+    Args
+
+        N/A
+
+    Returns
+
+    Raises
+
+    """
+    parser = argparse.ArgumentParser(
+                    description="Merge sacct output into a persistent store")
+    parser.add_argument('--path', metavar='path/to/sacct_text_file', type=str,
+                        help='Path to parsable sacct file to ingest, or comma '
+                             'separated paths / globs of many dumps')
+    parser.add_argument('--store', metavar='path/to/sacct_store', type=str,
+                        required=True, help='Store directory, created if needed')
+    parser.add_argument('--high_water', action='store_true',
+                        help='Print the time to pass to `sacct -S` for the next '
+                             'dump and exit')
+    parser.add_argument('--nproc', metavar='nproc', nargs='?', type=int,
+                        help='Processes reading many dumps, default is all cores')
+    parser.add_argument('--compact', action='store_true',
+                        help='Rewrite the store as a single segment')
+    args = parser.parse_args()
+
+    if args.high_water is True:
+        highwater = store_high_water(args.store)
+        if highwater is not None:
+            print(highwater)
+        sys.exit(0)
+    if args.path is not None:
+        countD = ingest_sacct_file(args.path, args.store, args.nproc)
+        print("{} : {} new, {} changed, {} unchanged rows".format(args.path,
+              countD['new'], countD['changed'], countD['unchanged']))
+    if args.compact is True:
+        compact_store(args.store)
+    sys.stdout.flush()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+
+    main()
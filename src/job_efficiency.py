@@ -0,0 +1,123 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Report how much of the gpu time each job / user allocated was used
+#
+# Refs :
+#   a) collect_data.sh, for the gpu utilization files
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from classes import UNKNOWN_TIME
+from functions import parse_sacct_table
+from functions import open_gpu_util
+from functions import load_gpus
+from functions import job_gpu_utilization
+from functions import user_gpu_utilization
+from hostlist import select_nodes
+from util_store import open_util_store
+from util_archive import open_util_archive
+from rollup import open_util_rollup
+
+
+def main():
+    """Joins sacct jobs against the gpu utilization of their nodes
+
+    Args
+
+        N/A
+
+    Returns
+
+    Raises
+
+    """
+    parser = argparse.ArgumentParser(
+                description="Mean gpu utilization of every job and user, from "
+                            "`sacct` and the files extracted by collect_data.sh")
+    parser.add_argument('--path', metavar='path/to/sacct_text_file', type=str,
+                        help='Path to parsable sacct file, or comma separated '
+                             'paths / globs of overlapping dumps, merged per job')
+    parser.add_argument('--utildir', metavar='path/to/toplevel/data/dir', type=str,
+                        help='Directory with the node*_gpuutil_gpu*.txt files')
+    parser.add_argument('--utilstore', metavar='path/to/util_store', type=str,
+                        help='Read utilization from a store built by '
+                             'convert_gpu_util.py instead of --utildir')
+    parser.add_argument('--utilarchive', metavar='path/to/archive', type=str,
+                        help='Read utilization from an archive built by '
+                             'archive_gpu_util.py instead of --utildir')
+    parser.add_argument('--utilrollup', metavar='path/to/rollupdir', type=str,
+                        help='Read 1h / 1d utilization from the rollups of '
+                             'rollup_gpu_util.py instead of --utildir')
+    parser.add_argument('--resolution', metavar='2min|1h|1d', type=str,
+                        default='2min', help='Utilization files to use, default 2min')
+    parser.add_argument('--exclude_nodes', metavar='exclude_nodes', nargs='?',
+                        type=str, help='Drop jobs that touched these nodes. '
+                                       'Hostlists (node[01-03]) and globs (dgx*) '
+                                       'are allowed')
+    parser.add_argument('--nproc', metavar='nproc', nargs='?', type=int,
+                        help='Processes used to read the files, default is all cores')
+    parser.add_argument('--jobs_csv', metavar='path/to/jobs.csv', nargs='?',
+                        type=str, help='Write the per job table to a csv')
+    parser.add_argument('--users_csv', metavar='path/to/users.csv', nargs='?',
+                        type=str, help='Write the per user table to a csv')
+    args = parser.parse_args()
+
+    (totalgpuraw, totalcpuraw, jobtable, starttime, endtime) = parse_sacct_table(
+                                                                   args.path,
+                                                                   nproc=args.nproc)
+    (includenodeL, excludenodeL) = select_nodes(jobtable.nodenameL, None,
+                                                args.exclude_nodes)
+    jobtable = jobtable.subset(jobtable.node_filter(None, excludenodeL))
+    # Only the files of one resolution and the span of the jobs are read
+    knownV = (jobtable.startV != UNKNOWN_TIME) & (jobtable.endV != UNKNOWN_TIME)
+    if np.any(knownV):
+        (start, end) = (jobtable.startV[knownV].min(), jobtable.endV[knownV].max())
+    else:
+        (start, end) = (None, None)
+    if args.utilstore is not None:
+        cluster = open_util_store(args.utilstore, args.resolution, excludenodeL)
+    elif args.utilrollup is not None:
+        cluster = open_util_rollup(args.utilrollup, args.resolution, excludenodeL)
+    elif args.utilarchive is not None:
+        cluster = open_util_archive(args.utilarchive, args.resolution, excludenodeL,
+                                    start, end)
+    else:
+        cluster = open_gpu_util(args.utildir, args.resolution, excludenodeL, start,
+                                end)
+        load_gpus(cluster.gpuL, args.nproc)
+
+    jobdf = job_gpu_utilization(jobtable, cluster.nodeL)
+    userdf = user_gpu_utilization(jobdf)
+    with pd.option_context('display.max_rows', None, 'display.width', 120):
+        print(userdf)
+    print("Jobs with gpu data : {} of {}, idle gpu hours : {:.1f}".format(
+          (jobdf['coverage'] > 0).sum(), len(jobdf),
+          userdf['idlegputime'].sum() / 3600))
+    if args.jobs_csv is not None:
+        jobdf.to_csv(args.jobs_csv, index=False)
+    if args.users_csv is not None:
+        userdf.to_csv(args.users_csv)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+
+    main()
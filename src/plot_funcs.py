@@ -33,7 +33,10 @@ from functions import make_autopct
 from numpy.typing import ArrayLike
 from collections import OrderedDict
 from plotly.subplots import make_subplots
-from classes import Job,Step,SacctObj,User,TotalGpu
+from classes import Job,Step,SacctObj,User,TotalGpu,JobTable
+from classes import OccupancyTimeline,from_epoch
+from functions import bin_job_overlap
+from functions import resample_util
 from functions import is_job_in_time_range
 
 
@@ -105,93 +108,50 @@ def make_pie(sortedtimeL : List[float] = None, sortednameL : List[str] = None,
 def gather_time_series(jobL : List[Job] = None, start : datetime.datetime = None,
                      end : datetime.datetime = None, interval : float = None,
                      cpuorgpu : str = None, totalsystime : float = None):
-    """Gathers data for time series plot.
+    """Gathers data for time series plot. See bin_job_overlap()
 
     Args
-
-        N/A
+        jobL     = list of Job objects or a JobTable
+        start    = start of first interval
+        end      = last interval starts at or before end
+        interval = width of interval in s
+        cpuorgpu = 'cpu' or 'gpu'
 
     Returns
+        pd.DataFrame indexed by interval mid point, a column per user + 'total'
 
     Raises
 
     """
-    delta = datetime.timedelta(seconds=interval)
-    date = start
-    dateD = OrderedDict()
-
-    # Loop over intervals
-    while date <= end:
-        # Time interval
-        mint = date
-        maxt = date + delta
-        midt = date + delta/2.0
-        userD = dict()
-        print("{}   --->   {}".format(mint.strftime("%Y-%m-%d"),
-              maxt.strftime("%Y-%m-%d")))
-        totalraw = 0
-        for job in jobL:
-            inrange, overlap = is_job_in_time_range(job, mint, maxt)
-            if inrange == True:
-                if cpuorgpu.lower() == 'gpu':
-                    if job.elapsedraw > 0:
-                        jobraw  = (job.gputimeraw * overlap.total_seconds() /
-                                   job.elapsedraw)
-                        totalraw += jobraw
-                elif cpuorgpu.lower() == 'cpu':
-                    if job.elapsedraw > 0:
-                        jobraw    = (job.cputimeraw * overlap.total_seconds() /
-                                     job.elapsedraw)
-                        totalraw += jobraw
-                else:
-                    raise ValueError("ERROR!!! Invalid value for cpuorgpu"
-                                     " {}".format(cpuorgpu))
-                ### Add to userD dictionary
-                if job.user in userD.keys():
-                    userD[job.user] += jobraw
-                else :
-                    userD[job.user] = jobraw
-        userD['total'] = totalraw
-        dateD[midt] = userD
-        date += delta
-    df = pd.DataFrame.from_dict(dateD, orient='index')
-    df.sort_index(inplace=True)
-    df.fillna(0, inplace=True)
-    return df
+    if isinstance(jobL, JobTable):
+        jobtable = jobL
+    else:
+        jobtable = JobTable.from_jobs(jobL)
+    return bin_job_overlap(jobtable=jobtable, start=start, end=end,
+                           interval=interval, cpuorgpu=cpuorgpu)
 
 
 def gather_totalgpu_time_series(totalgpu : TotalGpu = None,
                      start : datetime.datetime = None,
                      end : datetime.datetime = None, interval : float = None):
-    """Gathers data for time series plot.
+    """Gathers data for time series plot. See resample_util()
 
     Args
-
-        N/A
+        totalgpu = TotalGpu
+        start    = start of first interval
+        end      = last interval starts at or before end
+        interval = width of interval in s, same grid as gather_time_series()
 
     Returns
+        pd.DataFrame indexed by interval mid point with util (time weighted
+        mean %, NaN without data) and coverage
 
     Raises
 
     """
-    delta = datetime.timedelta(seconds=interval)
-    date = start
-    dateD = OrderedDict()
-    utilL = []
-
     print("{}   --->   {}".format(start.strftime("%Y-%m-%d"),
           end.strftime("%Y-%m-%d")))
-
-    for util in totalgpu.totalgpu.utilL:
-        if start <= util.time and util.time <= end:
-            inrange = True
-            dateD[util.time] = util.util
-            print("{} {}".format(util.time, util.util))
-    df = pd.DataFrame.from_dict(dateD, orient='index')
-    df.sort_index(inplace=True)
-    df.fillna(0, inplace=True)
-    df = df.rename(columns={0:'util'})
-    return df
+    return resample_util(totalgpu, start, end, interval)
 
 
 def plot_time_series_mpl(jobL : List[Job] = None, start : datetime.datetime = None,
@@ -233,7 +193,7 @@ def plot_time_series_mpl(jobL : List[Job] = None, start : datetime.datetime = No
             dfutil = gather_totalgpu_time_series(totalgpu = totalgpu, start=start,
                                                  end=end, interval=interval)
             ax.plot(dfutil['util'].index, dfutil['util'], color = 'red', label='utilization')
-            print("Average Utilization = {:<.2f} %".format(np.mean(dfutil['util'])))
+            print("Average Utilization = {:<.2f} %".format(np.nanmean(dfutil['util'])))
         else:
             ax.set_title("Percent {} allocation ".format(cpuorgpu))
             ax.set_ylabel("{} % allocation".format(cpuorgpu))
@@ -386,3 +346,67 @@ def plot_time_series_plotly(jobL : List[Job] = None, start : datetime.datetime =
 
     ## Extract by time range
     fig.show()
+
+
+def plot_occupancy_mpl(timeline : OccupancyTimeline = None,
+                       start : datetime.datetime = None,
+                       end : datetime.datetime = None, interval : float = None,
+                       column : str = 'gpus', capacity : float = None,
+                       title : str = None):
+    """Exact concurrent allocation of the cluster as a step plot over a node x
+       time heatmap of the interval averaged allocation of each node
+
+    Args
+        timeline = OccupancyTimeline
+        start    = start of first interval
+        end      = last interval starts at or before end
+        interval = width of heatmap interval in s
+        column   = 'gpus', 'cpus', 'jobs' or 'nodes'
+        capacity = optional, e.g. nnodes * ngpupernode, drawn as a line
+        title    = optional title
+
+    Returns
+
+    Raises
+
+    """
+    (edgeV, nodeL, gridV) = timeline.heatmap(start, end, interval, column)
+    # Knots inside the window plus the step holding at start
+    (knotV, valueV) = timeline.curve('total', column)
+    keepV = (knotV > edgeV[0]) & (knotV < edgeV[-1])
+    stepV = np.concatenate([[edgeV[0]], knotV[keepV], [edgeV[-1]]])
+    stepvalV = np.concatenate([timeline.at([edgeV[0]], 'total', column),
+                               valueV[keepV], timeline.at([edgeV[-1]], 'total', column)])
+    dateL = [from_epoch(t) for t in stepV]
+    edgedateL = [from_epoch(t) for t in edgeV]
+    # Nodes in name order, top to bottom
+    orderV = np.argsort(nodeL)[::-1]
+
+    fig = plt.figure()
+    gs = fig.add_gridspec(2, 1, height_ratios=[1, 3], hspace=0.05)
+    ax = fig.add_subplot(gs[0,0])
+    ax.step(dateL, stepvalV, where='post', label='allocated')
+    if capacity is not None:
+        ax.axhline(capacity, color='red', linestyle='--', label='capacity')
+    (peak, peaktime) = timeline.peak(start, from_epoch(edgeV[-1]), 'total', column)
+    ax.plot([peaktime], [peak], 'v', color='black', label="peak {}".format(peak))
+    ax.set_ylabel("concurrent {}".format(column))
+    ax.set_xlim(edgedateL[0], edgedateL[-1])
+    ax.set_xticklabels([])
+    ax.legend()
+    if title is None :
+        ax.set_title("Concurrent {} allocation".format(column))
+    else :
+        ax.set_title(title)
+
+    ax = fig.add_subplot(gs[1,0])
+    mesh = ax.pcolormesh(edgedateL, np.arange(len(nodeL) + 1), gridV[orderV],
+                         cmap='viridis', shading='flat')
+    ax.set_yticks(np.arange(len(nodeL)) + 0.5)
+    ax.set_yticklabels([nodeL[i] for i in orderV])
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.colorbar(mesh, ax=fig.axes, label="mean {} per {:g}h".format(column,
+                 interval / 3600))
+    print("Peak concurrent {} = {} at {}".format(column, peak, peaktime))
+    plt.savefig("node_{}_occupancy.pdf".format(column))
+    fig.show()
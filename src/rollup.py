@@ -0,0 +1,463 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Consolidate raw (10s) gpu utilization into 1h / 1d / any coarser series
+#      locally, s.t. collect_data.sh only needs to dump the raw data
+#   2. Fold in only the samples newer than the last run
+#   3. Compare the rollups with the series BCM consolidated
+#
+# Refs :
+#   a) Base View admin manual, section 12.4, consolidation
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Raw sample i holds over [t_i, t_i + min(t_(i+1) - t_i, period)), like
+# UtilSeries. Buckets are [offset + k*width, offset + (k+1)*width) in s since
+# EPOCH. The last raw sample folded in is kept pending until the next one
+# arrives, since its span depends on it.
+#
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+from classes import Gpu,Node,Cluster,TotalGpu,UtilSeries
+from functions import gpu_util_manifest
+
+# Units accepted by parse_width()
+WIDTH_UNITS = {'s' : 1, 'min' : 60, 'h' : 3600, 'd' : 86400}
+# Rollup files written by rollup_util_dir(), <node>_gpu<N>_<width>.npz and
+# totalgpuutilization_<width>.npz
+ROLLUP_GPU_FILE = re.compile(r'^(?P<node>.+)_gpu(?P<gidx>\d+)_(?P<width>[^_]+)\.npz$')
+ROLLUP_TOTAL_FILE = re.compile(r'^totalgpuutilization_(?P<width>[^_]+)\.npz$')
+
+
+def parse_width(widthS : str = None) -> int :
+    """Bucket width from e.g. '1h', '1d', '15min' or '30s'
+
+    Args
+        widthS = number followed by one of WIDTH_UNITS
+
+    Returns
+        width in s
+
+    Raises
+        ValueError if widthS can't be parsed
+    """
+    match = re.match(r'^(\d+)(s|min|h|d)$', widthS.strip())
+    if match is None or int(match.group(1)) == 0:
+        raise ValueError("ERROR!!! Invalid width {}, e.g. 1h, 1d, 15min".format(widthS))
+    return int(match.group(1)) * WIDTH_UNITS[match.group(2)]
+
+
+class Rollup :
+    """Min / mean / max / coverage of a raw utilization series per fixed width
+       bucket, built incrementally by fold()"""
+
+    def __init__(self, width : int = None, offset : int = 0, period : int = None):
+        """Initialize an empty Rollup
+
+        Args :
+            width  : bucket width in s
+            offset : s since EPOCH of a bucket boundary, e.g. for local midnight
+            period : raw sample period in s, default is the median spacing of
+                     the first fold()
+
+        Returns :
+
+        Raises :
+
+        """
+        self.width   = int(width)
+        self.offset  = int(offset)
+        self.period  = period
+        # Buckets with data, sorted by bucket number k
+        self.kV      = np.zeros(0, dtype=np.int64)
+        self.minV    = np.zeros(0, dtype=np.float32)
+        self.maxV    = np.zeros(0, dtype=np.float32)
+        self.sumV    = np.zeros(0, dtype=np.float64)
+        self.coverV  = np.zeros(0, dtype=np.float64)
+        # Last raw sample folded in, its span isn't known yet
+        self.pendingtime = None
+        self.pendingutil = np.nan
+
+
+    def __len__(self) -> int :
+        return self.kV.shape[0]
+
+
+    @property
+    def timeV(self) -> np.ndarray :
+        """int64 start of each bucket, s since EPOCH"""
+        return self.kV * self.width + self.offset
+
+
+    @property
+    def meanV(self) -> np.ndarray :
+        """Time weighted mean % of each bucket, NaN without data"""
+        meanV = np.full(self.sumV.shape, np.nan)
+        np.divide(self.sumV, self.coverV, out=meanV, where=self.coverV > 0)
+        return meanV
+
+
+    @property
+    def coverageV(self) -> np.ndarray :
+        """Fraction of each bucket with data"""
+        return self.coverV / self.width
+
+
+    def fold(self, timeV : np.ndarray = None, utilV : np.ndarray = None) -> int :
+        """Fold raw samples into the buckets. Samples at or before the last one
+           already folded are skipped, s.t. overlapping dumps can be passed as
+           they are.
+
+        Args :
+            timeV : sorted int64 s since EPOCH
+            utilV : float %, NaN for 'no data'
+
+        Returns :
+            number of new samples
+
+        Raises :
+            ValueError if the raw period is longer than the bucket width
+        """
+        timeV = np.asarray(timeV, dtype=np.int64)
+        utilV = np.asarray(utilV, dtype=np.float64)
+        if self.pendingtime is not None:
+            keepV = timeV > self.pendingtime
+            (timeV, utilV) = (timeV[keepV], utilV[keepV])
+        nnew = timeV.shape[0]
+        if nnew == 0:
+            return 0
+        if self.period is None:
+            diffV = np.diff(timeV)
+            if not np.any(diffV > 0):
+                # Wait for enough samples to tell the period
+                (self.pendingtime, self.pendingutil) = (int(timeV[-1]), utilV[-1])
+                return nnew
+            self.period = int(np.median(diffV[diffV > 0]))
+        if self.period > self.width:
+            raise ValueError("ERROR!!! Raw period {}s > bucket width {}s".format(
+                             self.period, self.width))
+        if self.pendingtime is not None:
+            timeV = np.insert(timeV, 0, self.pendingtime)
+            utilV = np.insert(utilV, 0, self.pendingutil)
+        (self.pendingtime, self.pendingutil) = (int(timeV[-1]), utilV[-1])
+        # Every sample but the last now has a known span, which crosses at most
+        # one bucket boundary since period <= width
+        spanV = np.minimum(np.diff(timeV), self.period)
+        (timeV, utilV) = (timeV[:-1], utilV[:-1])
+        validV = ~np.isnan(utilV) & (spanV > 0)
+        (timeV, utilV, spanV) = (timeV[validV], utilV[validV], spanV[validV])
+        if timeV.shape[0] == 0:
+            return nnew
+        kV = (timeV - self.offset) // self.width
+        firstV = np.minimum(timeV + spanV, (kV + 1) * self.width + self.offset) - timeV
+        # Pieces in the bucket of the sample, then the rest in the next one
+        pkV = np.concatenate([kV, kV + 1])
+        plenV = np.concatenate([firstV, spanV - firstV])
+        putilV = np.concatenate([utilV, utilV])
+        usedV = plenV > 0
+        (pkV, plenV, putilV) = (pkV[usedV], plenV[usedV], putilV[usedV])
+        k0 = pkV.min()
+        n = pkV.max() - k0 + 1
+        sumV = np.bincount(pkV - k0, weights=putilV * plenV, minlength=n)
+        coverV = np.bincount(pkV - k0, weights=plenV, minlength=n)
+        minV = np.full(n, np.inf)
+        maxV = np.full(n, -np.inf)
+        np.minimum.at(minV, pkV - k0, putilV)
+        np.maximum.at(maxV, pkV - k0, putilV)
+        hasV = coverV > 0
+        newkV = np.flatnonzero(hasV) + k0
+        (sumV, coverV, minV, maxV) = (sumV[hasV], coverV[hasV], minV[hasV], maxV[hasV])
+        # New samples are after the old ones, only the last old bucket can overlap
+        if self.kV.shape[0] > 0 and newkV[0] == self.kV[-1]:
+            sumV[0] += self.sumV[-1]
+            coverV[0] += self.coverV[-1]
+            minV[0] = min(minV[0], self.minV[-1])
+            maxV[0] = max(maxV[0], self.maxV[-1])
+            self.kV = self.kV[:-1]
+            self.sumV = self.sumV[:-1]
+            self.coverV = self.coverV[:-1]
+            self.minV = self.minV[:-1]
+            self.maxV = self.maxV[:-1]
+        self.kV = np.concatenate([self.kV, newkV])
+        self.sumV = np.concatenate([self.sumV, sumV])
+        self.coverV = np.concatenate([self.coverV, coverV])
+        self.minV = np.concatenate([self.minV, minV.astype(np.float32)])
+        self.maxV = np.concatenate([self.maxV, maxV.astype(np.float32)])
+        return nnew
+
+
+    def to_frame(self) -> pd.DataFrame :
+        """Buckets with data as a data frame
+
+        Args :
+
+        Returns :
+            pd.DataFrame with time (s since EPOCH of the bucket start), min,
+            mean, max and coverage
+
+        Raises :
+
+        """
+        return pd.DataFrame({'time' : self.timeV, 'min' : self.minV,
+                             'mean' : self.meanV, 'max' : self.maxV,
+                             'coverage' : self.coverageV})
+
+
+    def series(self) -> UtilSeries :
+        """Bucket means as a UtilSeries, e.g. for Gpu.from_series(). Each
+           bucket holds for one width from its start."""
+        return UtilSeries.from_arrays(self.timeV, self.meanV.astype(np.float32),
+                                      self.width)
+
+
+    def save(self, path : str = None):
+        """Write to .npz, to a temporary file first, then renamed
+
+        Args :
+            path : output .npz
+
+        Returns :
+
+        Raises :
+
+        """
+        metaD = {'width' : self.width, 'offset' : self.offset, 'period' : self.period,
+                 'pendingtime' : self.pendingtime}
+        tmppath = "{}.tmp{}".format(path, os.getpid())
+        with open(tmppath, 'wb') as fout:
+            np.savez(fout, kV = self.kV, minV = self.minV, maxV = self.maxV,
+                     sumV = self.sumV, coverV = self.coverV,
+                     pendingutil = np.array(self.pendingutil),
+                     meta = np.array(json.dumps(metaD)))
+        os.replace(tmppath, path)
+
+
+    @classmethod
+    def load(cls, path : str = None) -> 'Rollup' :
+        """Read a Rollup written by save()
+
+        Args :
+            path : .npz from save()
+
+        Returns :
+            Rollup
+
+        Raises :
+
+        """
+        with np.load(path) as npz:
+            metaD = json.loads(str(npz['meta']))
+            rollup = cls(metaD['width'], metaD['offset'], metaD['period'])
+            rollup.kV = npz['kV']
+            rollup.minV = npz['minV']
+            rollup.maxV = npz['maxV']
+            rollup.sumV = npz['sumV']
+            rollup.coverV = npz['coverV']
+            rollup.pendingutil = float(npz['pendingutil'])
+        rollup.pendingtime = metaD['pendingtime']
+        return rollup
+
+
+def compare_rollup(rollup : Rollup = None, timeV : np.ndarray = None,
+                   utilV : np.ndarray = None, label : str = 'start') -> pd.DataFrame :
+    """Match the samples of a BCM consolidated series with our buckets
+
+    Args
+        rollup = Rollup of the same width
+        timeV  = times of the BCM samples, s since EPOCH
+        utilV  = utilization of the BCM samples
+        label  = 'start' if BCM stamps a bucket with its start, 'end' if with
+                 its end
+
+    Returns
+        pd.DataFrame per BCM sample with time, bcm, mean, min, max, coverage
+        (NaN where we have no bucket) and deviation = bcm - mean
+
+    Raises
+        ValueError for an invalid label
+    """
+    if label not in ['start', 'end']:
+        raise ValueError("ERROR!!! Invalid label {}".format(label))
+    timeV = np.asarray(timeV, dtype=np.int64)
+    kV = (timeV - rollup.offset) // rollup.width - (1 if label == 'end' else 0)
+    idxV = np.searchsorted(rollup.kV, kV)
+    foundV = idxV < rollup.kV.shape[0]
+    foundV[foundV] = rollup.kV[idxV[foundV]] == kV[foundV]
+    idxV = np.where(foundV, idxV, 0)
+    def take(valueV):
+        return np.where(foundV, np.asarray(valueV, dtype=np.float64)[idxV]
+                        if valueV.shape[0] > 0 else np.nan, np.nan)
+    df = pd.DataFrame({'time' : timeV, 'bcm' : np.asarray(utilV, dtype=np.float64),
+                       'mean' : take(rollup.meanV), 'min' : take(rollup.minV),
+                       'max' : take(rollup.maxV), 'coverage' : take(rollup.coverageV)})
+    df['deviation'] = df['bcm'] - df['mean']
+    return df
+
+
+def rollup_sources(path : str = None, resolution : str = '2min',
+                   excludenodeL : list = None) -> dict :
+    """Files of one resolution in a collect_data.sh directory
+
+    Args
+        path         = directory with node*_gpuutil_gpu*.txt files
+        resolution   = see UTIL_RESOLUTIONS
+        excludenodeL = node names to skip
+
+    Returns
+        dict of name (e.g. 'node01_gpu3' or 'totalgpuutilization') -> path
+
+    Raises
+    """
+    (gpuD, totalD) = gpu_util_manifest(path, excludenodeL)
+    sourceD = dict()
+    for name, nodeD in gpuD[resolution].items():
+        for gidx, gpupath in nodeD.items():
+            sourceD["{}_gpu{}".format(name, gidx)] = gpupath
+    if resolution in totalD:
+        sourceD['totalgpuutilization'] = totalD[resolution]
+    return sourceD
+
+
+def rollup_util_dir(path : str = None, rollupdir : str = None,
+                    widthL : list = None, offset : int = 0,
+                    excludenodeL : list = None) -> dict :
+    """Fold the raw files of a collect_data.sh directory into the rollups in
+       rollupdir, <name>_<width>.npz, creating them as needed
+
+    Args
+        path         = directory with the raw node*_gpuutil_gpu*_10s.txt files
+        rollupdir    = directory of the rollups, created if needed
+        widthL       = widths, e.g. ['1h', '1d'], see parse_width()
+        offset       = s since EPOCH of a bucket boundary for new rollups
+        excludenodeL = node names to skip
+
+    Returns
+        dict with the number of series and new raw samples
+
+    Raises
+        ValueError if a file can't be parsed
+    """
+    os.makedirs(rollupdir, exist_ok=True)
+    sourceD = rollup_sources(path, '2min', excludenodeL)
+    nsample = 0
+    for name in sorted(sourceD):
+        raw = UtilSeries(sourceD[name])
+        nnew = 0
+        for widthS in widthL:
+            outpath = os.path.join(rollupdir, "{}_{}.npz".format(name, widthS))
+            if os.path.isfile(outpath):
+                rollup = Rollup.load(outpath)
+            else:
+                rollup = Rollup(parse_width(widthS), offset, raw.period or None)
+            nnew = rollup.fold(raw.timeV, raw.utilV)
+            rollup.save(outpath)
+        nsample += nnew
+    return {'series' : len(sourceD), 'samples' : nsample}
+
+
+def compare_util_dir(path : str = None, rollupdir : str = None,
+                     widthL : list = None, label : str = 'start',
+                     excludenodeL : list = None) -> pd.DataFrame :
+    """Compare the rollups in rollupdir with BCM's consolidated 1h / 1d files in
+       path, see compare_rollup()
+
+    Args
+        path         = directory with node*_gpuutil_gpu*_1h.txt files
+        rollupdir    = directory written by rollup_util_dir()
+        widthL       = widths to compare, only '1h' and '1d' have BCM files
+        label        = see compare_rollup()
+        excludenodeL = node names to skip
+
+    Returns
+        pd.DataFrame per series and width with name, width, nbcm (BCM samples),
+        nmatched (with a bucket of ours), meandeviation and maxdeviation (of
+        |bcm - mean|)
+
+    Raises
+    """
+    rowL = []
+    for widthS in widthL:
+        if widthS not in ['1h', '1d']:
+            continue
+        sourceD = rollup_sources(path, widthS, excludenodeL)
+        for name in sorted(sourceD):
+            rollpath = os.path.join(rollupdir, "{}_{}.npz".format(name, widthS))
+            if not os.path.isfile(rollpath):
+                continue
+            bcm = UtilSeries(sourceD[name])
+            df = compare_rollup(Rollup.load(rollpath), bcm.timeV, bcm.utilV, label)
+            absdevV = df['deviation'].abs().dropna()
+            rowL.append({'name' : name, 'width' : widthS, 'nbcm' : len(df),
+                         'nmatched' : len(absdevV),
+                         'meandeviation' : absdevV.mean() if len(absdevV) > 0
+                                           else np.nan,
+                         'maxdeviation' : absdevV.max() if len(absdevV) > 0
+                                          else np.nan})
+    return pd.DataFrame(rowL, columns=['name', 'width', 'nbcm', 'nmatched',
+                                       'meandeviation', 'maxdeviation'])
+
+
+def open_util_rollup(rollupdir : str = None, resolution : str = '1h',
+                     excludenodeL : list = None) -> Cluster :
+    """Cluster of one width over the rollups of rollup_util_dir(), in place of
+       BCM's consolidated 1h / 1d files. The rollups are read whole, they are
+       small.
+
+    Args
+        rollupdir    = directory written by rollup_util_dir()
+        resolution   = width of the rollups, e.g. '1h' or '1d'
+        excludenodeL = node names to skip
+
+    Returns
+        Cluster, nodes sorted by name and gpus by index
+
+    Raises
+        ValueError if rollupdir has no nodes or total for resolution
+    """
+    excludeD = set([] if excludenodeL is None else excludenodeL)
+    nodeD = dict()
+    total = None
+    for name in sorted(os.listdir(rollupdir)):
+        path = os.path.join(rollupdir, name)
+        match = ROLLUP_TOTAL_FILE.match(name)
+        if match is not None:
+            if match.group('width') == resolution:
+                # Named like the text file s.t. TotalGpu / Gpu parse it
+                gpu = Gpu.from_series(os.path.join(rollupdir,
+                                      "totalgpuutilization_{}.txt".format(resolution)),
+                                      Rollup.load(path).series())
+                total = TotalGpu(gpu.gpupath, gpu)
+            continue
+        match = ROLLUP_GPU_FILE.match(name)
+        if (match is None or match.group('width') != resolution or
+            match.group('node') in excludeD):
+            continue
+        gpu = Gpu.from_series(os.path.join(rollupdir, "{}_gpuutil_gpu{}_{}.txt".format(
+                              match.group('node'), match.group('gidx'), resolution)),
+                              Rollup.load(path).series())
+        nodeD.setdefault(match.group('node'), []).append(gpu)
+    if len(nodeD) == 0 or total is None:
+        raise ValueError("ERROR!!! {} has no {} nodes or total".format(rollupdir,
+                         resolution))
+    nodeL = []
+    for name in sorted(nodeD):
+        gpuL = sorted(nodeD[name], key=lambda gpu : gpu.gidx)
+        nodeL.append(Node([gpu.gpupath for gpu in gpuL], gpuL))
+    return Cluster(nodeL, total.name, total)
+
@@ -0,0 +1,85 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Build 1h / 1d / coarser gpu utilization locally from the raw 10s dumps
+#   2. Compare them with the series BCM consolidated
+#
+# Refs :
+#   a) rollup.py
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import sys
+import argparse
+import pandas as pd
+from rollup import rollup_util_dir
+from rollup import compare_util_dir
+
+
+# Run after every collect_data.sh, e.g.
+#   python src/rollup_gpu_util.py --path data/2024-11-01 --rollupdir data/rollup
+def main():
+    """Fold raw gpu utilization into rollups, or compare them with BCM's
+
+    Args
+
+        N/A
+
+    Returns
+
+    Raises
+
+    """
+    parser = argparse.ArgumentParser(
+                description="Consolidate the raw gpu utilization from "
+                            "collect_data.sh into 1h / 1d / coarser rollups")
+    parser.add_argument('--path', metavar='path/to/toplevel/data/dir', type=str,
+                        required=True, help='Directory with node*_gpuutil_gpu*.txt')
+    parser.add_argument('--rollupdir', metavar='path/to/rollup', type=str,
+                        required=True, help='Rollup directory, created if needed')
+    parser.add_argument('--widths', metavar='1h,1d', type=str, default='1h,1d',
+                        help='Comma separated bucket widths, e.g. 15min,1h,1d,7d')
+    parser.add_argument('--offset', metavar='seconds', type=int, default=0,
+                        help='s since 1970-01-01 of a bucket boundary for new '
+                             'rollups, e.g. -3600*5 for local midnight at UTC-5')
+    parser.add_argument('--excludenodes', metavar='excludenodes', nargs='?',
+                        type=str, help='Comma separated node names to skip')
+    parser.add_argument('--compare', action='store_true',
+                        help='Instead of folding, compare the 1h / 1d rollups with '
+                             'the consolidated files in --path')
+    parser.add_argument('--label', metavar='start|end', type=str, default='start',
+                        help='With --compare, whether BCM stamps buckets with their '
+                             'start or end')
+    args = parser.parse_args()
+
+    widthL = args.widths.split(',')
+    excludenodeL = None if args.excludenodes is None else args.excludenodes.split(',')
+    if args.compare is True:
+        df = compare_util_dir(args.path, args.rollupdir, widthL, args.label,
+                              excludenodeL)
+        with pd.option_context('display.max_rows', None, 'display.width', 120):
+            print(df)
+    else:
+        countD = rollup_util_dir(args.path, args.rollupdir, widthL, args.offset,
+                                 excludenodeL)
+        print("{} series, {} new raw samples".format(countD['series'],
+                                                      countD['samples']))
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,238 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Avoid re-parsing the same sacct text file over and over
+#
+# Refs :
+#   a) https://numpy.org/doc/stable/reference/generated/numpy.savez.html
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict,List
+
+# Bump when the layout of the cached frames changes, old entries are ignored
+CACHE_VERSION = 1
+# Name of directory created next to the input file
+CACHE_DIRNAME = '.sacct_cache'
+# Evict least recently used entries once the directory holds more than this
+MAX_CACHE_BYTES = 4 * 1024**3
+# Bytes from the head and tail of the file that go into the content hash
+HASH_SAMPLE_BYTES = 1024**2
+
+
+def file_fingerprint(path : str = None) -> Dict :
+    """Identify the contents of path without reading all of it. The content hash
+       covers the first and last HASH_SAMPLE_BYTES, sacct dumps differ at the
+       tail when they grow and anywhere else changes size or mtime.
+
+    Args
+        path = path to file
+
+    Returns
+        dict with path, size, mtime (ns) and hash
+
+    Raises
+    """
+    stat = os.stat(path)
+    blake = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as fin:
+        blake.update(fin.read(HASH_SAMPLE_BYTES))
+        if stat.st_size > 2 * HASH_SAMPLE_BYTES:
+            fin.seek(-HASH_SAMPLE_BYTES, os.SEEK_END)
+        blake.update(fin.read(HASH_SAMPLE_BYTES))
+    return {'version' : CACHE_VERSION, 'path' : os.path.abspath(path),
+            'size' : stat.st_size, 'mtime' : stat.st_mtime_ns,
+            'hash' : blake.hexdigest()}
+
+
+def cache_path(path : str = None, cachedir : str = None) -> str :
+    """Location of the cache entry for path
+
+    Args
+        path     = path to input file
+        cachedir = cache directory, default is CACHE_DIRNAME next to path
+
+    Returns
+        path to .npz
+
+    Raises
+    """
+    abspath = os.path.abspath(path)
+    if cachedir is None:
+        cachedir = os.path.join(os.path.dirname(abspath), CACHE_DIRNAME)
+    key = hashlib.blake2b(abspath.encode(), digest_size=8).hexdigest()
+    return os.path.join(cachedir, "{}.{}.npz".format(os.path.basename(abspath), key))
+
+
+def save_frame(df : pd.DataFrame = None, path : str = None, metaD : Dict = None):
+    """Write a data frame column by column with np.savez. Numeric columns are
+       stored as is, everything else is dictionary encoded (codes + uniques).
+       Written to a temporary file first, then renamed.
+
+    Args
+        df    = data frame
+        path  = output .npz
+        metaD = json serializable dict stored alongside
+
+    Returns
+
+    Raises
+    """
+    arrayD = dict()
+    columnL = []
+    for i, col in enumerate(df.columns):
+        columnL.append(col)
+        if pd.api.types.is_numeric_dtype(df[col]):
+            arrayD["num{}".format(i)] = df[col].to_numpy()
+        else:
+            codeV, uniqV = pd.factorize(df[col].astype(str))
+            arrayD["code{}".format(i)] = codeV.astype(np.int32)
+            arrayD["uniq{}".format(i)] = np.asarray(uniqV, dtype=str)
+    metaD = dict() if metaD is None else dict(metaD)
+    metaD['columns'] = columnL
+    arrayD['meta'] = np.array(json.dumps(metaD))
+    tmppath = "{}.tmp{}".format(path, os.getpid())
+    with open(tmppath, 'wb') as fout:
+        np.savez(fout, **arrayD)
+    os.replace(tmppath, path)
+
+
+def load_frame(path : str = None, columnL : List[str] = None):
+    """Read a data frame written by save_frame()
+
+    Args
+        path    = .npz written by save_frame()
+        columnL = only read these columns, default is all
+
+    Returns
+        df    = data frame, str columns are object dtype
+        metaD = dict passed to save_frame()
+
+    Raises
+    """
+    with np.load(path) as npz:
+        metaD = json.loads(str(npz['meta']))
+        dataD = dict()
+        for i, col in enumerate(metaD['columns']):
+            if columnL is not None and col not in columnL:
+                continue
+            if "num{}".format(i) in npz.files:
+                dataD[col] = npz["num{}".format(i)]
+            else:
+                uniqV = npz["uniq{}".format(i)].astype(object)
+                dataD[col] = uniqV[npz["code{}".format(i)]]
+    return(pd.DataFrame(dataD), metaD)
+
+
+def load_cached_frame(path : str = None, cachedir : str = None):
+    """Return the cached frame for path if it is still valid
+
+    Args
+        path     = path to input file
+        cachedir = cache directory, see cache_path()
+
+    Returns
+        data frame or None on a miss / stale entry
+
+    Raises
+    """
+    cpath = cache_path(path, cachedir)
+    if not os.path.exists(cpath):
+        return None
+    fingerprintD = file_fingerprint(path)
+    try :
+        df, metaD = load_frame(cpath)
+    except (OSError, ValueError, KeyError) :
+        # Truncated or from an older layout, rebuild it
+        return None
+    for key in fingerprintD:
+        if metaD.get(key) != fingerprintD[key]:
+            return None
+    # Mark as recently used for evict_cache()
+    os.utime(cpath)
+    return df
+
+
+def store_cached_frame(df : pd.DataFrame = None, path : str = None,
+                       cachedir : str = None, maxbytes : int = MAX_CACHE_BYTES):
+    """Cache df as the parsed contents of path, then evict old entries
+
+    Args
+        df       = parsed frame
+        path     = path to input file
+        cachedir = cache directory, see cache_path()
+        maxbytes = limit on total size of the cache directory
+
+    Returns
+        path of cache entry, None if it could not be written
+
+    Raises
+    """
+    cpath = cache_path(path, cachedir)
+    try :
+        os.makedirs(os.path.dirname(cpath), exist_ok=True)
+        save_frame(df, cpath, file_fingerprint(path))
+    except OSError as err:
+        print("WARNING!!! Could not cache {} : {}".format(path, err))
+        return None
+    evict_cache(os.path.dirname(cpath), maxbytes, keep=cpath)
+    return cpath
+
+
+def evict_cache(cachedir : str = None, maxbytes : int = MAX_CACHE_BYTES,
+                keep : str = None):
+    """Remove least recently used entries until cachedir is under maxbytes
+
+    Args
+        cachedir = cache directory
+        maxbytes = limit on total size
+        keep     = entry never to remove, e.g. the one just written
+
+    Returns
+        list of removed paths
+
+    Raises
+    """
+    entryL = []
+    for name in os.listdir(cachedir):
+        if not name.endswith('.npz'):
+            continue
+        epath = os.path.join(cachedir, name)
+        # Pool workers evict the same directory, another may have removed it
+        try :
+            stat = os.stat(epath)
+        except FileNotFoundError:
+            continue
+        entryL.append((stat.st_mtime, stat.st_size, epath))
+    total = sum(entry[1] for entry in entryL)
+    removedL = []
+    for mtime, size, epath in sorted(entryL):
+        if total <= maxbytes:
+            break
+        if epath == keep:
+            continue
+        total -= size
+        try :
+            os.remove(epath)
+        except FileNotFoundError:
+            continue
+        removedL.append(epath)
+    return removedL
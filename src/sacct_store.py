@@ -0,0 +1,303 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Keep a persistent store of sacct rows s.t. a daily dump only adds the
+#      rows that are new or changed
+#
+# Refs :
+#   a) `man sacct`, -S selects jobs in ANY state after the given time
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# A store is a directory of segment_NNNNNN.npz files (see sacct_cache.save_frame).
+# Each ingest appends ONE segment holding only the rows whose JobIDRaw is new or
+# whose contents changed (e.g. RUNNING -> COMPLETED).  Reading concatenates the
+# segments and keeps the last row for each JobIDRaw, i.e. last write wins.
+# index.npz holds the JobIDRaw -> row hash of the store and the high water
+# mark, s.t. an ingest never reads the segments. It names the last segment it
+# covers, if that isn't the last segment (e.g. a crash between writing the two)
+# it is rebuilt from the segments.
+#
+import os
+import glob
+import numpy as np
+import pandas as pd
+from typing import Dict,List
+from sacct_cache import save_frame,load_frame
+from functions import jobidraw_column,read_sacct_frame
+from functions import sacct_paths,read_sacct_frames
+
+# Column holding the hash of the sacct fields of each row
+HASH_COLUMN = 'RowHash'
+# Latest Start / End seen, used as `sacct -S` for the next dump
+HIGH_WATER_FORMAT = "%Y-%m-%dT%H:%M:%S"
+# Key index of the store, see read_store_index()
+INDEX_FILE = 'index.npz'
+
+
+def row_hash(df : pd.DataFrame = None) -> np.ndarray :
+    """Hash every row of a sacct frame, independent of column dtypes
+
+    Args
+        df = sacct data frame
+
+    Returns
+        np.ndarray of uint64
+
+    Raises
+    """
+    cols = [col for col in df.columns if col != HASH_COLUMN]
+    return pd.util.hash_pandas_object(df[cols].astype(str), index=False).to_numpy()
+
+
+def segment_paths(storepath : str = None) -> List[str] :
+    """Segments of the store in the order they were written"""
+    return sorted(glob.glob(os.path.join(storepath, "segment_*.npz")))
+
+
+def frame_high_water(df : pd.DataFrame = None, latest : str = None) -> str :
+    """Latest Start / End of a sacct frame
+
+    Args
+        df     = sacct data frame (or its Start / End columns)
+        latest = high water so far, in HIGH_WATER_FORMAT, None if there is none
+
+    Returns
+        str in HIGH_WATER_FORMAT, None if neither df nor latest has a time
+
+    Raises
+    """
+    timeL = [] if latest is None else [pd.Timestamp(latest)]
+    for col in ['Start', 'End']:
+        timeS = pd.to_datetime(df[col], format=HIGH_WATER_FORMAT, errors='coerce')
+        if timeS.notna().any():
+            timeL.append(timeS.max())
+    if len(timeL) == 0:
+        return None
+    return max(timeL).strftime(HIGH_WATER_FORMAT)
+
+
+def scan_store_index(storepath : str = None):
+    """Rebuild the key index from every segment, see read_store_index()
+
+    Args
+        storepath = store directory
+
+    Returns
+        hashS     = pd.Series of hashes indexed by JobIDRaw, last write wins
+        highwater = str in HIGH_WATER_FORMAT, None if the store is empty
+
+    Raises
+    """
+    keyL  = []
+    hashL = []
+    highwater = None
+    for segpath in segment_paths(storepath):
+        df, metaD = load_frame(segpath, columnL=['JobIDRaw', HASH_COLUMN,
+                                                 'Start', 'End'])
+        keyL.append(df['JobIDRaw'].astype(str).to_numpy())
+        hashL.append(df[HASH_COLUMN].to_numpy())
+        highwater = frame_high_water(df, highwater)
+    if len(keyL) == 0:
+        return (pd.Series([], dtype=np.uint64), None)
+    hashS = pd.Series(np.concatenate(hashL), index=np.concatenate(keyL))
+    return (hashS[~hashS.index.duplicated(keep='last')], highwater)
+
+
+def write_store_index(storepath : str = None, hashS : pd.Series = None,
+                      highwater : str = None):
+    """Atomically write the key index, covering the current last segment
+
+    Args
+        storepath = store directory
+        hashS     = pd.Series of hashes indexed by JobIDRaw
+        highwater = str in HIGH_WATER_FORMAT or None
+
+    Returns
+
+    Raises
+    """
+    segpathL = segment_paths(storepath)
+    df = pd.DataFrame({'JobIDRaw' : hashS.index.astype(str),
+                       HASH_COLUMN : hashS.to_numpy(dtype=np.uint64)})
+    save_frame(df, os.path.join(storepath, INDEX_FILE),
+               {'segment' : os.path.basename(segpathL[-1]) if len(segpathL) > 0
+                            else None, 'highwater' : highwater})
+
+
+def read_store_index(storepath : str = None):
+    """Read the key index, one small file instead of every segment. Rebuilt
+       from the segments if it is missing or doesn't cover the last segment
+
+    Args
+        storepath = store directory
+
+    Returns
+        hashS     = pd.Series of hashes indexed by JobIDRaw, last write wins
+        highwater = str in HIGH_WATER_FORMAT, None if the store is empty
+
+    Raises
+    """
+    indexpath = os.path.join(storepath, INDEX_FILE)
+    segpathL  = segment_paths(storepath)
+    if os.path.isfile(indexpath):
+        df, metaD = load_frame(indexpath)
+        lastseg = os.path.basename(segpathL[-1]) if len(segpathL) > 0 else None
+        if metaD['segment'] == lastseg:
+            hashS = pd.Series(df[HASH_COLUMN].to_numpy(dtype=np.uint64),
+                              index=df['JobIDRaw'].astype(str).to_numpy())
+            return (hashS, metaD['highwater'])
+    return scan_store_index(storepath)
+
+
+def read_store_keys(storepath : str = None):
+    """Read JobIDRaw and row hash of every row currently in the store
+
+    Args
+        storepath = store directory
+
+    Returns
+        pd.Series of hashes indexed by JobIDRaw, last write wins
+
+    Raises
+    """
+    return read_store_index(storepath)[0]
+
+
+def read_sacct_store(storepath : str = None) -> pd.DataFrame :
+    """Read the store back into a single sacct data frame
+
+    Args
+        storepath = store directory
+
+    Returns
+        data frame like read_sacct_frame(), one row per JobIDRaw
+
+    Raises
+        ValueError if the store is empty
+    """
+    dfL = [load_frame(segpath)[0] for segpath in segment_paths(storepath)]
+    if len(dfL) == 0:
+        raise ValueError("ERROR!!! No segments in {}".format(storepath))
+    df = pd.concat(dfL, ignore_index=True)
+    df = df[~jobidraw_column(df).duplicated(keep='last').to_numpy()]
+    return df.drop(columns=[HASH_COLUMN]).reset_index(drop=True)
+
+
+def ingest_sacct_frame(df : pd.DataFrame = None, storepath : str = None) -> Dict :
+    """Merge a sacct frame into the store. Only new or changed rows are written
+
+    Args
+        df        = sacct data frame, e.g. from read_sacct_frame()
+        storepath = store directory, created if needed
+
+    Returns
+        dict with number of 'new', 'changed' and 'unchanged' rows
+
+    Raises
+    """
+    os.makedirs(storepath, exist_ok=True)
+    df = df.copy()
+    # Normalize s.t. every segment has the same key column name
+    df['JobIDRaw'] = jobidraw_column(df).to_numpy()
+    if 'JobID' in df.columns:
+        df = df.drop(columns=['JobID'])
+    # Within one dump the last row of a JobIDRaw wins as well
+    df = df[~df['JobIDRaw'].duplicated(keep='last').to_numpy()]
+    df[HASH_COLUMN] = row_hash(df)
+    (oldhashS, highwater) = read_store_index(storepath)
+    posV     = oldhashS.index.get_indexer(df['JobIDRaw'])
+    newV     = posV == -1
+    oldhashV = np.append(oldhashS.to_numpy(), np.uint64(0))   # posV == -1 -> dummy
+    changedV = ~newV & (oldhashV[posV] != df[HASH_COLUMN].to_numpy())
+    writeV   = newV | changedV
+    if np.any(writeV):
+        segpathL = segment_paths(storepath)
+        nseg = 0 if len(segpathL) == 0 else int(segpathL[-1].split('_')[-1].split('.')[0]) + 1
+        segpath = os.path.join(storepath, "segment_{:06d}.npz".format(nseg))
+        save_frame(df[writeV].reset_index(drop=True), segpath)
+        hashS = pd.concat([oldhashS, pd.Series(df[HASH_COLUMN].to_numpy()[writeV],
+                                               index=df['JobIDRaw'].to_numpy()[writeV])])
+        hashS = hashS[~hashS.index.duplicated(keep='last')]
+        write_store_index(storepath, hashS, frame_high_water(df, highwater))
+    elif not os.path.isfile(os.path.join(storepath, INDEX_FILE)):
+        # Store written before the index existed
+        write_store_index(storepath, oldhashS, highwater)
+    return {'new' : int(np.sum(newV)), 'changed' : int(np.sum(changedV)),
+            'unchanged' : int(np.sum(~writeV))}
+
+
+def ingest_sacct_file(path : str = None, storepath : str = None,
+                      nproc : int = None) -> Dict :
+    """Merge a parsable sacct file into the store, see ingest_sacct_frame()
+
+    Args
+        path      = path to parsable sacct file, or comma separated paths / globs
+                    of many dumps, merged per job first, see read_sacct_frames()
+        storepath = store directory
+        nproc     = processes reading many dumps
+
+    Returns
+        dict with number of 'new', 'changed' and 'unchanged' rows
+
+    Raises
+    """
+    pathL = sacct_paths(path)
+    if len(pathL) > 1:
+        return ingest_sacct_frame(read_sacct_frames(pathL, nproc, cache=False),
+                                  storepath)
+    return ingest_sacct_frame(read_sacct_frame(pathL[0], cache=False), storepath)
+
+
+def store_high_water(storepath : str = None) -> str :
+    """Latest Start / End in the store. Dumping with `sacct -S <high water>`
+       returns every job that started, ended or is still running since, i.e.
+       everything that can differ from the store. Keeps the dump (and the
+       ingest) proportional to a day of jobs rather than the cluster's age.
+
+    Args
+        storepath = store directory
+
+    Returns
+        str in HIGH_WATER_FORMAT, None if the store is empty
+
+    Raises
+    """
+    return read_store_index(storepath)[1]
+
+
+def compact_store(storepath : str = None):
+    """Rewrite the store as a single segment, dropping overwritten rows
+
+    Args
+        storepath = store directory
+
+    Returns
+
+    Raises
+    """
+    segpathL = segment_paths(storepath)
+    if len(segpathL) <= 1:
+        return
+    (hashS, highwater) = read_store_index(storepath)
+    df = read_sacct_store(storepath)
+    df[HASH_COLUMN] = row_hash(df)
+    # Written past the last segment first s.t. a crash never loses rows
+    nseg = int(segpathL[-1].split('_')[-1].split('.')[0]) + 1
+    save_frame(df, os.path.join(storepath, "segment_{:06d}.npz".format(nseg)))
+    write_store_index(storepath, hashS, highwater)
+    for segpath in segpathL:
+        os.remove(segpath)
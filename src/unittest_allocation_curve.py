@@ -0,0 +1,80 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests AllocationCurve
+"""
+import os
+import random
+import unittest
+import tempfile
+import numpy as np
+import datetime
+from classes import JobTable,AllocationCurve
+from functions import bin_job_overlap
+from unittest_bin_job_overlap import make_jobs
+
+
+class TEST_ALLOCATION_CURVE(unittest.TestCase):
+    """
+    Test that AllocationCurve.query() agrees with summing bin_job_overlap()
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def test_query(self):
+        """
+        Windows on hour boundaries must equal the sum of the hourly intervals
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        jobtable = JobTable.from_jobs(make_jobs(300))
+        curve = AllocationCurve.from_table(jobtable)
+        start = datetime.datetime(2024, 10, 1)
+        end   = datetime.datetime(2024, 11, 1)
+        gpudf = bin_job_overlap(jobtable, start, end, 3600, 'gpu')
+        cpudf = bin_job_overlap(jobtable, start, end, 3600, 'cpu')
+        random.seed(1)
+        for i in range(50):
+            a = random.randint(0, 700)
+            b = random.randint(a, 744)
+            mintime = start + datetime.timedelta(hours=a)
+            maxtime = start + datetime.timedelta(hours=b+1)
+            for name in ['total', 'bill', 'anna', 'ryan']:
+                (gpuraw, cpuraw) = curve.query(mintime, maxtime, name)
+                self.assertTrue(np.isclose(gpudf[name].iloc[a:b+1].sum(), gpuraw))
+                self.assertTrue(np.isclose(cpudf[name].iloc[a:b+1].sum(), cpuraw))
+
+
+    def test_save_load(self):
+        """
+        Curve read back from disk answers identically
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        jobtable = JobTable.from_jobs(make_jobs(50))
+        curve = AllocationCurve.from_table(jobtable, excludenodeL=['node02'])
+        start = datetime.datetime(2024, 10, 3)
+        end   = datetime.datetime(2024, 10, 9, 12, 30)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'curve.npz')
+            curve.save(path)
+            loaded = AllocationCurve.load(path)
+        self.assertEqual(['node02'], loaded.excludenodeL)
+        self.assertTrue(curve.query_all(start, end).equals(loaded.query_all(start, end)))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
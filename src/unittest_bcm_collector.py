@@ -0,0 +1,193 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests the concurrent, incremental BCM collector against a
+   fake cmsh
+"""
+import os
+import sys
+import stat
+import unittest
+import tempfile
+import datetime
+import numpy as np
+from classes import UtilSeries
+from classes import to_epoch
+from bcm_collector import collect_gpu_util
+from bcm_collector import util_file_high_water
+
+
+# Prints canned output for the commands bcm_collector runs. 'now' in its
+# directory is the time of the newest sample, 'fail' holds a command substring
+# and the number of times to print garbage for it, every command is logged.
+FAKE_CMSH = """#!{python}
+import os
+import re
+import sys
+import datetime
+fakedir = os.path.dirname(os.path.abspath(__file__))
+command = sys.argv[2]
+with open(os.path.join(fakedir, 'log'), 'a') as fout:
+    fout.write(command + '\\n')
+if os.path.isfile(os.path.join(fakedir, 'fail')):
+    with open(os.path.join(fakedir, 'fail')) as fin:
+        (pattern, count) = fin.read().rsplit(' ', 1)
+    if pattern in command and int(count) > 0:
+        with open(os.path.join(fakedir, 'fail'), 'w') as fout:
+            fout.write("{{}} {{}}".format(pattern, int(count) - 1))
+        print("Error: lost connection to cmdaemon")
+        sys.exit(0)
+if command == 'device; list':
+    print("Type             Hostname (key)   Category   Status")
+    print("---------------- ---------------- ---------- ------")
+    for (kind, name) in [('HeadNode', 'head01'), ('PhysicalNode', 'n01'),
+                         ('PhysicalNode', 'n02'), ('PhysicalNode', 'cpu01')]:
+        print("{{:16}} {{:16}} default    [   UP   ]".format(kind, name))
+    sys.exit(0)
+if command.endswith('measurables'):
+    print("Type       Name                      Parameter  Class")
+    print("metric     cpu_usage                            CPU")
+    if 'cpu01' not in command:
+        for gidx in range(2):
+            print("metric     gpu_utilization:gpu{{}}                GPU".format(gidx))
+    sys.exit(0)
+with open(os.path.join(fakedir, 'now')) as fin:
+    now = int(fin.read())
+match = re.search(r'--consolidationinterval (\\w+)', command)
+step = {{None : 10, '1h' : 3600, '1d' : 86400}}[None if match is None else match.group(1)]
+if 'totalgpuutilization' in command and match is None:
+    step = 120
+epoch = datetime.datetime(1970, 1, 1)
+match = re.search(r'"([^"]+)"', command)
+if match is not None:
+    since = int((datetime.datetime.strptime(match.group(1), "%Y/%m/%d %H:%M:%S") -
+                 epoch).total_seconds())
+else:
+    since = now - 86400 * int(re.search(r' -(\\d+)d ', command).group(1))
+start = epoch + datetime.timedelta(seconds=since)
+print("# Start time : {{}}".format(start.strftime("%b %d %H:%M:%S %Y")))
+for t in range(-(-since // step) * step, now + 1, step):
+    date = epoch + datetime.timedelta(seconds=t)
+    print("{{}}.250  {{}}%".format(date.strftime("%Y/%m/%d %H:%M:%S"), (t // step) % 100))
+"""
+
+
+class TEST_BCM_COLLECTOR(unittest.TestCase):
+    """
+    Test collect_gpu_util() with a fake cmsh
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.fakedir = os.path.join(self.tmpdir.name, 'bin')
+        self.outdir = os.path.join(self.tmpdir.name, 'util')
+        os.makedirs(self.fakedir)
+        self.cmsh = os.path.join(self.fakedir, 'cmsh')
+        with open(self.cmsh, 'w') as fout:
+            fout.write(FAKE_CMSH.format(python=sys.executable))
+        os.chmod(self.cmsh, os.stat(self.cmsh).st_mode | stat.S_IXUSR)
+        self.cmshD = {'cmsh' : self.cmsh, 'retries' : 2, 'backoff' : 0}
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def set_fake(self, name, value):
+        """Write one of the fake's state files"""
+        with open(os.path.join(self.fakedir, name), 'w') as fout:
+            fout.write(value)
+
+
+    def log(self):
+        """Commands run since the last call"""
+        path = os.path.join(self.fakedir, 'log')
+        with open(path) as fin:
+            commandL = fin.read().splitlines()
+        os.remove(path)
+        return commandL
+
+
+    def check_series(self, path, first, last, step):
+        """Samples of path are every step in [first, last], each once"""
+        series = UtilSeries(path)
+        timeV = np.arange(-(-first // step) * step, last + 1, step)
+        self.assertTrue(np.array_equal(timeV, series.timeV))
+        self.assertTrue(np.array_equal((timeV // step) % 100, series.utilV))
+
+
+    def test_collect(self):
+        """
+        Discovery, first dump, incremental dump and failures
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        now = to_epoch(datetime.datetime(2024, 11, 8))
+        self.set_fake('now', str(now))
+        countD = collect_gpu_util(self.outdir, None, None, None, ['2min', '1h'], 4,
+                                  self.cmshD)
+        self.assertEqual([], countD['failedL'])
+        # n01 and n02 have 2 gpus, cpu01 none
+        self.assertEqual(2 * 2 * 2 + 2, countD['series'])
+        self.assertEqual(sorted(os.listdir(self.outdir)),
+                         sorted(["n0{}_gpuutil_gpu{}_{}.txt".format(i, g, res)
+                                 for i in [1, 2] for g in [0, 1] for res in ['10s', '1h']] +
+                                ['totalgpuutilization_2min.txt',
+                                 'totalgpuutilization_1h.txt']))
+        self.assertEqual(1 + 3 + 10, len(self.log()))
+        path = os.path.join(self.outdir, 'n02_gpuutil_gpu1_10s.txt')
+        self.assertEqual(now, util_file_high_water(path))
+        self.check_series(path, now - 7 * 86400, now, 10)
+
+        # Only the new samples, from the high-water mark on, are requested
+        self.set_fake('now', str(now + 3600))
+        countD = collect_gpu_util(self.outdir, 'n[01-02]', 'n01', 2, ['2min', '1h'], 4,
+                                  self.cmshD)
+        self.assertEqual([], countD['failedL'])
+        self.assertEqual(2 * (2 + 1), countD['series'])
+        # The sample at the high-water mark is dumped again
+        self.assertEqual(2 * 361 + 31 + 2 * 2 + 2, countD['samples'])
+        commandL = self.log()
+        self.assertEqual(6, len(commandL))
+        self.assertIn('device; dumpmonitoringdata "2024/11/08 00:00:00" now '
+                      'gpu_utilization:gpu1 -n n02', commandL)
+        self.check_series(path, now - 7 * 86400, now + 3600, 10)
+        self.check_series(os.path.join(self.outdir, 'n02_gpuutil_gpu0_1h.txt'),
+                          now - 365 * 86400, now + 3600, 3600)
+        self.check_series(os.path.join(self.outdir, 'totalgpuutilization_2min.txt'),
+                          now - 7 * 86400, now + 3600, 120)
+        # Excluded
+        self.check_series(os.path.join(self.outdir, 'n01_gpuutil_gpu0_10s.txt'),
+                          now - 7 * 86400, now, 10)
+
+        # Garbage output is retried, after the retries the file is left alone
+        self.set_fake('now', str(now + 7200))
+        self.set_fake('fail', "gpu1 -n n02 1")
+        countD = collect_gpu_util(self.outdir, 'n02', None, 2, ['2min'], 4, self.cmshD)
+        self.assertEqual([], countD['failedL'])
+        self.check_series(path, now - 7 * 86400, now + 7200, 10)
+        self.set_fake('now', str(now + 10800))
+        self.set_fake('fail', "gpu1 -n n02 3")
+        countD = collect_gpu_util(self.outdir, 'n02', None, 2, ['2min'], 4, self.cmshD)
+        self.assertEqual(1, len(countD['failedL']))
+        self.assertIn('lost connection', countD['failedL'][0])
+        self.check_series(path, now - 7 * 86400, now + 7200, 10)
+        self.check_series(os.path.join(self.outdir, 'n02_gpuutil_gpu0_10s.txt'),
+                          now - 7 * 86400, now + 10800, 10)
+        self.assertEqual([], [name for name in os.listdir(self.outdir)
+                              if not name.endswith('.txt')])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
@@ -0,0 +1,106 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests bin_job_overlap() against is_job_in_time_range()
+"""
+import random
+import unittest
+import numpy as np
+import pandas as pd
+import datetime
+from classes import Job,JobTable
+from functions import bin_job_overlap
+from functions import is_job_in_time_range
+
+
+def scalar_time_series(jobL, start, end, interval, cpuorgpu):
+    """Reference, the original O(intervals x jobs) loop from gather_time_series()
+    """
+    delta = datetime.timedelta(seconds=interval)
+    date = start
+    dateD = dict()
+    while date <= end:
+        mint = date
+        maxt = date + delta
+        userD = dict()
+        totalraw = 0
+        for job in jobL:
+            inrange, overlap = is_job_in_time_range(job, mint, maxt)
+            if inrange == True:
+                jobraw = 0
+                if job.elapsedraw > 0:
+                    if cpuorgpu == 'gpu':
+                        jobraw = job.gputimeraw * overlap.total_seconds() / job.elapsedraw
+                    else:
+                        jobraw = job.cputimeraw * overlap.total_seconds() / job.elapsedraw
+                totalraw += jobraw
+                userD[job.user] = userD.get(job.user, 0) + jobraw
+        userD['total'] = totalraw
+        dateD[date + delta/2.0] = userD
+        date += delta
+    df = pd.DataFrame.from_dict(dateD, orient='index')
+    df.sort_index(inplace=True)
+    df.fillna(0, inplace=True)
+    return df
+
+
+def make_jobs(njob):
+    """Random jobs, including ones on interval edges, RUNNING and 0s jobs"""
+    random.seed(42)
+    begin = datetime.datetime(2024, 10, 1)
+    jobL = []
+    for jobid in range(njob):
+        start = begin + datetime.timedelta(hours=random.randint(-48, 24*31),
+                                           seconds=random.choice([0, random.randint(0, 3599)]))
+        elapsed = random.choice([0, 3600, 86400, random.randint(1, 10*86400)])
+        ngpu = random.randint(0, 8)
+        ncpu = random.randint(1, 32)
+        state = random.choice(['COMPLETED', 'COMPLETED', 'FAILED', 'RUNNING'])
+        job = Job(jobid=jobid, jobname='test', user=random.choice(['bill', 'anna', 'ryan']),
+                  nodelist='node01', elapsedraw=elapsed, alloccpus=ncpu,
+                  cputimeraw=ncpu*elapsed, maxrss='10M', state=state,
+                  start=start, end=start + datetime.timedelta(seconds=elapsed),
+                  reqtres='billing=1,cpu={},gres/gpu={},mem=10G,node=1'.format(ncpu, ngpu))
+        jobL.append(job)
+    return jobL
+
+
+class TEST_BIN_JOB_OVERLAP(unittest.TestCase):
+    """
+    Test that bin_job_overlap() reproduces the scalar is_job_in_time_range() loop
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def test_bin_job_overlap(self):
+        """
+        Compare per user and total columns for several interval widths
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        jobL = make_jobs(300)
+        jobtable = JobTable.from_jobs(jobL)
+        start = datetime.datetime(2024, 10, 1)
+        end   = datetime.datetime(2024, 11, 1)
+        for interval in [3600, 5.5*3600, 24*3600, 40*86400]:
+            for cpuorgpu in ['gpu', 'cpu']:
+                truthdf = scalar_time_series(jobL, start, end, interval, cpuorgpu)
+                df = bin_job_overlap(jobtable, start, end, interval, cpuorgpu)
+                self.assertEqual(sorted(truthdf.columns), sorted(df.columns))
+                self.assertEqual(list(truthdf.index), list(df.index))
+                for col in truthdf.columns:
+                    self.assertTrue(np.allclose(truthdf[col].to_numpy(),
+                                                df[col].to_numpy()))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
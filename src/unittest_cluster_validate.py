@@ -0,0 +1,89 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests Cluster.validate()
+"""
+import os
+import unittest
+import tempfile
+import numpy as np
+from functions import open_gpu_util
+from unittest_mean_util import write_util
+
+
+class TEST_CLUSTER_VALIDATE(unittest.TestCase):
+    """
+    Test the node vs total consistency check on a small cluster
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_validate(self):
+        """
+        Outliers, node shares, 'no data' runs, jumps and missing gpus
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        path = self.tmpdir.name
+        timeL = list(range(0, 200, 10))
+        utilD = {('n01', 0) : [10] * 20, ('n01', 1) : [30] * 20,
+                 ('n02', 0) : [50] * 20, ('n02', 1) : [70] * 20}
+        # 'no data' on n02 gpu1 for samples 5 - 7, the mean is of the other 4
+        utilD[('n02', 1)][5:8] = [None] * 3
+        totalL = [40] * 20
+        totalL[5:8] = [32.5] * 3
+        totalL[12] = 45
+        for (node, gidx), utilL in utilD.items():
+            write_util(os.path.join(path, "{}_gpuutil_gpu{}_1h.txt".format(node, gidx)),
+                       timeL, utilL)
+        # n03 lost gpu1 and has a jump
+        write_util(os.path.join(path, "n03_gpuutil_gpu0_1h.txt"),
+                   timeL[:10] + timeL[15:], [40] * 15)
+        write_util(os.path.join(path, "totalgpuutilization_1h.txt"), timeL, totalL)
+        validD = open_gpu_util(path, '1h').validate(tolerance=1.0)
+
+        timedf = validD['timedf']
+        self.assertEqual(20, len(timedf))
+        self.assertAlmostEqual(40, timedf['mean'].iloc[0])
+        self.assertAlmostEqual(32.5, timedf['mean'].iloc[6])
+        self.assertAlmostEqual(5, timedf['deviation'].iloc[12])
+        self.assertEqual([5, 4, 4], timedf['ngpu'].iloc[[0, 6, 11]].tolist())
+        summaryD = validD['summary']
+        self.assertEqual(1, summaryD['noutlier'])
+        self.assertFalse(summaryD['valid'])
+        self.assertAlmostEqual(1, summaryD['scale'])
+
+        nodedf = validD['nodedf']
+        self.assertEqual(['n01', 'n02', 'n03'], nodedf['node'].tolist())
+        self.assertAlmostEqual(20, nodedf['mean'].iloc[0])
+        self.assertAlmostEqual(0.75, nodedf['coverage'].iloc[2])
+        self.assertAlmostEqual(1, nodedf['share'].sum())
+
+        gapdf = validD['gapdf']
+        self.assertEqual([('n02', 1, 50, 80, 3, 'nodata'), ('n03', 0, 100, 150, 0,
+                          'missing')],
+                         [(row.node, row.gidx, row.start - timedf['time'].iloc[0],
+                           row.end - timedf['time'].iloc[0], row.nsample, row.kind)
+                          for row in gapdf.itertuples()])
+        self.assertEqual([('n03', 1)], validD['missingL'])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
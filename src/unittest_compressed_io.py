@@ -0,0 +1,128 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests reading compressed sacct and utilization files
+"""
+import os
+import gzip
+import lzma
+import shutil
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+from classes import read_util_file
+from functions import read_sacct_frame
+from functions import iter_sacct_frames
+from functions import gpu_util_manifest
+from compressed_io import zstandard
+from compressed_io import open_input
+from compressed_io import compression_of
+from compressed_io import COMPRESSION_SUFFIXES
+from unittest_mean_util import write_util
+from unittest_rollup import make_raw
+
+
+def compress(path, suffix):
+    """Write path + suffix compressed, returns its path"""
+    outpath = path + suffix
+    if suffix == '.gz':
+        opener = gzip.open
+    elif suffix == '.xz':
+        opener = lzma.open
+    with open(path, 'rb') as fin, opener(outpath, 'wb') as fout:
+        shutil.copyfileobj(fin, fout)
+    return outpath
+
+
+class TEST_COMPRESSED_IO(unittest.TestCase):
+    """
+    Test that compressed inputs read the same as the plain ones
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_util_file(self):
+        """
+        read_util_file() of gzip / xz files, whole and windowed, and the
+        manifest of a directory with compressed files
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        path = os.path.join(self.tmpdir.name, 'n01_gpuutil_gpu0_10s.txt')
+        (timeL, utilL) = make_raw(5000, 2)
+        write_util(path, timeL, utilL)
+        (timeV, utilV, headerL) = read_util_file(path)
+        start = int(timeV[1000]) + 3
+        end = int(timeV[3000]) - 3
+        (wtimeV, wutilV, _) = read_util_file(path, start, end)
+        suffixL = ['.gz', '.xz'] + ([] if zstandard is None else ['.zst'])
+        for suffix in suffixL:
+            if suffix == '.zst':
+                with open(path, 'rb') as fin, open(path + suffix, 'wb') as fout:
+                    zstandard.ZstdCompressor().copy_stream(fin, fout)
+                cpath = path + suffix
+            else:
+                cpath = compress(path, suffix)
+            self.assertEqual(COMPRESSION_SUFFIXES[suffix], compression_of(cpath))
+            (ctimeV, cutilV, cheaderL) = read_util_file(cpath)
+            self.assertTrue(np.array_equal(timeV, ctimeV))
+            self.assertTrue(np.array_equal(utilV, cutilV, equal_nan=True))
+            self.assertEqual(headerL, cheaderL)
+            (ctimeV, cutilV, _) = read_util_file(cpath, start, end)
+            self.assertTrue(np.array_equal(wtimeV, ctimeV))
+            self.assertTrue(np.array_equal(wutilV, cutilV, equal_nan=True))
+
+        # The plain file wins over its compressed copies
+        os.rename(path + '.gz', os.path.join(self.tmpdir.name,
+                                             'n01_gpuutil_gpu1_1h.txt.gz'))
+        shutil.copy(os.path.join(self.tmpdir.name, 'n01_gpuutil_gpu1_1h.txt.gz'),
+                    os.path.join(self.tmpdir.name, 'totalgpuutilization_1h.txt.gz'))
+        (gpuD, totalD) = gpu_util_manifest(self.tmpdir.name)
+        self.assertEqual(path, gpuD['2min']['n01'][0])
+        self.assertEqual('n01_gpuutil_gpu1_1h.txt.gz',
+                         os.path.basename(gpuD['1h']['n01'][1]))
+        self.assertEqual('totalgpuutilization_1h.txt.gz',
+                         os.path.basename(totalD['1h']))
+
+
+    def test_sacct(self):
+        """
+        read_sacct_frame() / iter_sacct_frames() of a gzip file
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        path = os.path.join(self.tmpdir.name, 'sacct')
+        shutil.copy('data/test_data.txt', path)
+        cpath = compress(path, '.gz')
+        df = read_sacct_frame(path, cache=False)
+        pd.testing.assert_frame_equal(df, read_sacct_frame(cpath, cache=False))
+        pd.testing.assert_frame_equal(df, pd.concat(list(iter_sacct_frames(cpath, 3)),
+                                                    ignore_index=True))
+        with open_input(cpath) as fin:
+            self.assertEqual(b'JobID|', fin.peek(6)[:6])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
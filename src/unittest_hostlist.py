@@ -0,0 +1,133 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests Slurm hostlist expansion and HostList
+"""
+import io
+import unittest
+import numpy as np
+import pandas as pd
+from hostlist import HostList
+from hostlist import expand_hostlist
+from hostlist import select_nodes
+from functions import parse_sacct_table
+
+
+class TEST_HOSTLIST(unittest.TestCase):
+    """
+    Test hostlist expansion, interning and the node filters built on it
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def test_expand(self):
+        """
+        Real Slurm syntax, multiple groups, comma joined stems and padding
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        self.assertEqual(['node06', 'node07', 'node08', 'node13'],
+                         expand_hostlist('node[06-08,13]'))
+        self.assertEqual(['a01', 'a02', 'b03'], expand_hostlist('a[01-02],b03'))
+        self.assertEqual(['r1-n01', 'r1-n02', 'r2-n01', 'r2-n02'],
+                         expand_hostlist('r[1-2]-n[01-02]'))
+        self.assertEqual(['gpu9', 'gpu10'], expand_hostlist('gpu[9-10]'))
+        self.assertEqual(['gpu009', 'gpu010'], expand_hostlist('gpu[009-010]'))
+        self.assertEqual(['dgx01'], expand_hostlist('dgx01'))
+        self.assertEqual(['None assigned'], expand_hostlist('None assigned'))
+        # Callers get their own list
+        expand_hostlist('dgx01').append('dgx02')
+        self.assertEqual(['dgx01'], expand_hostlist('dgx01'))
+        for bad in ['node[01-02', 'node01]', 'node[05-01]', 'node[a-b]']:
+            with self.assertRaises(ValueError):
+                expand_hostlist(bad)
+
+
+    def test_hostlist(self):
+        """
+        Node names are interned once, CSR and bitsets agree
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        hostlist = HostList()
+        nodelistS = pd.Series(['n[01-02]', 'n02', 'n[01-02]', 'm[1-70]'])
+        (nodeptrV, nodeidxV) = hostlist.encode(nodelistS)
+        self.assertEqual([0, 2, 3, 5, 75], nodeptrV.tolist())
+        self.assertEqual([0, 1, 1, 0, 1], nodeidxV[:5].tolist())
+        self.assertEqual(72, len(hostlist))
+        self.assertIs(hostlist.ids('n02'), hostlist.ids('n02'))
+        bitV = hostlist.bitsets(nodelistS)
+        self.assertEqual((4, 2), bitV.shape)
+        self.assertEqual([3, 2, 3], bitV[:3, 0].tolist())
+        self.assertEqual(70, sum(bin(int(word)).count('1') for word in bitV[3]))
+        self.assertEqual([1], hostlist.lookup(['n02', 'x01']).tolist())
+
+
+    def test_node_mask(self):
+        """
+        JobTable.node_mask() and node_totals() over the CSR
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        # --format="job,..." dump, as read by bcm_accounting_plots.py --path
+        sacct = ("JobID|JobName|User|NodeList|ElapsedRaw|AllocCPUS|CPUTimeRAW|"
+                 "MaxRSS|State|Start|End|ReqTRES\n")
+        for jobid, nodelist in [('1_1', 'a[01-02],b03'), ('1_2', 'a02'),
+                                ('12', 'b[03-04]')]:
+            sacct += ("{}|x|u|{}|10|1|10||COMPLETED|2024-11-01T08:00:00|"
+                      "2024-11-01T08:00:10|billing=1,cpu=1,gres/gpu=1,mem=1G,"
+                      "node=1\n".format(jobid, nodelist))
+        df = pd.read_csv(io.StringIO(sacct), sep='|', na_filter=False)
+        (_, _, table, _, _) = parse_sacct_table(df=df)
+        self.assertEqual(['1_1', '1_2', '12'], table.jobidV.tolist())
+        self.assertEqual([True, True, False], table.node_mask(['a02']).tolist())
+        self.assertEqual([True, False, True], table.node_mask(['b03']).tolist())
+        self.assertEqual([False, True, False],
+                         table.node_mask(['a01', 'a02'], how='all').tolist())
+        self.assertEqual([False, True, False],
+                         table.node_filter(['a02', 'b03'], ['b03']).tolist())
+        self.assertEqual([False, True, False],
+                         table.node_filter(None, ['b03']).tolist())
+        totalD = dict(zip(table.nodenameL, table.node_totals(table.gputimerawV)))
+        self.assertEqual({'a01' : 10, 'a02' : 20, 'b03' : 20, 'b04' : 10}, totalD)
+
+
+    def test_select_nodes(self):
+        """
+        Include / exclude patterns with hostlists and globs
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        nameL = ['a01', 'a02', 'b03', 'b04', 'mig01']
+        self.assertEqual(([], ['a01', 'a02', 'mig01']),
+                         select_nodes(nameL, None, 'a[01-02],mig*'))
+        self.assertEqual((['b03', 'a02'], ['b04']),
+                         select_nodes(nameL, 'b0?,a02', 'b04'))
+        # Hostlists may name nodes no job ran on
+        self.assertEqual((['c01', 'c02'], []), select_nodes(nameL, 'c[01-02]', None))
+        with self.assertRaises(ValueError):
+            select_nodes(nameL, None, 'a[01-02')
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
@@ -0,0 +1,134 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests the join of sacct jobs with gpu utilization
+"""
+import io
+import os
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+from classes import Node
+from functions import parse_sacct_table
+from functions import job_gpu_utilization
+from functions import user_gpu_utilization
+from unittest_mean_util import write_util
+
+
+# 2024-11-01T00:00:00 is the start of the utilization files
+SACCT = """JobIDRaw|JobName|User|NodeList|ElapsedRaw|AllocCPUS|CPUTimeRAW|MaxRSS|State|Start|End|ReqTRES
+1|a|maggie|n01|40|1|40||COMPLETED|2024-11-01T00:00:00|2024-11-01T00:00:40|billing=1,cpu=1,gres/gpu=2,mem=1G,node=1
+2|b|maggie|n[01-02]|20|1|20||COMPLETED|2024-11-01T00:00:20|2024-11-01T00:00:40|billing=1,cpu=1,gres/gpu=4,mem=1G,node=2
+3|c|bart|n03|20|1|20||COMPLETED|2024-11-01T00:00:00|2024-11-01T00:00:20|billing=1,cpu=1,gres/gpu=1,mem=1G,node=1
+4|d|bart|n01|20|1|20||COMPLETED|2024-11-01T00:00:00|2024-11-01T00:00:20|billing=1,cpu=1,mem=1G,node=1
+5|e|lisa|n02|0|1|0||PENDING|None|Unknown|billing=1,cpu=1,gres/gpu=1,mem=1G,node=1
+6|f|lisa|n[01,03]|40|1|40||COMPLETED|2024-11-01T00:00:00|2024-11-01T00:00:40|billing=1,cpu=1,gres/gpu=4,mem=1G,node=2
+"""
+
+
+class TEST_JOB_GPU_UTILIZATION(unittest.TestCase):
+    """
+    Test job_gpu_utilization() / user_gpu_utilization() on hand computed cases
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def node(self, name, utilLL):
+        """Node with one gpu per list of utilization, samples every 10s"""
+        pathL = []
+        for gidx, utilL in enumerate(utilLL):
+            path = os.path.join(self.tmpdir.name,
+                                "{}_gpuutil_gpu{}_2min.txt".format(name, gidx))
+            write_util(path, [10 * i for i in range(len(utilL))], utilL)
+            pathL.append(path)
+        return Node(pathL)
+
+
+    def test_job_gpu_utilization(self):
+        """
+        Means over the job's nodes and windows, gaps and unknown nodes lower
+        the coverage
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        nodeL = [self.node('n01', [[100, 100, 0, 0], [50, 50, 50, 50]]),
+                 self.node('n02', [[20, 20, None, 40], [20, 20, 20, 40]])]
+        df = pd.read_csv(io.StringIO(SACCT), sep='|', na_filter=False)
+        (_, _, jobtable, _, _) = parse_sacct_table(df=df)
+        jobdf = job_gpu_utilization(jobtable, nodeL)
+        self.assertEqual(['1', '2', '3', '6'], jobdf['jobid'].tolist())
+        self.assertEqual(['maggie', 'maggie', 'bart', 'lisa'], jobdf['user'].tolist())
+        # Job 1 : n01 over [0, 40)
+        self.assertAlmostEqual(50, jobdf['meanutil'].iloc[0])
+        self.assertAlmostEqual(1, jobdf['coverage'].iloc[0])
+        self.assertAlmostEqual(40, jobdf['idlegputime'].iloc[0])
+        # Job 2 : n01 + n02 over [20, 40), one n02 sample is 'no data'
+        self.assertAlmostEqual((50 * 2 + 40 + 20 + 40) / 7,
+                               jobdf['meanutil'].iloc[1])
+        self.assertAlmostEqual(70 / 80, jobdf['coverage'].iloc[1])
+        # Job 3 : n03 has no files
+        self.assertTrue(np.isnan(jobdf['meanutil'].iloc[2]))
+        self.assertEqual(0, jobdf['coverage'].iloc[2])
+        # Job 6 : covered n01 plus n03 without files, weighted as a 2 gpu node
+        self.assertAlmostEqual(50, jobdf['meanutil'].iloc[3])
+        self.assertAlmostEqual(0.5, jobdf['coverage'].iloc[3])
+        self.assertEqual(0, job_gpu_utilization(jobtable[jobtable.jobidV == '3'],
+                                                [])['coverage'].iloc[0])
+
+        userdf = user_gpu_utilization(jobdf)
+        self.assertEqual(['maggie', 'lisa'], userdf.index.tolist())
+        self.assertEqual(2, userdf['njobs'].iloc[0])
+        self.assertAlmostEqual((50 * 80 + jobdf['meanutil'].iloc[1] * 80) / 160,
+                               userdf['meanutil'].iloc[0])
+        self.assertAlmostEqual(jobdf['idlegputime'].iloc[:2].sum(),
+                               userdf['idlegputime'].iloc[0])
+
+
+    def test_matches_node_mean(self):
+        """
+        Single node jobs agree with Node.mean_util()
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        rng = np.random.default_rng(3)
+        node = self.node('n01', [rng.integers(0, 100, 50).tolist() for i in range(2)])
+        sacct = SACCT.split('\n')[0] + '\n'
+        startV = rng.integers(0, 400, 30)
+        endV = startV + rng.integers(1, 200, 30)
+        for i, (start, end) in enumerate(zip(startV, endV)):
+            sacct += ("{}|x|u|n01|{}|1|{}||COMPLETED|{}|{}|gres/gpu=2\n".format(
+                      i + 1, end - start, end - start,
+                      (pd.Timestamp('2024-11-01') + pd.Timedelta(seconds=start)).isoformat(),
+                      (pd.Timestamp('2024-11-01') + pd.Timedelta(seconds=end)).isoformat()))
+        df = pd.read_csv(io.StringIO(sacct), sep='|', na_filter=False)
+        (_, _, jobtable, _, _) = parse_sacct_table(df=df)
+        jobdf = job_gpu_utilization(jobtable, [node])
+        (meanV, coverageV) = node.mean_util(jobtable.startV, jobtable.endV)
+        self.assertTrue(np.allclose(meanV, jobdf['meanutil'], equal_nan=True))
+        self.assertTrue(np.allclose(coverageV, jobdf['coverage']))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
@@ -0,0 +1,187 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests the time weighted utilization queries of Gpu / Node
+"""
+import os
+import random
+import unittest
+import tempfile
+import datetime
+import numpy as np
+from classes import Gpu
+from classes import Node
+from classes import JobTable
+from functions import time_grid
+from functions import resample_util
+from functions import bin_job_overlap
+from unittest_bin_job_overlap import make_jobs
+
+
+def write_util(path, timeL, utilL):
+    """Write a dumpmonitoringdata like file, None is 'no data'"""
+    begin = datetime.datetime(2024, 11, 1)
+    with open(path, 'w') as fout:
+        fout.write("# Start time : Nov 01 00:00:00 2024\n")
+        for time, util in zip(timeL, utilL):
+            date = begin + datetime.timedelta(seconds=time)
+            value = "no data" if util is None else "{}%".format(util)
+            fout.write("{}.250  {}\n".format(date.strftime("%Y/%m/%d %H:%M:%S"), value))
+
+
+def brute_mean_util(timeL, utilL, start, end):
+    """Reference, one step per second with the same sample / gap rules"""
+    diffV = np.diff(timeL)
+    period = int(np.median(diffV[diffV > 0]))
+    total = 0
+    covered = 0
+    for t in range(start, end):
+        k = np.searchsorted(timeL, t, side='right') - 1
+        if k < 0 or utilL[k] is None:
+            continue
+        span = period if k == len(timeL) - 1 else min(timeL[k+1] - timeL[k], period)
+        if t - timeL[k] < span:
+            total += utilL[k]
+            covered += 1
+    mean = np.nan if covered == 0 else total / covered
+    return(mean, covered / (end - start))
+
+
+class TEST_MEAN_UTIL(unittest.TestCase):
+    """
+    Test Gpu.mean_util() / Node.mean_util() against a per second reference
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_gpu(self):
+        """
+        Hand computed windows, gaps, 'no data' and random windows
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        path = os.path.join(self.tmpdir.name, 'node01_gpuutil_gpu0_10s.txt')
+        timeL = [0, 10, 20, 30, 100, 110]
+        utilL = [45, 50.5, None, 0, 10, 20]
+        write_util(path, timeL, utilL)
+        gpu = Gpu(path)
+        t0 = gpu.timeV[0]
+        (meanV, coverageV) = gpu.mean_util(t0 + np.array([0, 5, 40, 20]),
+                                           t0 + np.array([40, 15, 100, 30]))
+        self.assertTrue(np.allclose([955 / 30, 47.75], meanV[:2]))
+        self.assertTrue(np.allclose([0.75, 1, 0, 0], coverageV))
+        self.assertTrue(np.isnan(meanV[2]) and np.isnan(meanV[3]))
+        start = datetime.datetime(2024, 11, 1, 0, 0, 5)
+        self.assertAlmostEqual(47.75, gpu.mean_util_over_interval(
+                               start, start + datetime.timedelta(seconds=10)))
+
+        random.seed(7)
+        for i in range(50):
+            start = random.randint(-20, 130)
+            end = start + random.randint(1, 150)
+            (mean, coverage) = brute_mean_util(timeL, utilL, start, end)
+            (meanV, coverageV) = gpu.mean_util(np.array([t0 + start]),
+                                               np.array([t0 + end]))
+            self.assertAlmostEqual(coverage, coverageV[0])
+            if np.isnan(mean):
+                self.assertTrue(np.isnan(meanV[0]))
+            else:
+                self.assertAlmostEqual(mean, meanV[0])
+
+
+    def test_node(self):
+        """
+        Node averages gpus weighted by the time they have data
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        pathL = [os.path.join(self.tmpdir.name, 'node01_gpuutil_gpu0_10s.txt'),
+                 os.path.join(self.tmpdir.name, 'node01_gpuutil_gpu1_10s.txt')]
+        write_util(pathL[0], [0, 10, 20, 30], [100, 100, 100, 100])
+        write_util(pathL[1], [0, 10, 20, 30], [0, None, None, 0])
+        node = Node(pathL)
+        t0 = node.gpuL[0].timeV[0]
+        (meanV, coverageV) = node.mean_util(np.array([t0]), np.array([t0 + 40]))
+        self.assertAlmostEqual(400 / 6, meanV[0])
+        self.assertAlmostEqual(0.75, coverageV[0])
+        self.assertAlmostEqual(400 / 6, node.calc_util_over_interval(
+                               datetime.datetime(2024, 11, 1),
+                               datetime.datetime(2024, 11, 1, 0, 0, 40)))
+
+
+    def test_resample(self):
+        """
+        Fixed grids agree with the per second reference and with the x-axis of
+        bin_job_overlap()
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        path = os.path.join(self.tmpdir.name, 'node01_gpuutil_gpu0_10s.txt')
+        random.seed(11)
+        # Irregular spacing, a long gap and 'no data'
+        timeL = sorted(random.sample(range(0, 300), 40)) + list(range(400, 600, 10))
+        utilL = [None if random.random() < 0.1 else random.randint(0, 100)
+                 for t in timeL]
+        write_util(path, timeL, utilL)
+        gpu = Gpu(path)
+        begin = datetime.datetime(2024, 11, 1)
+        for (offset, interval) in [(0, 60), (-30, 7), (13, 45.5), (250, 1000)]:
+            start = begin + datetime.timedelta(seconds=offset)
+            df = resample_util(gpu, start, start + datetime.timedelta(seconds=600),
+                               interval)
+            (edgeV, midV) = time_grid(start, start + datetime.timedelta(seconds=600),
+                                      interval)
+            self.assertTrue(midV.equals(df.index))
+            for k in range(len(df)):
+                if edgeV[k] != int(edgeV[k]) or edgeV[k+1] != int(edgeV[k+1]):
+                    continue
+                (mean, coverage) = brute_mean_util(timeL, utilL,
+                                                   int(edgeV[k] - edgeV[0]) + offset,
+                                                   int(edgeV[k+1] - edgeV[0]) + offset)
+                self.assertAlmostEqual(coverage, df['coverage'].iloc[k])
+                if np.isnan(mean):
+                    self.assertTrue(np.isnan(df['util'].iloc[k]))
+                else:
+                    self.assertAlmostEqual(mean, df['util'].iloc[k])
+
+        jobtable = JobTable.from_jobs(make_jobs(20))
+        start = datetime.datetime(2024, 10, 1)
+        end = datetime.datetime(2024, 10, 20)
+        allocdf = bin_job_overlap(jobtable, start, end, 3600, 'gpu')
+        utildf = resample_util(gpu, start, end, 3600)
+        self.assertTrue(allocdf.index.equals(utildf.index))
+        node = Node([path])
+        self.assertTrue(np.allclose(resample_util(node, begin, begin +
+                                    datetime.timedelta(seconds=600), 30)['util'],
+                                    resample_util(gpu, begin, begin +
+                                    datetime.timedelta(seconds=600), 30)['util'],
+                                    equal_nan=True))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
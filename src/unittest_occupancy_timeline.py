@@ -0,0 +1,162 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests OccupancyTimeline
+"""
+import random
+import unittest
+import datetime
+import numpy as np
+from classes import Job,JobTable,OccupancyTimeline
+from classes import to_epoch,from_epoch,UNKNOWN_TIME
+from functions import bin_job_overlap
+from functions import time_grid
+
+
+def make_jobs(njob):
+    """Random multi node jobs, including 0s jobs and shared start / end times"""
+    random.seed(7)
+    begin = datetime.datetime(2024, 10, 1)
+    jobL = []
+    for jobid in range(njob):
+        start = begin + datetime.timedelta(hours=random.randint(0, 24*10),
+                                           seconds=random.choice([0, random.randint(0, 3599)]))
+        elapsed = random.choice([0, 3600, 86400, random.randint(1, 3*86400)])
+        ngpu = random.randint(0, 16)
+        ncpu = random.randint(1, 64)
+        nodelist = random.choice(['node01', 'node02', 'node[01-02]', 'node[02-04]',
+                                  'node04'])
+        job = Job(jobid=jobid, jobname='test', user=random.choice(['bill', 'anna']),
+                  nodelist=nodelist, elapsedraw=elapsed, alloccpus=ncpu,
+                  cputimeraw=ncpu*elapsed, maxrss='10M', state='COMPLETED',
+                  start=start, end=start + datetime.timedelta(seconds=elapsed),
+                  reqtres='billing=1,cpu={},gres/gpu={},mem=10G,node=1'.format(ncpu, ngpu))
+        jobL.append(job)
+    return jobL
+
+
+def brute_force(jobtable, time, endtime):
+    """gpus, cpus, jobs and busy nodes per curve at time, one job at a time"""
+    valueD = {name : np.zeros(4, dtype=np.int64) for name in
+              ['total'] + jobtable.nodenameL}
+    for i in range(len(jobtable)):
+        end = jobtable.endV[i]
+        if end == UNKNOWN_TIME:
+            end = endtime
+        if not (jobtable.startV[i] <= time < end):
+            continue
+        nodeV = jobtable.nodes_of(i)
+        valueD['total'] += [jobtable.ngpuV[i], jobtable.alloccpusV[i], 1, 0]
+        for rank, node in enumerate(nodeV):
+            (ngpu, ncpu, nnode) = (jobtable.ngpuV[i], jobtable.alloccpusV[i], len(nodeV))
+            valueD[jobtable.nodenameL[node]] += [ngpu // nnode + (rank < ngpu % nnode),
+                                                 ncpu // nnode + (rank < ncpu % nnode),
+                                                 1, 1]
+    for name in jobtable.nodenameL:
+        valueD[name][3] = min(valueD[name][3], 1)
+        valueD['total'][3] += valueD[name][3]
+    return valueD
+
+
+class TEST_OCCUPANCY_TIMELINE(unittest.TestCase):
+    """
+    Test OccupancyTimeline against counting running jobs one at a time
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.jobtable = JobTable.from_jobs(make_jobs(200))
+        # A few jobs still running at the dump
+        self.jobtable.endV[:5] = UNKNOWN_TIME
+        self.endtime = datetime.datetime(2024, 10, 12)
+        self.timeline = OccupancyTimeline.from_table(self.jobtable, self.endtime)
+
+
+    def test_at(self):
+        """
+        Values at random times and at every start / end
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        random.seed(3)
+        timeL = [to_epoch(datetime.datetime(2024, 10, 1)) + random.randint(-3600, 13*86400)
+                 for i in range(100)]
+        timeL += list(self.jobtable.startV[:20]) + list(self.jobtable.endV[5:25])
+        for time in timeL:
+            valueD = brute_force(self.jobtable, time, to_epoch(self.endtime))
+            for name in valueD:
+                for c, column in enumerate(['gpus', 'cpus', 'jobs', 'nodes']):
+                    self.assertEqual(valueD[name][c],
+                                     self.timeline.at(time, name, column))
+        # Without endtime the running jobs are skipped
+        timeline = OccupancyTimeline.from_table(self.jobtable)
+        finished = OccupancyTimeline.from_table(self.jobtable[5:])
+        for column in ['gpus', 'cpus', 'jobs', 'nodes']:
+            for (a, b) in zip(timeline.curve('total', column),
+                              finished.curve('total', column)):
+                self.assertTrue(np.array_equal(a, b))
+
+
+    def test_peak_heatmap(self):
+        """
+        Peaks against a dense scan and heatmap / integral against
+        bin_job_overlap()
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        mintime = datetime.datetime(2024, 10, 3, 5, 17)
+        maxtime = datetime.datetime(2024, 10, 6, 1, 3)
+        for name in ['total', 'node02']:
+            (knotV, valueV) = self.timeline.curve(name, 'gpus')
+            (peak, peaktime) = self.timeline.peak(mintime, maxtime, name)
+            timeV = np.concatenate([[to_epoch(mintime)], knotV[(knotV > to_epoch(mintime)) &
+                                                              (knotV < to_epoch(maxtime))]])
+            atV = self.timeline.at(timeV, name)
+            self.assertEqual(atV.max(), peak)
+            self.assertEqual(from_epoch(timeV[np.argmax(atV)]), peaktime)
+            self.assertEqual(peak, self.timeline.at(to_epoch(peaktime), name))
+        df = self.timeline.peak_all(mintime, maxtime, 'cpus')
+        self.assertEqual(['total', 'node01', 'node02', 'node03', 'node04'],
+                         ['total'] + sorted(df.index[1:]))
+        self.assertTrue(np.all(np.diff(df['peak'].iloc[1:]) <= 0))
+        self.assertTrue(np.all(df['mean'] <= df['peak']))
+
+        # Hourly means of the total are bin_job_overlap() / 3600, the nodes add up
+        jobtable = self.jobtable[self.jobtable.endV != UNKNOWN_TIME]
+        timeline = OccupancyTimeline.from_table(jobtable)
+        (start, end) = (datetime.datetime(2024, 10, 1), datetime.datetime(2024, 10, 14))
+        gpudf = bin_job_overlap(jobtable, start, end, 3600, 'gpu')
+        (edgeV, nodeL, gridV) = timeline.heatmap(start, end, 3600, 'gpus')
+        self.assertEqual(gpudf.shape[0], gridV.shape[1])
+        self.assertTrue(np.allclose(gpudf['total'].to_numpy() / 3600, gridV.sum(axis=0)))
+        self.assertTrue(np.allclose(np.diff(timeline.integral(edgeV)) / 3600,
+                                    gridV.sum(axis=0)))
+        (_, _, busyV) = timeline.heatmap(start, end, 3600, 'nodes')
+        self.assertTrue(np.all((busyV >= 0) & (busyV <= 1)))
+        # Fractional intervals keep the time_grid() edges, bad grids raise
+        (edgeV, _, gridV) = timeline.heatmap(start, end, 5400.5, 'gpus')
+        self.assertTrue(np.array_equal(time_grid(start, end, 5400.5)[0], edgeV))
+        self.assertTrue(np.all(np.isfinite(gridV)))
+        for interval in [0, -3600]:
+            with self.assertRaises(ValueError):
+                timeline.heatmap(start, end, interval, 'gpus')
+        with self.assertRaises(ValueError):
+            timeline.heatmap(end, start, 3600, 'gpus')
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
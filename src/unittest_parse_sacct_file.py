@@ -3,7 +3,9 @@
 # License: GPL-3
 """Module that unit tests the module is_job_in_time_range()
 """
+import os
 import unittest
+import tempfile
 import numpy as np
 import datetime
 from classes import Job
@@ -38,6 +40,73 @@ class TEST_PARSE_SACCT_FILE(unittest.TestCase):
         self.assertEqual(120000+150000+180000, totalcpuraw)
 
 
+    def test_exact_jobid_match(self):
+        """
+        Job 12 must not pick up the rows of jobs 112 or 1234
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        lineL = ["JobIDRaw|JobName|User|NodeList|ElapsedRaw|AllocCPUS|CPUTimeRAW|"
+                 "MaxRSS|State|Start|End|ReqTRES"]
+        for jobid in ['12', '112', '1234']:
+            lineL.append("{}|stuff|maggie|node01|100|2|200||COMPLETED|"
+                         "2024-11-01T08:00:00|2024-11-01T08:01:40|"
+                         "billing=2,cpu=2,gres/gpu=1,mem=10G,node=1".format(jobid))
+            lineL.append("{}.batch|batch||node01|100|2|200|10K|COMPLETED|"
+                         "2024-11-01T08:00:00|2024-11-01T08:01:40|".format(jobid))
+            lineL.append("{}.0|stuff||node01|100|2|200|10K|COMPLETED|"
+                         "2024-11-01T08:00:00|2024-11-01T08:01:40|".format(jobid))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'sacct_test')
+            with open(path, 'w') as fout:
+                fout.write("\n".join(lineL) + "\n")
+            (totalgpuraw, totalcpuraw, jobL, starttime, endtime) = parse_sacct_file(path=path)
+            # Chunks of 2 rows split every job, steps must still find their job
+            (_, _, chunkjobL, _, _) = parse_sacct_file(path=path, chunksize=2)
+        self.assertEqual(['112', '12', '1234'], [job.jobid for job in jobL])
+        self.assertEqual(['12', '112', '1234'], [job.jobid for job in chunkjobL])
+        for job in jobL + chunkjobL:
+            self.assertEqual(1, len(job.batchL))
+            self.assertEqual(1, len(job.stepL))
+        self.assertEqual(3*100, totalgpuraw)
+        self.assertEqual(3*200, totalcpuraw)
+
+
+    def test_pending_job(self):
+        """
+        PENDING jobs have Unknown Start / End, they mustn't break the time range
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        text = ("JobIDRaw|JobName|User|NodeList|ElapsedRaw|AllocCPUS|CPUTimeRAW|"
+                "MaxRSS|State|Start|End|ReqTRES\n"
+                "5|stuff|lisa|None assigned|0|1|0||PENDING|Unknown|Unknown|"
+                "billing=1,cpu=1,mem=1G,node=1\n")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'sacct_test')
+            with open(path, 'w') as fout:
+                fout.write(text)
+            (_, _, jobL, starttime, endtime) = parse_sacct_file(path=path)
+            self.assertIsNone(starttime)
+            with open(path, 'a') as fout:
+                fout.write("7|stuff|maggie|node01|100|2|200||COMPLETED|"
+                           "2024-11-01T08:00:00|2024-11-01T08:01:40|"
+                           "billing=2,cpu=2,gres/gpu=1,mem=10G,node=1\n")
+            (_, totalcpuraw, jobL, starttime, endtime) = parse_sacct_file(path=path)
+        self.assertEqual(['5', '7'], [job.jobid for job in jobL])
+        self.assertEqual(200, totalcpuraw)
+        self.assertEqual(datetime.datetime(2024, 11, 1, 8), starttime)
+        self.assertEqual(datetime.datetime(2024, 11, 1, 8, 1, 40), endtime)
+
+
 if __name__ == "__main__":
     unittest.main()
     # Exit value handled by unittest.main()
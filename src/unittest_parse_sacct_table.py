@@ -0,0 +1,183 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests parse_sacct_table() and JobTable
+"""
+import os
+import unittest
+import tempfile
+import datetime
+import numpy as np
+from classes import JobTable
+from functions import parse_sacct_file
+from functions import parse_sacct_table
+
+
+SACCT = """JobIDRaw|JobName|User|NodeList|ElapsedRaw|AllocCPUS|CPUTimeRAW|MaxRSS|State|Start|End|ReqTRES
+7|stuff|maggie|node[01-03]|3600|6|21600||COMPLETED|2024-11-01T08:00:00|2024-11-01T09:00:00|billing=6,cpu=6,gres/gpu=24,mem=10G,node=3
+7.batch|batch||node01|3600|2|7200|10K|COMPLETED|2024-11-01T08:00:00|2024-11-01T09:00:00|
+12|stuff|bart|node04|100|2|200||RUNNING|2024-11-01T08:00:00|Unknown|billing=2,cpu=2,mem=10G,node=1
+12.0|stuff||node04|100|2|200|10K|RUNNING|2024-11-01T08:00:00|Unknown|
+112|stuff|maggie|node[02,04]|60|4|240||CANCELLED by 123|2024-11-01T10:00:00|2024-11-01T10:01:00|billing=4,cpu=4,gres/gpu=2,mem=10G,node=2
+112.extern|extern||node[02,04]|60|4|240|10K|CANCELLED|2024-11-01T10:00:00|2024-11-01T10:01:00|
+"""
+
+# sacct --format="job,..." : array (1234_5), pending array (1234_[1-3]) and het
+# (1234+0) job ids. 1234_5 must not be read as job 12345
+ARRAY = """JobID|JobName|User|NodeList|ElapsedRaw|AllocCPUS|CPUTimeRAW|MaxRSS|State|Start|End|ReqTRES
+12345|stuff|bart|node04|100|2|200||COMPLETED|2024-11-01T08:00:00|2024-11-01T08:01:40|billing=2,cpu=2,mem=10G,node=1
+1234_5|stuff|maggie|node01|3600|2|7200||COMPLETED|2024-11-01T08:00:00|2024-11-01T09:00:00|billing=2,cpu=2,gres/gpu=1,mem=10G,node=1
+1234_5.batch|batch||node01|3600|2|7200|10K|COMPLETED|2024-11-01T08:00:00|2024-11-01T09:00:00|
+1234_[1-3]|stuff|maggie|None assigned|0|2|0||PENDING|Unknown|Unknown|billing=2,cpu=2,gres/gpu=1,mem=10G,node=1
+1234+0|stuff|lisa|node02|60|1|60||COMPLETED|2024-11-01T10:00:00|2024-11-01T10:01:00|billing=1,cpu=1,mem=1G,node=1
+1234+0.extern|extern||node02|60|1|60|10K|COMPLETED|2024-11-01T10:00:00|2024-11-01T10:01:00|
+"""
+
+
+class TEST_PARSE_SACCT_TABLE(unittest.TestCase):
+    """
+    Test that parse_sacct_table() agrees with parse_sacct_file()
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'sacct_test')
+        with open(self.path, 'w') as fout:
+            fout.write(SACCT)
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_matches_parse_sacct_file(self):
+        """
+        Every JobRow must have the same values as the matching Job
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        (gpuraw, cpuraw, jobL, starttime, endtime) = parse_sacct_file(path=self.path)
+        (tgpuraw, tcpuraw, table, tstarttime, tendtime) = parse_sacct_table(path=self.path)
+        self.assertEqual(gpuraw, tgpuraw)
+        self.assertEqual(cpuraw, tcpuraw)
+        self.assertEqual(starttime, tstarttime)
+        self.assertEqual(endtime, tendtime)
+        jobL = sorted(jobL, key=lambda job: (int(job.jobid.split('_')[0]), job.jobid))
+        self.assertEqual(len(jobL), len(table))
+        for job, row in zip(jobL, table):
+            for attr in ['jobid', 'user', 'state', 'nodelist', 'start', 'end',
+                         'elapsedraw', 'alloccpus', 'ngpu', 'cputimeraw',
+                         'gputimeraw']:
+                self.assertEqual(getattr(job, attr), getattr(row, attr))
+        # from_jobs() must round trip as well
+        for job, row in zip(jobL, JobTable.from_jobs(jobL)):
+            self.assertEqual(job.nodelist, row.nodelist)
+            self.assertEqual(job.end, row.end)
+
+
+    def test_chunked(self):
+        """
+        Streaming in chunks that split jobs gives the same table
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        (_, _, table, _, _) = parse_sacct_table(path=self.path)
+        for chunksize in [1, 2, 4]:
+            (_, _, chunked, _, _) = parse_sacct_table(path=self.path, chunksize=chunksize)
+            self.assertEqual(table.jobidV.tolist(), chunked.jobidV.tolist())
+            for row, crow in zip(table, chunked):
+                self.assertEqual(row.user, crow.user)
+                self.assertEqual(row.state, crow.state)
+                self.assertEqual(row.nodelist, crow.nodelist)
+
+
+    def test_subset(self):
+        """
+        Subsets keep the CSR node index consistent
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        (_, _, table, _, _) = parse_sacct_table(path=self.path)
+        sub = table[table.ngpuV > 0]
+        self.assertEqual(['7', '112'], sub.jobidV.tolist())
+        self.assertEqual(['node01', 'node02', 'node03'], sub[0].nodelist)
+        self.assertEqual(['node02', 'node04'], sub[1].nodelist)
+        self.assertEqual('CANCELLED', sub[1].state)
+        self.assertIsNone(table[1].end)
+
+
+    def test_array_jobs(self):
+        """
+        Array and het job ids are kept as str and match parse_sacct_file()
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        with open(self.path, 'w') as fout:
+            fout.write(ARRAY)
+        (gpuraw, cpuraw, jobL, _, _) = parse_sacct_file(path=self.path)
+        (tgpuraw, tcpuraw, table, _, _) = parse_sacct_table(path=self.path)
+        self.assertEqual((gpuraw, cpuraw), (tgpuraw, tcpuraw))
+        self.assertEqual(['1234+0', '1234_5', '1234_[1-3]', '12345'],
+                         table.jobidV.tolist())
+        jobD = {job.jobid : job for job in jobL}
+        self.assertEqual(sorted(jobD.keys()), sorted(table.jobidV.tolist()))
+        for row in table:
+            for attr in ['user', 'state', 'nodelist', 'elapsedraw', 'ngpu',
+                         'cputimeraw', 'gputimeraw']:
+                self.assertEqual(getattr(jobD[row.jobid], attr), getattr(row, attr))
+        (_, _, chunked, _, _) = parse_sacct_table(path=self.path, chunksize=2)
+        self.assertEqual(table.jobidV.tolist(), chunked.jobidV.tolist())
+
+
+    def test_empty(self):
+        """
+        A header only dump and one where no job has started yet (PENDING) give
+        zero totals and no start, like parse_sacct_file()
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        header = SACCT.split('\n')[0] + '\n'
+        pending = "5|stuff|lisa|None assigned|0|1|0||PENDING|Unknown|Unknown|billing=1,cpu=1,mem=1G,node=1\n"
+        for (text, njob) in [(header, 0), (header + pending, 1)]:
+            with open(self.path, 'w') as fout:
+                fout.write(text)
+            (gpuraw, cpuraw, table, starttime, endtime) = parse_sacct_table(path=self.path)
+            (fgpuraw, fcpuraw, jobL, fstarttime, fendtime) = parse_sacct_file(path=self.path)
+            self.assertEqual((0, 0, None, datetime.datetime(1970, 1, 1)),
+                             (gpuraw, cpuraw, starttime, endtime))
+            self.assertEqual((fgpuraw, fcpuraw, fstarttime, fendtime),
+                             (gpuraw, cpuraw, starttime, endtime))
+            self.assertEqual(njob, len(table))
+            self.assertEqual(njob + 1, len(table.nodeptrV))
+            self.assertEqual(len(jobL), len(table))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
@@ -0,0 +1,183 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests the manifest and parallel loading of read_gpu_util()
+"""
+import os
+import unittest
+import tempfile
+import numpy as np
+from classes import Gpu
+from classes import read_util_file
+from classes import load_util_series
+from functions import gpu_util_manifest
+from functions import open_gpu_util
+from functions import read_gpu_util
+from unittest_mean_util import write_util
+
+
+class TEST_READ_GPU_UTIL(unittest.TestCase):
+    """
+    Test that read_gpu_util() finds every file once and orders the result
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        path = self.tmpdir.name
+        # Written out of order on purpose, gpu10 sorts after gpu2
+        for name in ['n02', 'n01', 'mig01']:
+            for gidx in [10, 2, 0]:
+                for res in ['10s', '1h', '1d']:
+                    write_util(os.path.join(path, "{}_gpuutil_gpu{}_{}.txt".format(
+                               name, gidx, res)), [0, 10, 20], [gidx, 1, int(name[-1])])
+        for res in ['2min', '1h', '1d']:
+            write_util(os.path.join(path, "totalgpuutilization_{}.txt".format(res)),
+                       [0, 10], [1, 2])
+        with open(os.path.join(path, "n01_gpuutil_gpu0_10s.txt.swp"), 'w') as fout:
+            fout.write("garbage\n")
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_manifest(self):
+        """
+        Resolutions, aliases and excluded nodes
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        (gpuD, totalD) = gpu_util_manifest(self.tmpdir.name, ['mig01'])
+        self.assertEqual(['1d', '1h', '2min'], sorted(totalD))
+        self.assertEqual(['n01', 'n02'], sorted(gpuD['2min']))
+        self.assertEqual([0, 2, 10], sorted(gpuD['1h']['n02']))
+        self.assertTrue(gpuD['2min']['n01'][2].endswith('n01_gpuutil_gpu2_10s.txt'))
+
+
+    def test_read_gpu_util(self):
+        """
+        Serial and pooled loading agree and are ordered by node / gpu
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        serialL = read_gpu_util(self.tmpdir.name, ['mig01'], nproc=1)
+        poolL = read_gpu_util(self.tmpdir.name, ['mig01'], nproc=2)
+        for serial, pool in zip(serialL, poolL):
+            self.assertEqual(['n01', 'n02'], [node.name for node in pool.nodeL])
+            for snode, pnode in zip(serial.nodeL, pool.nodeL):
+                self.assertEqual([0, 2, 10], [gpu.gidx for gpu in pnode.gpuL])
+                for sgpu, pgpu in zip(snode.gpuL, pnode.gpuL):
+                    self.assertTrue(np.array_equal(sgpu.timeV, pgpu.timeV))
+                    self.assertTrue(np.array_equal(sgpu.utilV, pgpu.utilV))
+            self.assertEqual([1, 2], pool.total.utilV.tolist())
+        self.assertEqual('10s', poolL[0].nodeL[0].consolidator)
+        self.assertEqual([10, 1, 2], poolL[1].nodeL[1].gpuL[2].utilV.tolist())
+        with self.assertRaises(ValueError):
+            read_gpu_util(self.tmpdir.name, ['mig01', 'n01', 'n02'], nproc=1)
+
+
+    def test_window(self):
+        """
+        Windowed reads keep one sample either side of [start, end) and give the
+        same means as full reads
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        rng = np.random.default_rng(7)
+        path = os.path.join(self.tmpdir.name, "w01_gpuutil_gpu0_10s.txt")
+        utilL = [None if u < 5 else int(u) for u in rng.integers(0, 100, 500)]
+        write_util(path, [10 * i for i in range(500)], utilL)
+        (timeV, utilV, headerL) = read_util_file(path)
+        begin = timeV[0]
+        for (start, end) in [(0, 100), (-50, 30), (4995, 6000), (1234, 3456),
+                             (6000, 7000), (-100, -10), (15, 16)]:
+            (wtimeV, wutilV, wheaderL) = read_util_file(path, begin + start,
+                                                        begin + end)
+            lo = max(np.searchsorted(timeV, begin + start) - 1, 0)
+            hi = np.searchsorted(timeV, begin + end) + 1
+            self.assertEqual(timeV[lo:hi].tolist(), wtimeV.tolist())
+            self.assertTrue(np.array_equal(utilV[lo:hi], wutilV, equal_nan=True))
+            self.assertEqual(headerL, wheaderL)
+        full = Gpu(path)
+        window = Gpu(path, begin + 1000, begin + 3000)
+        startV = begin + rng.integers(1000, 2000, 50)
+        endV = startV + rng.integers(1, 1000, 50)
+        self.assertTrue(np.allclose(full.mean_util(startV, endV),
+                                    window.mean_util(startV, endV), equal_nan=True))
+
+
+    def test_lazy(self):
+        """
+        open_gpu_util() reads nothing until used, reads go through the LRU
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        load_util_series.cache_clear()
+        cluster = open_gpu_util(self.tmpdir.name, '1h', ['mig01'])
+        self.assertEqual(0, load_util_series.cache_info().currsize)
+        self.assertEqual(['n01', 'n02'], [node.name for node in cluster.nodeL])
+        gpu = cluster.nodeL[1].gpuL[2]
+        self.assertEqual(10, gpu.gidx)
+        self.assertIsNone(gpu.pinned)
+        self.assertEqual([10, 1, 2], gpu.utilV.tolist())
+        self.assertIs(gpu.timeV, gpu.timeV)
+        self.assertEqual(1, load_util_series.cache_info().currsize)
+        self.assertEqual([1, 2], cluster.total.utilV.tolist())
+        with self.assertRaises(ValueError):
+            open_gpu_util(self.tmpdir.name, '5min')
+        # Only the selected resolution is opened
+        (cluster2min, cluster1h, cluster1d) = read_gpu_util(self.tmpdir.name, None, 1,
+                                                            ['1d'])
+        self.assertIsNone(cluster2min)
+        self.assertIsNone(cluster1h)
+        self.assertIsNotNone(cluster1d.nodeL[0].gpuL[0].pinned)
+        self.assertIsNotNone(cluster1d.total.totalgpu.pinned)
+
+
+    def test_single_resolution(self):
+        """
+        A directory with only the 1d files, e.g. one of collect_data.sh with
+        ROLLUP_DIR set, reads with resolutionL=['1d']
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        with tempfile.TemporaryDirectory() as path:
+            write_util(os.path.join(path, 'n01_gpuutil_gpu0_1d.txt'), [0, 86400], [3, 4])
+            write_util(os.path.join(path, 'totalgpuutilization_1d.txt'), [0, 86400], [3, 4])
+            (cluster2min, cluster1h, cluster1d) = read_gpu_util(path, None, 1, ['1d'])
+            self.assertIsNone(cluster2min)
+            self.assertIsNone(cluster1h)
+            self.assertEqual([3, 4], cluster1d.nodeL[0].gpuL[0].utilV.tolist())
+            with self.assertRaises(ValueError):
+                read_gpu_util(path, None, 1)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
@@ -0,0 +1,141 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests the bulk gpu utilization parser and Gpu / Node
+"""
+import os
+import gzip
+import unittest
+import tempfile
+import datetime
+import numpy as np
+from classes import Gpu
+from classes import Node
+from classes import TotalGpu
+from classes import read_util_file
+from plot_funcs import gather_totalgpu_time_series
+
+
+UTIL = """# Start time : Nov 01 00:00:00 2024
+# End time : Nov 01 00:01:00 2024
+2024/11/01 00:00:00.105  45%
+2024/11/01 00:00:10.221  50.5%
+2024/11/01 00:00:20.000  no data
+2024/11/01 00:00:30.345  0%
+"""
+
+
+class TEST_READ_UTIL_FILE(unittest.TestCase):
+    """
+    Test that utilization files are read into arrays
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def write(self, name, text):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w') as fout:
+            fout.write(text)
+        return path
+
+
+    def test_read_util_file(self):
+        """
+        Times, utilization, 'no data' mask and header
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        gpu = Gpu(self.write('node01_gpuutil_gpu3_1h.txt', UTIL))
+        self.assertEqual(3, gpu.gidx)
+        self.assertEqual(datetime.datetime(2024, 11, 1), gpu.start)
+        self.assertEqual(datetime.datetime(2024, 11, 1, 0, 1), gpu.end)
+        self.assertEqual(np.int64, gpu.timeV.dtype)
+        self.assertEqual(np.float32, gpu.utilV.dtype)
+        self.assertEqual([0, 10, 20, 30], (gpu.timeV - gpu.timeV[0]).tolist())
+        self.assertEqual(1730419200, gpu.timeV[0])
+        self.assertEqual([True, True, False, True], gpu.validV.tolist())
+        self.assertEqual([45, 50.5, 0], gpu.utilV[gpu.validV].tolist())
+
+        unsorted = UTIL.replace("00:00:30.345", "00:00:05.345")
+        with self.assertRaisesRegex(ValueError, "unsorted"):
+            Gpu(self.write('node01_gpuutil_gpu4_1h.txt', unsorted))
+        bad = UTIL.replace("no data", "garbage")
+        with self.assertRaisesRegex(ValueError, "garbage"):
+            read_util_file(self.write('bad.txt', bad))
+        bad = UTIL.replace("00:00:10.221", "0:00:10.221")
+        with self.assertRaisesRegex(ValueError, "0:00:10.221"):
+            read_util_file(self.write('bad.txt', bad))
+
+
+    def test_window_boundary(self):
+        """
+        Plain and compressed files give the same samples for a window, whether
+        or not start / end land exactly on a sample
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        path = self.write('node01_gpuutil_gpu0_1h.txt', UTIL)
+        with gzip.open(path + '.gz', 'wt') as fout:
+            fout.write(UTIL)
+        begin = 1730419200
+        for (start, end, offsetL) in [(20, 30, [20, 30]), (15, 25, [10, 20, 30]),
+                                      (0, 10, [0, 10]), (35, 40, [30])]:
+            for p in [path, path + '.gz']:
+                (timeV, _, _) = read_util_file(p, begin + start, begin + end)
+                self.assertEqual(offsetL, (timeV - begin).tolist())
+
+
+    def test_node_and_total(self):
+        """
+        Node.util_matrix() aligns the gpus, TotalGpu exposes the arrays
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        pathL = [self.write('node01_gpuutil_gpu0_1h.txt', UTIL),
+                 self.write('node01_gpuutil_gpu1_1h.txt',
+                            UTIL.replace("2024/11/01 00:00:30.345  0%\n",
+                                         "2024/11/01 00:00:40.000  7%\n"))]
+        node = Node(pathL)
+        (timeV, utilM) = node.util_matrix()
+        self.assertEqual([0, 10, 20, 30, 40], (timeV - timeV[0]).tolist())
+        self.assertEqual((2, 5), utilM.shape)
+        self.assertTrue(np.isnan(utilM[0, 4]) and np.isnan(utilM[1, 3]))
+        self.assertEqual(7, utilM[1, 4])
+
+        total = TotalGpu(self.write('totalgpuutilization_1h.txt', UTIL))
+        self.assertEqual(4, total.timeV.shape[0])
+        df = gather_totalgpu_time_series(total, datetime.datetime(2024, 11, 1, 0, 0, 5),
+                                         datetime.datetime(2024, 11, 1, 0, 0, 30), 10)
+        # Time weighted over [5, 15), [15, 25), [25, 35), 'no data' is not covered
+        self.assertEqual([47.75, 50.5, 0], df['util'].tolist())
+        self.assertEqual([1, 0.5, 0.5], df['coverage'].tolist())
+        self.assertEqual(datetime.datetime(2024, 11, 1, 0, 0, 10), df.index[0])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
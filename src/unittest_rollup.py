@@ -0,0 +1,153 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests the local consolidation of raw gpu utilization
+"""
+import os
+import unittest
+import tempfile
+import datetime
+import numpy as np
+from classes import Gpu
+from classes import UtilSeries
+from rollup import Rollup
+from rollup import parse_width
+from rollup import compare_rollup
+from rollup import compare_util_dir
+from rollup import rollup_util_dir
+from rollup import open_util_rollup
+from unittest_mean_util import write_util
+
+
+def make_raw(nsample, seed):
+    """Raw 10s like samples with jitter, gaps and 'no data'"""
+    rng = np.random.default_rng(seed)
+    timeV = np.cumsum(rng.choice([10, 10, 10, 11, 9, 300], nsample))
+    utilL = [None if u < 8 else int(u) for u in rng.integers(0, 100, nsample)]
+    return(timeV.tolist(), utilL)
+
+
+class TEST_ROLLUP(unittest.TestCase):
+    """
+    Test Rollup against Gpu.resample() and itself when folded incrementally
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_fold(self):
+        """
+        Means / coverage match resample(), chunked folds match one fold and
+        min / max match the samples of each bucket
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        self.assertEqual([3600, 86400, 900, 30], [parse_width(w) for w in
+                                                  ['1h', '1d', '15min', '30s']])
+        with self.assertRaises(ValueError):
+            parse_width('1week')
+        path = os.path.join(self.tmpdir.name, 'n01_gpuutil_gpu0_10s.txt')
+        (timeL, utilL) = make_raw(3000, 5)
+        write_util(path, timeL, utilL)
+        raw = UtilSeries(path)
+        rollup = Rollup(parse_width('1h'))
+        rollup.fold(raw.timeV, raw.utilV)
+        # Overlapping chunks, like successive 6 day dumps
+        chunked = Rollup(parse_width('1h'), period=raw.period)
+        for (lo, hi) in [(0, 10), (5, 1000), (999, 1000), (800, 2500), (0, 3000)]:
+            chunked.fold(raw.timeV[lo:hi], raw.utilV[lo:hi])
+        chunked.save(os.path.join(self.tmpdir.name, 'r.npz'))
+        chunked = Rollup.load(os.path.join(self.tmpdir.name, 'r.npz'))
+        for name in ['kV', 'minV', 'maxV', 'sumV', 'coverV']:
+            self.assertTrue(np.allclose(getattr(rollup, name), getattr(chunked, name)))
+
+        # Resample over the buckets, the last sample is still pending in rollup
+        gpu = Gpu(path)
+        edgeV = np.append(rollup.timeV, rollup.timeV[-1] + 3600)
+        (meanV, coverageV) = gpu.resample(edgeV)
+        hasV = np.diff(edgeV) == 3600
+        self.assertTrue(np.allclose(meanV[:-1][hasV[:-1]], rollup.meanV[:-1][hasV[:-1]]))
+        self.assertTrue(np.allclose(coverageV[:-1], rollup.coverageV[:-1]))
+        kV = (raw.timeV - rollup.offset) // rollup.width
+        for i in range(0, len(rollup) - 1, 7):
+            inV = (kV == rollup.kV[i]) & ~np.isnan(raw.utilV)
+            # Samples that started in the previous bucket may spill into it
+            self.assertLessEqual(rollup.minV[i], raw.utilV[inV].min())
+            self.assertGreaterEqual(rollup.maxV[i], raw.utilV[inV].max())
+
+
+    def test_compare(self):
+        """
+        Rollups of a directory, incremental reruns and the BCM comparison
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        path = self.tmpdir.name
+        rollupdir = os.path.join(path, 'rollup')
+        (timeL, utilL) = make_raw(2000, 9)
+        for name in ['n01_gpuutil_gpu0', 'n01_gpuutil_gpu1']:
+            write_util(os.path.join(path, "{}_10s.txt".format(name)), timeL, utilL)
+        write_util(os.path.join(path, "totalgpuutilization_2min.txt"), timeL, utilL)
+        countD = rollup_util_dir(path, rollupdir, ['1h', '1d'])
+        self.assertEqual({'series' : 3, 'samples' : 6000}, countD)
+        self.assertEqual({'series' : 3, 'samples' : 0},
+                         rollup_util_dir(path, rollupdir, ['1h', '1d']))
+        rollup = Rollup.load(os.path.join(rollupdir, 'n01_gpu1_1h.npz'))
+
+        # BCM like 1h file from our own means, stamped with the bucket end
+        hasV = ~np.isnan(rollup.meanV)
+        bcmtimeL = (rollup.timeV[hasV] + 3600 - rollup.timeV[0]).tolist()
+        bcmutilL = np.round(rollup.meanV[hasV], 1).tolist()
+        begin = datetime.datetime(2024, 11, 1)
+        offset = int(rollup.timeV[0] - (begin - datetime.datetime(1970, 1, 1))
+                     .total_seconds())
+        write_util(os.path.join(path, "n01_gpuutil_gpu1_1h.txt"),
+                   [t + offset for t in bcmtimeL], bcmutilL)
+        df = compare_util_dir(path, rollupdir, ['1h', '1d'], 'end')
+        self.assertEqual(['n01_gpu1'], df['name'].tolist())
+        self.assertEqual(df['nbcm'].iloc[0], df['nmatched'].iloc[0])
+        self.assertLessEqual(df['maxdeviation'].iloc[0], 0.05 + 1e-6)
+        bcm = UtilSeries(os.path.join(path, "n01_gpuutil_gpu1_1h.txt"))
+        startdf = compare_rollup(rollup, bcm.timeV, bcm.utilV, 'start')
+        self.assertGreater(startdf['deviation'].abs().max(), 1)
+
+        # A Cluster over the rollups in place of the 1h text files
+        cluster = open_util_rollup(rollupdir, '1h')
+        self.assertEqual(['n01'], [node.name for node in cluster.nodeL])
+        self.assertEqual([0, 1], [gpu.gidx for gpu in cluster.nodeL[0].gpuL])
+        self.assertEqual('1h', cluster.nodeL[0].consolidator)
+        gpu = cluster.nodeL[0].gpuL[1]
+        self.assertTrue(np.array_equal(rollup.timeV, gpu.timeV))
+        self.assertTrue(np.allclose(rollup.meanV, gpu.utilV))
+        (meanV, coverageV) = gpu.mean_util(rollup.timeV[:3], rollup.timeV[:3] + 3600)
+        self.assertTrue(np.allclose(rollup.meanV[:3], meanV))
+        self.assertTrue(np.allclose(1, coverageV))
+        self.assertEqual(len(Rollup.load(os.path.join(rollupdir,
+                         'totalgpuutilization_1d.npz'))),
+                         len(open_util_rollup(rollupdir, '1d').total.totalgpu.timeV))
+        with self.assertRaises(ValueError):
+            open_util_rollup(rollupdir, '1h', ['n01'])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
@@ -0,0 +1,99 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests the sacct frame cache
+"""
+import os
+import time
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+from sacct_cache import cache_path
+from sacct_cache import evict_cache
+from sacct_cache import load_cached_frame
+from functions import read_sacct_frame
+
+
+SACCT = """JobIDRaw|JobName|User|NodeList|ElapsedRaw|AllocCPUS|CPUTimeRAW|MaxRSS|State|Start|End|ReqTRES
+7|stuff|maggie|node[01-03]|3600|6|21600||COMPLETED|2024-11-01T08:00:00|2024-11-01T09:00:00|billing=6,cpu=6,gres/gpu=24,mem=10G,node=3
+7.batch|batch||node01|3600|2|7200|10K|COMPLETED|2024-11-01T08:00:00|2024-11-01T09:00:00|
+12|stuff|bart|node04|100|2|200||RUNNING|2024-11-01T08:00:00|Unknown|billing=2,cpu=2,mem=10G,node=1
+"""
+
+
+class TEST_SACCT_CACHE(unittest.TestCase):
+    """
+    Test that read_sacct_frame() caches, invalidates and evicts
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'sacct_test')
+        with open(self.path, 'w') as fout:
+            fout.write(SACCT)
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_round_trip(self):
+        """
+        Warm read returns the same values as pd.read_csv() and a changed file
+        invalidates the entry
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        truthdf = pd.read_csv(self.path, sep='|', na_filter=False)
+        self.assertIsNone(load_cached_frame(self.path))
+        read_sacct_frame(self.path)
+        self.assertTrue(os.path.exists(cache_path(self.path)))
+        df = load_cached_frame(self.path)
+        self.assertIsNotNone(df)
+        self.assertEqual(list(truthdf.columns), list(df.columns))
+        for col in truthdf.columns:
+            self.assertEqual(truthdf[col].tolist(), df[col].tolist())
+        # Append a job, cached entry is stale
+        with open(self.path, 'a') as fout:
+            fout.write("12.0|stuff||node04|100|2|200|10K|RUNNING|"
+                       "2024-11-01T08:00:00|Unknown|\n")
+        self.assertIsNone(load_cached_frame(self.path))
+        self.assertEqual(4, read_sacct_frame(self.path).shape[0])
+
+
+    def test_evict(self):
+        """
+        Least recently used entries go first
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        cachedir = os.path.join(self.tmpdir.name, 'cache')
+        os.makedirs(cachedir)
+        for i in range(3):
+            with open(os.path.join(cachedir, "{}.npz".format(i)), 'wb') as fout:
+                fout.write(b'0' * 100)
+            os.utime(os.path.join(cachedir, "{}.npz".format(i)), (i, i))
+        removedL = evict_cache(cachedir, maxbytes=150)
+        self.assertEqual([os.path.join(cachedir, "0.npz"),
+                          os.path.join(cachedir, "1.npz")], removedL)
+        self.assertEqual(['2.npz'], os.listdir(cachedir))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
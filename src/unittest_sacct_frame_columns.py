@@ -0,0 +1,124 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests the bulk conversion of sacct fields
+"""
+import io
+import unittest
+import numpy as np
+import pandas as pd
+from classes import Job
+from functions import SACCT_DTYPE
+from functions import sacct_frame_columns
+from functions import sacct_frame_to_jobs
+from functions import sacct_reqtres_columns
+
+
+SACCT = """JobIDRaw|JobName|User|NodeList|ElapsedRaw|AllocCPUS|CPUTimeRAW|MaxRSS|State|Start|End|ReqTRES
+7|stuff|maggie|node[01-03]|3600|6|21600||COMPLETED|2024-11-01T08:00:00|2024-11-01T09:00:00|billing=6,cpu=6,gres/gpu=24,mem=10G,node=3
+7.batch|batch||node01|3600|2|7200|10M|COMPLETED|2024-11-01T08:00:00|2024-11-01T09:00:00|
+12|stuff|bart|node04|100|2|200||RUNNING|2024-11-01T08:00:00|Unknown|billing=2,cpu=2,mem=512M,node=1
+12.0|stuff||node04|100|2|200|3K|RUNNING|2024-11-01T08:00:00|Unknown|
+112|stuff|maggie|node[02,04]|60|4|240||CANCELLED by 123|None|2024-11-01T10:01:00|billing=4,cpu=4,gres/gpu=2,mem=1T,node=2
+"""
+
+
+def read_sacct(text : str = None) -> pd.DataFrame :
+    """Read sacct text like read_sacct_frame() does"""
+    return pd.read_csv(io.StringIO(text), sep='|', na_filter=False, dtype=SACCT_DTYPE)
+
+
+class TEST_SACCT_FRAME_COLUMNS(unittest.TestCase):
+    """
+    Test that the bulk conversions agree with SacctObj / Job and that the
+    sanity checks report the offending jobs
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def test_columns(self):
+        """
+        Times, MaxRSS and State are converted for every row
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        coldf = sacct_frame_columns(read_sacct(SACCT))
+        self.assertEqual(['7', '7', '12', '12', '112'], coldf['JobNum'].tolist())
+        self.assertEqual(['', 'batch', '', '0', ''], coldf['Step'].tolist())
+        self.assertEqual([10240.0, 3.0], coldf['MaxRSS'].dropna().tolist())
+        self.assertEqual('CANCELLED', coldf['State'].iloc[4])
+        self.assertEqual(1730448000, coldf['Start'].iloc[0])
+        self.assertEqual(-1, coldf['Start'].iloc[4])
+        self.assertEqual(-1, coldf['End'].iloc[2])
+
+        tresdf = sacct_reqtres_columns(coldf['ReqTRES'])
+        self.assertEqual([24, 0, 0, 0, 2], tresdf['gpu'].fillna(0).tolist())
+        self.assertEqual([10, 0.5, 1024], tresdf['memgb'].dropna().tolist())
+        self.assertTrue(pd.isna(tresdf['billing'].iloc[1]))
+
+
+    def test_matches_job(self):
+        """
+        Job.from_parsed() gives the same attributes as Job.__init__()
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        df = read_sacct(SACCT)
+        jobD = {job.jobid : job for job in sacct_frame_to_jobs(df)}
+        for i in [0, 2, 4]:
+            row = df.iloc[i]
+            job = Job(jobid=row['JobIDRaw'], jobname=row['JobName'], user=row['User'],
+                      nodelist=row['NodeList'], elapsedraw=row['ElapsedRaw'],
+                      alloccpus=row['AllocCPUS'], cputimeraw=row['CPUTimeRAW'],
+                      maxrss=row['MaxRSS'], state=row['State'], start=row['Start'],
+                      end=row['End'], reqtres=row['ReqTRES'])
+            fastD = dict(vars(jobD[row['JobIDRaw']]))
+            for key in ['stepL', 'batchL', 'externL']:
+                fastD[key] = []
+            self.assertEqual(vars(job), fastD)
+        self.assertEqual(10240.0, jobD['7'].batchL[0].maxrss)
+
+
+    def test_validation(self):
+        """
+        Errors name every offending job
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        bad = SACCT.replace("7.batch|batch||node01|3600|2|7200|",
+                            "7.batch|batch||node01|3600|2|7201|")
+        bad = bad.replace("12|stuff|bart|node04|100|2|200|",
+                          "12|stuff|bart|node04|100|2|201|")
+        with self.assertRaisesRegex(ValueError, r"jobs : 7\.batch, 12$"):
+            sacct_frame_columns(read_sacct(bad))
+        bad = SACCT.replace("2024-11-01T10:01:00", "2024-10-01T10:01:00")
+        bad = bad.replace("|None|", "|2024-11-01T10:00:00|")
+        with self.assertRaisesRegex(ValueError, r"start > end.*jobs : 112$"):
+            sacct_frame_columns(read_sacct(bad))
+        bad = SACCT.replace("|3K|", "|3X|")
+        with self.assertRaisesRegex(ValueError, r"maxrss for jobs : 12\.0$"):
+            sacct_frame_columns(read_sacct(bad))
+        bad = SACCT.replace("2024-11-01T09:00:00|billing", "2024-11-01 09:00|billing")
+        with self.assertRaisesRegex(ValueError, r"jobs : 7$"):
+            sacct_frame_columns(read_sacct(bad))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
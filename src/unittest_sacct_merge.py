@@ -0,0 +1,124 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests reading and merging many overlapping sacct dumps
+"""
+import os
+import unittest
+import tempfile
+import numpy as np
+import pandas as pd
+from functions import sacct_paths
+from functions import merge_sacct_frames
+from functions import read_sacct_frame
+from functions import read_sacct_frames
+from functions import parse_sacct_file
+from functions import parse_sacct_table
+
+
+HEADER = "JobIDRaw|JobName|User|NodeList|ElapsedRaw|AllocCPUS|CPUTimeRAW|MaxRSS|State|Start|End|ReqTRES\n"
+# Job 12 is still running, 112 was cancelled
+OLD = HEADER + """7|stuff|maggie|node[01-03]|3600|6|21600||COMPLETED|2024-11-01T08:00:00|2024-11-01T09:00:00|billing=6,cpu=6,gres/gpu=24,mem=10G,node=3
+7.batch|batch||node01|3600|2|7200|10K|COMPLETED|2024-11-01T08:00:00|2024-11-01T09:00:00|
+12|stuff|bart|node04|100|2|200||RUNNING|2024-11-01T08:00:00|Unknown|billing=2,cpu=2,mem=10G,node=1
+12.0|stuff||node04|100|2|200|10K|RUNNING|2024-11-01T08:00:00|Unknown|
+112|stuff|maggie|node[02,04]|60|4|240||CANCELLED by 123|2024-11-01T10:00:00|2024-11-01T10:01:00|billing=4,cpu=4,gres/gpu=2,mem=10G,node=2
+112.extern|extern||node[02,04]|60|4|240|10K|CANCELLED|2024-11-01T10:00:00|2024-11-01T10:01:00|
+"""
+# 12 completed and lost its step, 112 was dumped again with a different MaxRSS
+# on its step, 200 is new. 7 is missing, e.g. purged from slurmdbd
+NEW = HEADER + """12|stuff|bart|node04|7200|2|14400||COMPLETED|2024-11-01T08:00:00|2024-11-01T10:00:00|billing=2,cpu=2,mem=10G,node=1
+112|stuff|maggie|node[02,04]|60|4|240||CANCELLED by 123|2024-11-01T10:00:00|2024-11-01T10:01:00|billing=4,cpu=4,gres/gpu=2,mem=10G,node=2
+112.extern|extern||node[02,04]|60|4|240|20K|CANCELLED|2024-11-01T10:00:00|2024-11-01T10:01:00|
+200|stuff|lisa|node05|60|1|60||RUNNING|2024-11-01T11:00:00|Unknown|billing=1,cpu=1,mem=1G,node=1
+"""
+
+
+class TEST_SACCT_MERGE(unittest.TestCase):
+    """
+    Test that merging overlapping dumps keeps the most final record of each job
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.oldpath = os.path.join(self.tmpdir.name, 'sacct_2024-11-01.txt')
+        self.newpath = os.path.join(self.tmpdir.name, 'sacct_2024-11-02.txt')
+        for (path, text) in [(self.oldpath, OLD), (self.newpath, NEW)]:
+            with open(path, 'w') as fout:
+                fout.write(text)
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def test_merge(self):
+        """
+        COMPLETED wins over RUNNING in either order, ties go to the later dump,
+        a job is taken whole from one dump
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        oldframe = read_sacct_frame(self.oldpath, cache=False)
+        newframe = read_sacct_frame(self.newpath, cache=False)
+        for dfL in [[oldframe, newframe], [newframe, oldframe]]:
+            df = merge_sacct_frames(dfL).set_index('JobIDRaw')
+            self.assertEqual(['112', '112.extern', '12', '200', '7', '7.batch'],
+                             sorted(df.index))
+            self.assertEqual('COMPLETED', df.loc['12', 'State'])
+            self.assertEqual(7200, df.loc['12', 'ElapsedRaw'])
+        # Same state, the later dump wins
+        df = merge_sacct_frames([oldframe, newframe]).set_index('JobIDRaw')
+        self.assertEqual('20K', df.loc['112.extern', 'MaxRSS'])
+        df = merge_sacct_frames([newframe, oldframe]).set_index('JobIDRaw')
+        self.assertEqual('10K', df.loc['112.extern', 'MaxRSS'])
+        # Merging a dump with itself changes nothing
+        pd.testing.assert_frame_equal(merge_sacct_frames([oldframe]),
+                                      merge_sacct_frames([oldframe, oldframe]))
+
+
+    def test_read(self):
+        """
+        Globs, the process pool and the parsers on many dumps
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        pattern = os.path.join(self.tmpdir.name, 'sacct_2024-11-0[1-2].txt')
+        self.assertEqual([self.oldpath, self.newpath], sacct_paths(pattern))
+        self.assertEqual([self.newpath, self.oldpath],
+                         sacct_paths("{},{}".format(self.newpath, self.oldpath)))
+        with self.assertRaises(ValueError):
+            sacct_paths(os.path.join(self.tmpdir.name, 'sacct_2023-*'))
+
+        df = read_sacct_frames(sacct_paths(pattern), nproc=1, cache=False)
+        pd.testing.assert_frame_equal(df, read_sacct_frames(sacct_paths(pattern),
+                                                            nproc=2, cache=False))
+        (gpuraw, cpuraw, table, starttime, endtime) = parse_sacct_table(df=df)
+        (tgpuraw, tcpuraw, ttable, tstarttime, tendtime) = parse_sacct_table(
+                                                               path=pattern, nproc=2)
+        self.assertEqual((gpuraw, cpuraw, starttime, endtime),
+                         (tgpuraw, tcpuraw, tstarttime, tendtime))
+        self.assertEqual(['7', '12', '112', '200'], ttable.jobidV.tolist())
+        (_, fcpuraw, jobL, _, _) = parse_sacct_file(path=pattern, nproc=1)
+        self.assertEqual(cpuraw, fcpuraw)
+        self.assertEqual(['112', '12', '200', '7'], [job.jobid for job in jobL])
+        self.assertEqual(21600 + 14400 + 240 + 60, fcpuraw)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
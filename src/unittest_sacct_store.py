@@ -0,0 +1,134 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests incremental ingest into a sacct store
+"""
+import os
+import shutil
+import unittest
+import tempfile
+import numpy as np
+from sacct_store import compact_store
+from sacct_store import segment_paths
+from sacct_store import read_sacct_store
+from sacct_store import store_high_water
+from sacct_store import ingest_sacct_file
+from sacct_store import read_store_keys
+from sacct_store import scan_store_index
+from sacct_store import INDEX_FILE
+from functions import parse_sacct_file
+
+
+HEADER = ("JobIDRaw|JobName|User|NodeList|ElapsedRaw|AllocCPUS|CPUTimeRAW|MaxRSS|"
+          "State|Start|End|ReqTRES\n")
+DAY1 = HEADER + """7|stuff|maggie|node01|3600|2|7200||COMPLETED|2024-11-01T08:00:00|2024-11-01T09:00:00|billing=2,cpu=2,gres/gpu=1,mem=10G,node=1
+7.batch|batch||node01|3600|2|7200|10K|COMPLETED|2024-11-01T08:00:00|2024-11-01T09:00:00|
+12|stuff|bart|node02|100|2|200||RUNNING|2024-11-01T10:00:00|Unknown|billing=2,cpu=2,gres/gpu=2,mem=10G,node=1
+12.batch|batch||node02|100|2|200|10K|RUNNING|2024-11-01T10:00:00|Unknown|
+"""
+# Dumped with -S from the high water mark, job 7 is no longer in it
+DAY2 = HEADER + """12|stuff|bart|node02|7200|2|14400||COMPLETED|2024-11-01T10:00:00|2024-11-01T12:00:00|billing=2,cpu=2,gres/gpu=2,mem=10G,node=1
+12.batch|batch||node02|7200|2|14400|10K|COMPLETED|2024-11-01T10:00:00|2024-11-01T12:00:00|
+13|stuff|bart|node02|60|1|60||COMPLETED|2024-11-01T12:00:00|2024-11-01T12:01:00|billing=1,cpu=1,mem=10G,node=1
+"""
+
+
+class TEST_SACCT_STORE(unittest.TestCase):
+    """
+    Test that ingesting only merges new / changed rows with last write wins
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def test_ingest(self):
+        """
+        RUNNING job that completed is replaced, untouched jobs are kept
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            storepath = os.path.join(tmpdir, 'store')
+            for i, text in enumerate([DAY1, DAY2]):
+                with open(os.path.join(tmpdir, "sacct_{}".format(i)), 'w') as fout:
+                    fout.write(text)
+            countD = ingest_sacct_file(os.path.join(tmpdir, "sacct_0"), storepath)
+            self.assertEqual({'new' : 4, 'changed' : 0, 'unchanged' : 0}, countD)
+            self.assertEqual("2024-11-01T10:00:00", store_high_water(storepath))
+            # Re-ingesting the same dump writes nothing
+            countD = ingest_sacct_file(os.path.join(tmpdir, "sacct_0"), storepath)
+            self.assertEqual({'new' : 0, 'changed' : 0, 'unchanged' : 4}, countD)
+            self.assertEqual(1, len(segment_paths(storepath)))
+            countD = ingest_sacct_file(os.path.join(tmpdir, "sacct_1"), storepath)
+            self.assertEqual({'new' : 1, 'changed' : 2, 'unchanged' : 0}, countD)
+            self.assertEqual("2024-11-01T12:01:00", store_high_water(storepath))
+
+            df = read_sacct_store(storepath)
+            self.assertEqual(['7', '7.batch', '12', '12.batch', '13'],
+                             sorted(df['JobIDRaw'].tolist(),
+                                    key=lambda x: (int(x.split('.')[0]), x)))
+            (gpuraw, cpuraw, jobL, starttime, endtime) = parse_sacct_file(df=df)
+            jobD = {job.jobid : job for job in jobL}
+            self.assertEqual('COMPLETED', jobD['12'].state)
+            self.assertEqual(1, len(jobD['12'].batchL))
+            self.assertEqual(3600 + 2*7200, gpuraw)
+
+            compact_store(storepath)
+            self.assertEqual(1, len(segment_paths(storepath)))
+            self.assertEqual(sorted(df['JobIDRaw'].tolist()),
+                             sorted(read_sacct_store(storepath)['JobIDRaw'].tolist()))
+            self.assertEqual("2024-11-01T12:01:00", store_high_water(storepath))
+
+
+    def test_index(self):
+        """
+        Ingest and high water only read the key index, a stale or missing index
+        is rebuilt from the segments
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            storepath = os.path.join(tmpdir, 'store')
+            for i, text in enumerate([DAY1, DAY2]):
+                with open(os.path.join(tmpdir, "sacct_{}".format(i)), 'w') as fout:
+                    fout.write(text)
+            ingest_sacct_file(os.path.join(tmpdir, "sacct_0"), storepath)
+            indexpath = os.path.join(storepath, INDEX_FILE)
+            shutil.copy(indexpath, os.path.join(tmpdir, 'index_day1.npz'))
+            # The segments aren't read, even if one is unreadable
+            segpath = segment_paths(storepath)[0]
+            shutil.copy(segpath, os.path.join(tmpdir, 'segment'))
+            with open(segpath, 'wb') as fout:
+                fout.write(b'garbage')
+            countD = ingest_sacct_file(os.path.join(tmpdir, "sacct_1"), storepath)
+            self.assertEqual({'new' : 1, 'changed' : 2, 'unchanged' : 0}, countD)
+            self.assertEqual("2024-11-01T12:01:00", store_high_water(storepath))
+            shutil.copy(os.path.join(tmpdir, 'segment'), segpath)
+            (hashS, highwater) = scan_store_index(storepath)
+            self.assertTrue(hashS.sort_index().equals(read_store_keys(storepath).sort_index()))
+            self.assertEqual("2024-11-01T12:01:00", highwater)
+            # Stale index, e.g. a crash after writing the segment
+            shutil.copy(os.path.join(tmpdir, 'index_day1.npz'), indexpath)
+            self.assertEqual("2024-11-01T12:01:00", store_high_water(storepath))
+            self.assertEqual(5, len(read_store_keys(storepath)))
+            os.remove(indexpath)
+            self.assertEqual("2024-11-01T12:01:00", store_high_water(storepath))
+            countD = ingest_sacct_file(os.path.join(tmpdir, "sacct_1"), storepath)
+            self.assertEqual({'new' : 0, 'changed' : 0, 'unchanged' : 3}, countD)
+            self.assertTrue(os.path.isfile(indexpath))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
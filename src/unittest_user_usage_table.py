@@ -0,0 +1,82 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests user_usage_table() against is_job_in_time_range()
+"""
+import operator
+import unittest
+import numpy as np
+import datetime
+from classes import JobTable
+from classes import User
+from functions import sort_user_usage
+from functions import user_usage_table
+from functions import is_job_in_time_range
+from unittest_bin_job_overlap import make_jobs
+
+
+def scalar_user_usage(jobL, mintime, maxtime):
+    """Reference, the original O(users x jobs) loop from the pie chart mode
+    """
+    userL = []
+    for username in np.unique([job.user for job in jobL]):
+        njob = 0
+        cputimeraw = 0
+        gputimeraw = 0
+        for job in jobL:
+            if username == job.user:
+                inrange,overlap = is_job_in_time_range(job, mintime, maxtime)
+                if inrange is True and job.elapsedraw > 0:
+                    njob += 1
+                    cputimeraw += (job.cputimeraw * overlap.total_seconds() /
+                                   job.elapsedraw)
+                    gputimeraw += (job.gputimeraw * overlap.total_seconds() /
+                                   job.elapsedraw)
+        userL.append(User(name=username, njobs=njob, cputimeraw=cputimeraw,
+                          gputimeraw=gputimeraw))
+    return userL
+
+
+class TEST_USER_USAGE_TABLE(unittest.TestCase):
+    """
+    Test that user_usage_table() reproduces the per user loop
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def test_user_usage_table(self):
+        """
+        Compare njobs, cpu and gpu time and the sort order for several ranges
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        jobL = make_jobs(400)
+        jobtable = JobTable.from_jobs(jobL)
+        begin = datetime.datetime(2024, 10, 1)
+        for (mintime, maxtime) in [(begin, begin + datetime.timedelta(days=31)),
+                                   (begin + datetime.timedelta(days=3, hours=1),
+                                    begin + datetime.timedelta(days=3, hours=1)),
+                                   (begin - datetime.timedelta(days=30), begin)]:
+            userL = scalar_user_usage(jobL, mintime, maxtime)
+            usagedf = user_usage_table(jobtable, mintime, maxtime)
+            self.assertEqual([user.name for user in userL], usagedf.index.tolist())
+            self.assertEqual([user.njobs for user in userL], usagedf['njobs'].tolist())
+            for col in ['cputimeraw', 'gputimeraw']:
+                self.assertTrue(np.allclose([getattr(user, col) for user in userL],
+                                            usagedf[col].to_numpy()))
+                sortedL = sorted(userL, key=operator.attrgetter(col), reverse=True)
+                (nameL, timeL) = sort_user_usage(usagedf, col)
+                self.assertEqual([user.name for user in sortedL], nameL)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
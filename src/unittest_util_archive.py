@@ -0,0 +1,134 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests the month partitioned gpu utilization archive
+"""
+import os
+import unittest
+import tempfile
+import datetime
+import numpy as np
+from classes import Gpu
+from classes import to_epoch
+from util_archive import ARCHIVE_VERSION
+from util_archive import archive_partitions
+from util_archive import compact_archive
+from util_archive import ingest_util_dir
+from util_archive import open_util_archive
+from util_archive import read_archive_series
+from util_store import read_util_index
+from unittest_mean_util import write_util
+from unittest_rollup import make_raw
+
+# write_util() times are relative to this
+BEGIN = to_epoch(datetime.datetime(2024, 11, 1))
+
+
+class TEST_UTIL_ARCHIVE(unittest.TestCase):
+    """
+    Test ingesting overlapping dumps, partition pruning and compaction against
+    Gpu over the text files
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.archivepath = os.path.join(self.tmpdir.name, 'archive')
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def dump(self, name, timeL, utilL):
+        """Directory with a dump of one gpu and the total"""
+        path = os.path.join(self.tmpdir.name, name)
+        os.makedirs(path)
+        write_util(os.path.join(path, 'n01_gpuutil_gpu0_10s.txt'), timeL, utilL)
+        write_util(os.path.join(path, 'totalgpuutilization_2min.txt'), timeL, utilL)
+        return path
+
+
+    def test_archive(self):
+        """
+        Overlapping dumps across months match a single dump, only the months a
+        dump / window covers are touched, compaction keeps bucket integrals
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        # Oct 25 to ~Dec 4, 20s samples to keep the test fast
+        (timeL, utilL) = make_raw(30000, 11)
+        timeL = [t * 2 - 7 * 86400 for t in timeL]
+        n = len(timeL)
+        fullpath = self.dump('full', timeL, utilL)
+        for i, (lo, hi) in enumerate([(0, n // 2), (n // 3, 2 * n // 3), (n // 2, n)]):
+            countD = ingest_util_dir(self.dump("dump{}".format(i), timeL[lo:hi],
+                                               utilL[lo:hi]), self.archivepath)
+            self.assertEqual(2, countD['series'])
+        seriesD = read_util_index(self.archivepath, ARCHIVE_VERSION)
+        key = '2min/n01_gpu0'
+        self.assertEqual(['2024-10', '2024-11', '2024-12'],
+                         sorted(seriesD[key]['partitionD']))
+        # Re-ingesting adds nothing and a dump of december leaves the rest alone
+        inodeD = {month : os.stat(os.path.join(self.archivepath, key, month + '.npy'))
+                  .st_ino for month in seriesD[key]['partitionD']}
+        countD = ingest_util_dir(self.dump('dec', timeL[-100:], utilL[-100:]),
+                                 self.archivepath)
+        self.assertEqual(0, countD['samples'])
+        for month in ['2024-10', '2024-11']:
+            self.assertEqual(inodeD[month], os.stat(os.path.join(
+                             self.archivepath, key, month + '.npy')).st_ino)
+
+        gpu = Gpu(os.path.join(fullpath, 'n01_gpuutil_gpu0_10s.txt'))
+        rng = np.random.default_rng(1)
+        startV = rng.integers(timeL[0], timeL[-1], 40) + BEGIN
+        endV = startV + rng.integers(1, 20 * 86400, 40)
+        cluster = open_util_archive(self.archivepath)
+        (meanV, coverageV) = gpu.mean_util(startV, endV)
+        (archmeanV, archcoverageV) = cluster.nodeL[0].gpuL[0].mean_util(startV, endV)
+        self.assertTrue(np.allclose(meanV, archmeanV, equal_nan=True))
+        self.assertTrue(np.allclose(coverageV, archcoverageV))
+        # A window inside november only reads november
+        (start, end) = (to_epoch(datetime.datetime(2024, 11, 5)),
+                        to_epoch(datetime.datetime(2024, 11, 9)))
+        self.assertEqual(['2024-11'], archive_partitions(seriesD[key], start, end))
+        series = read_archive_series(self.archivepath, key, seriesD[key], start, end)
+        self.assertLessEqual(series.timeV[0], start)
+        self.assertGreaterEqual(series.timeV[-1], end)
+
+        # Only december is kept raw, of the gpu and the total
+        self.assertEqual(2 * 2, compact_archive(self.archivepath,
+                                            {'2min' : ('1h', 1)}))
+        seriesD = read_util_index(self.archivepath, ARCHIVE_VERSION)
+        self.assertEqual([3600, 3600, None], [seriesD[key]['partitionD'][month]['width']
+                         for month in ['2024-10', '2024-11', '2024-12']])
+        # At most a sample and a 'no data' one per hour
+        self.assertLessEqual(seriesD[key]['partitionD']['2024-11']['nsample'],
+                             2 * 24 * 30)
+        gpu1h = open_util_archive(self.archivepath).nodeL[0].gpuL[0]
+        # Exact over hour aligned windows in the compacted months
+        dec = to_epoch(datetime.datetime(2024, 12, 1))
+        startV = rng.integers(BEGIN - 7 * 86400, dec, 40) // 3600 * 3600
+        endV = np.minimum(startV + 3600 * rng.integers(1, 24 * 20, 40), dec)
+        (meanV, coverageV) = gpu.mean_util(startV, endV)
+        (archmeanV, archcoverageV) = gpu1h.mean_util(startV, endV)
+        self.assertTrue(np.allclose(meanV, archmeanV, equal_nan=True))
+        self.assertTrue(np.allclose(coverageV, archcoverageV))
+        # Compacted months are final
+        countD = ingest_util_dir(self.dump('redo', timeL[:100], utilL[:100]),
+                                 self.archivepath)
+        self.assertEqual(0, countD['samples'])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
@@ -0,0 +1,106 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# License: GPL-3
+"""Module that unit tests the memory mapped gpu utilization store
+"""
+import os
+import unittest
+import tempfile
+import numpy as np
+from classes import Gpu
+from functions import open_gpu_util
+from util_store import convert_util_dir
+from util_store import open_util_store
+from util_store import read_util_index
+from unittest_mean_util import write_util
+
+
+class TEST_UTIL_STORE(unittest.TestCase):
+    """
+    Test that a store gives the same series and means as the text files
+
+    Args:
+        unittest.TestCase
+
+    Returns:
+        N/A
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storepath = os.path.join(self.tmpdir.name, 'store')
+
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+    def write_dump(self, name, timeL, offset):
+        """Directory like collect_data.sh makes, 2 nodes with 2 gpus"""
+        path = os.path.join(self.tmpdir.name, name)
+        os.makedirs(path)
+        for node in ['n01', 'n02']:
+            for gidx in [0, 1]:
+                for res in ['10s', '1h', '1d']:
+                    utilL = [None if (t // 10) % 7 == 3 else (t + gidx + offset) % 100
+                             for t in timeL]
+                    write_util(os.path.join(path, "{}_gpuutil_gpu{}_{}.txt".format(
+                               node, gidx, res)), timeL, utilL)
+        for res in ['2min', '1h', '1d']:
+            write_util(os.path.join(path, "totalgpuutilization_{}.txt".format(res)),
+                       timeL, [offset] * len(timeL))
+        return path
+
+
+    def test_convert_and_open(self):
+        """
+        Series and means match the text, successive dumps merge
+
+        Args:
+            self :
+
+        Returns:
+            N/A
+        """
+        path = self.write_dump('dump0', list(range(0, 1000, 10)), 0)
+        countD = convert_util_dir(path, self.storepath)
+        self.assertEqual({'series' : 15, 'samples' : 1500}, countD)
+        indexD = read_util_index(self.storepath)
+        self.assertEqual('n02_gpuutil_gpu1_10s.txt', indexD['2min/n02_gpu1']['source'])
+        self.assertEqual(10, indexD['1h/n01_gpu0']['period'])
+
+        text = open_gpu_util(path, '1h')
+        store = open_util_store(self.storepath, '1h')
+        self.assertEqual(['n01', 'n02'], [node.name for node in store.nodeL])
+        self.assertEqual('1h', store.nodeL[0].consolidator)
+        gpu = store.nodeL[1].gpuL[1]
+        self.assertEqual(1, gpu.gidx)
+        self.assertIsInstance(gpu.timeV.base, np.memmap)
+        self.assertTrue(np.array_equal(text.nodeL[1].gpuL[1].utilV, gpu.utilV,
+                                       equal_nan=True))
+        startV = np.arange(-20, 900, 37) + text.total.timeV[0]
+        for textnode, storenode in zip(text.nodeL, store.nodeL):
+            self.assertTrue(np.allclose(textnode.mean_util(startV, startV + 95),
+                                        storenode.mean_util(startV, startV + 95),
+                                        equal_nan=True))
+        self.assertEqual(-1, store.total.totalgpu.gidx)
+        self.assertEqual(text.total.totalgpu.start, store.total.totalgpu.start)
+
+        # A later, overlapping dump, its samples win
+        path = self.write_dump('dump1', list(range(500, 1500, 10)), 1)
+        countD = convert_util_dir(path, self.storepath, ['n02'])
+        self.assertEqual({'series' : 9, 'samples' : 450}, countD)
+        store = open_util_store(self.storepath, '1d', ['n02'])
+        self.assertEqual(['n01'], [node.name for node in store.nodeL])
+        gpu = store.nodeL[0].gpuL[0]
+        self.assertEqual(150, len(gpu))
+        self.assertEqual([0, 1], store.total.utilV[[49, 50]].tolist())
+        merged = Gpu(os.path.join(path, "n01_gpuutil_gpu0_1d.txt"))
+        self.assertTrue(np.array_equal(merged.utilV, gpu.utilV[50:], equal_nan=True))
+        with self.assertRaises(ValueError):
+            open_util_store(self.storepath, '1h', ['n01', 'n02'])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
+    # Exit value handled by unittest.main()
@@ -0,0 +1,418 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Keep the gpu utilization past BCM's retention (README) in an archive
+#      that grows with time, not with how often collect_data.sh runs
+#   2. Partition every series per month, s.t. ingesting a dump only rewrites
+#      the months it covers and reading a range only opens the months it spans
+#   3. Compact raw months older than a policy into coarser rollups
+#
+# Refs :
+#   a) util_store.py, rollup.py
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# An archive is a directory with index.json and one UTIL_RECORD .npy per series
+# and month :
+#   <res>/<node>_gpu<N>/<YYYY-MM>.npy
+#   <res>/totalgpuutilization/<YYYY-MM>.npy
+# Months are those of the sample times. Samples are stored with explicit gaps,
+# see explicit_gaps(), s.t. raw and compacted months read back as one series
+# whatever their periods. A missing sample thus reads back as 'no data'.
+#
+import os
+import numpy as np
+from typing import Dict,List
+from classes import Gpu,Node,TotalGpu,Cluster,UtilSeries
+from functions import UTIL_RESOLUTIONS,gpu_util_manifest
+from rollup import Rollup,parse_width
+from util_store import UTIL_RECORD,save_array,read_util_index,write_util_index
+
+# Version of the archive layout, distinct from util_store.STORE_VERSION
+ARCHIVE_VERSION = 'archive1'
+# resolution : (rollup width, latest months kept raw)
+COMPACT_POLICY = {'2min' : ('1h', 3)}
+
+
+def explicit_gaps(timeV : np.ndarray = None, utilV : np.ndarray = None,
+                  period : int = None):
+    """Insert a 'no data' sample one period after every sample followed by a
+       longer gap, and after the last one. Every sample then holds exactly
+       until the next, see UtilSeries.build_integral(), for any period at least
+       as long as this one.
+
+    Args
+        timeV  = sorted int64 s since EPOCH
+        utilV  = float %, NaN for 'no data'
+        period = s
+
+    Returns
+        timeV, utilV with the inserted samples
+
+    Raises
+    """
+    timeV = np.asarray(timeV, dtype=np.int64)
+    utilV = np.asarray(utilV, dtype=np.float32)
+    if timeV.shape[0] == 0:
+        return(timeV, utilV)
+    gapV = np.append(np.diff(timeV) > period, True) & ~np.isnan(utilV)
+    timeV = np.concatenate([timeV, timeV[gapV] + period])
+    utilV = np.concatenate([utilV, np.full(int(np.sum(gapV)), np.nan, np.float32)])
+    # Stable, an inserted sample never lands on an existing time
+    orderV = np.argsort(timeV, kind='stable')
+    return(timeV[orderV], utilV[orderV])
+
+
+def month_of(timeV : np.ndarray = None) -> np.ndarray :
+    """'YYYY-MM' of each time in s since EPOCH"""
+    return np.datetime_as_string(np.asarray(timeV, dtype='datetime64[s]')
+                                 .astype('datetime64[M]'))
+
+
+def month_bounds(month : str = None):
+    """First and one past the last s since EPOCH of 'YYYY-MM'"""
+    start = np.datetime64(month, 'M')
+    return(int(start.astype('datetime64[s]').astype(np.int64)),
+           int((start + 1).astype('datetime64[s]').astype(np.int64)))
+
+
+def partition_path(archivepath : str = None, key : str = None,
+                   month : str = None) -> str :
+    """Path of one month of a series"""
+    return os.path.join(archivepath, key, "{}.npy".format(month))
+
+
+def load_partition(archivepath : str = None, key : str = None,
+                   month : str = None, mmap : bool = True):
+    """timeV, utilV of one month of a series, memory mapped by default"""
+    recordV = np.load(partition_path(archivepath, key, month),
+                      mmap_mode='r' if mmap is True else None)
+    return(recordV['time'], recordV['util'])
+
+
+def save_partition(archivepath : str = None, key : str = None, month : str = None,
+                   timeV : np.ndarray = None, utilV : np.ndarray = None,
+                   period : int = None, width : int = None) -> Dict :
+    """Atomically write one month of a series
+
+    Args
+        archivepath = archive directory
+        key         = e.g. '2min/node01_gpu3'
+        month       = 'YYYY-MM'
+        timeV       = int64 s since EPOCH, with explicit gaps
+        utilV       = float %, NaN for 'no data'
+        period      = s, of the raw samples or the rollup width
+        width       = rollup width in s, None for raw samples
+
+    Returns
+        the index entry of the month, with nsample, tmin, tmax, period, width
+
+    Raises
+    """
+    recordV = np.zeros(timeV.shape[0], dtype=UTIL_RECORD)
+    recordV['time'] = timeV
+    recordV['util'] = utilV
+    path = partition_path(archivepath, key, month)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    save_array(path, recordV)
+    return {'nsample' : int(timeV.shape[0]), 'tmin' : int(timeV[0]),
+            'tmax' : int(timeV[-1]), 'period' : int(period),
+            'width' : None if width is None else int(width)}
+
+
+def archive_partitions(entry : Dict = None, start : int = None,
+                       end : int = None) -> List[str] :
+    """Months of a series needed for the window [start, end), i.e. those
+       overlapping it widened by the longest period, for the samples holding
+       at start and bounding the last span
+
+    Args
+        entry = index entry of the series
+        start = s since EPOCH, None is the beginning
+        end   = s since EPOCH, None is the end
+
+    Returns
+        sorted months
+
+    Raises
+    """
+    partitionD = entry['partitionD']
+    if len(partitionD) == 0:
+        return []
+    period = max(part['period'] for part in partitionD.values())
+    lo = -np.inf if start is None else start - period
+    hi = np.inf if end is None else end + period
+    return sorted(month for month, part in partitionD.items()
+                  if part['tmax'] >= lo and part['tmin'] <= hi)
+
+
+def ingest_series(archivepath : str = None, key : str = None, source : str = None,
+                  series : UtilSeries = None, seriesD : Dict = None) -> int :
+    """Merge a dump into the archive. The dump replaces the archived samples in
+       the span it covers, in the months it covers, other months aren't
+       touched. Samples in compacted months are dropped, those months are
+       final. The index entry is updated in seriesD, the caller writes the
+       index.
+
+    Args
+        archivepath = archive directory
+        key         = e.g. '2min/node01_gpu3' or '2min/totalgpuutilization'
+        source      = path of the text file
+        series      = UtilSeries read from source
+        seriesD     = index, see read_util_index()
+
+    Returns
+        change in the number of archived samples
+
+    Raises
+    """
+    (resolution, name) = key.split('/')
+    entry = seriesD.setdefault(key, {
+                'resolution' : resolution,
+                'node' : None if '_gpu' not in name else name.rsplit('_gpu', 1)[0],
+                'gidx' : -1 if '_gpu' not in name else int(name.rsplit('_gpu', 1)[1]),
+                'partitionD' : dict()})
+    entry['source'] = os.path.basename(source)
+    (timeV, utilV) = explicit_gaps(series.timeV, series.utilV, series.period)
+    if timeV.shape[0] == 0:
+        return 0
+    (lo, hi) = (int(timeV[0]), int(timeV[-1]))
+    monthV = month_of(timeV)
+    monthL = sorted(set(np.unique(monthV).tolist()) |
+                    set(archive_partitions(entry, lo, hi)))
+    ndiff = 0
+    for month in monthL:
+        part = entry['partitionD'].get(month)
+        if part is not None and part['width'] is not None:
+            continue
+        inV = monthV == month
+        (newtimeV, newutilV) = (timeV[inV], utilV[inV])
+        nold = 0
+        if part is not None:
+            (oldtimeV, oldutilV) = load_partition(archivepath, key, month, False)
+            nold = oldtimeV.shape[0]
+            keepV = (oldtimeV < lo) | (oldtimeV > hi)
+            if np.all(keepV) and newtimeV.shape[0] == 0:
+                continue
+            newtimeV = np.concatenate([oldtimeV[keepV], newtimeV])
+            newutilV = np.concatenate([oldutilV[keepV], newutilV])
+            orderV = np.argsort(newtimeV, kind='stable')
+            (newtimeV, newutilV) = (newtimeV[orderV], newutilV[orderV])
+        ndiff += newtimeV.shape[0] - nold
+        if newtimeV.shape[0] == 0:
+            os.remove(partition_path(archivepath, key, month))
+            del entry['partitionD'][month]
+            continue
+        period = series.period if part is None else max(part['period'], series.period)
+        entry['partitionD'][month] = save_partition(archivepath, key, month, newtimeV,
+                                                    newutilV, period)
+    return int(ndiff)
+
+
+def ingest_util_dir(path : str = None, archivepath : str = None,
+                    excludenodeL : list = None) -> Dict :
+    """Ingest a directory of text files from collect_data.sh into an archive.
+       Running it on every new dump archives them all.
+
+    Args
+        path         = directory with node*_gpuutil_gpu*.txt files
+        archivepath  = archive directory, created if needed
+        excludenodeL = node names to skip
+
+    Returns
+        dict with the number of series read and samples added
+
+    Raises
+        ValueError if a file can't be parsed
+    """
+    os.makedirs(archivepath, exist_ok=True)
+    seriesD = read_util_index(archivepath, ARCHIVE_VERSION)
+    (gpuD, totalD) = gpu_util_manifest(path, excludenodeL)
+    sourceD = dict()
+    for resolution in UTIL_RESOLUTIONS:
+        for name, nodeD in gpuD[resolution].items():
+            for gidx, gpupath in nodeD.items():
+                sourceD["{}/{}_gpu{}".format(resolution, name, gidx)] = gpupath
+        if resolution in totalD:
+            sourceD["{}/totalgpuutilization".format(resolution)] = totalD[resolution]
+    nsample = 0
+    for key in sorted(sourceD):
+        nsample += ingest_series(archivepath, key, sourceD[key],
+                                 UtilSeries(sourceD[key]), seriesD)
+    write_util_index(archivepath, seriesD, ARCHIVE_VERSION)
+    return {'series' : len(sourceD), 'samples' : nsample}
+
+
+def compact_partition(archivepath : str = None, key : str = None,
+                      month : str = None, part : Dict = None,
+                      width : int = None) -> Dict :
+    """Replace a raw month by a Rollup of it. Each bucket becomes a sample at
+       its start with the bucket mean, holding for its coverage, s.t. the
+       integral and coverage of every bucket are kept exactly.
+
+    Args
+        archivepath = archive directory
+        key         = key of the series
+        month       = 'YYYY-MM'
+        part        = index entry of the month
+        width       = rollup width in s
+
+    Returns
+        the new index entry of the month
+
+    Raises
+        ValueError if the raw period is longer than width
+    """
+    (timeV, utilV) = load_partition(archivepath, key, month, False)
+    rollup = Rollup(width, period=part['period'])
+    # The trailing 'no data' sample flushes the last real one into its bucket
+    rollup.fold(np.append(timeV, timeV[-1] + part['period']),
+                np.append(utilV, np.nan))
+    (first, last) = month_bounds(month)
+    inV = (rollup.timeV >= first) & (rollup.timeV < last) & (rollup.coverV > 0)
+    (bucketV, meanV, coverV) = (rollup.timeV[inV], rollup.meanV[inV],
+                                rollup.coverV[inV])
+    partialV = coverV < width
+    timeV = np.concatenate([bucketV, bucketV[partialV] + np.round(coverV[partialV])
+                            .astype(np.int64)])
+    utilV = np.concatenate([meanV, np.full(int(np.sum(partialV)), np.nan)])
+    orderV = np.argsort(timeV, kind='stable')
+    (timeV, utilV) = explicit_gaps(timeV[orderV], utilV[orderV], width)
+    return save_partition(archivepath, key, month, timeV, utilV, width, width)
+
+
+def compact_archive(archivepath : str = None, policyD : Dict = None,
+                    now : int = None) -> int :
+    """Compact the raw months older than a policy, e.g. with the default
+       COMPACT_POLICY the 2min months before the last 3 (the month of now
+       included) are rolled up to 1h
+
+    Args
+        archivepath = archive directory
+        policyD     = {resolution : (rollup width, months kept raw)}
+        now         = s since EPOCH, None is the latest archived sample
+
+    Returns
+        number of months compacted
+
+    Raises
+        ValueError if a width can't be parsed
+    """
+    policyD = COMPACT_POLICY if policyD is None else policyD
+    seriesD = read_util_index(archivepath, ARCHIVE_VERSION)
+    if now is None:
+        now = max([part['tmax'] for entry in seriesD.values()
+                   for part in entry['partitionD'].values()], default=0)
+    current = np.datetime64(month_of([now])[0], 'M')
+    ncompact = 0
+    for key in sorted(seriesD):
+        entry = seriesD[key]
+        if entry['resolution'] not in policyD:
+            continue
+        (widthS, nkeep) = policyD[entry['resolution']]
+        width = parse_width(widthS)
+        cutoff = str(current - nkeep + 1)
+        for month in sorted(entry['partitionD']):
+            part = entry['partitionD'][month]
+            if month >= cutoff or part['width'] is not None:
+                continue
+            entry['partitionD'][month] = compact_partition(archivepath, key, month,
+                                                           part, width)
+            ncompact += 1
+    write_util_index(archivepath, seriesD, ARCHIVE_VERSION)
+    return ncompact
+
+
+def read_archive_series(archivepath : str = None, key : str = None,
+                        entry : Dict = None, start : int = None,
+                        end : int = None) -> UtilSeries :
+    """A series (or a window of it) from the months it spans, see
+       archive_partitions(). Raw and compacted months read as one series.
+
+    Args
+        archivepath = archive directory
+        key         = key of the series in the index
+        entry       = its entry in the index
+        start       = s since EPOCH, None reads from the beginning
+        end         = s since EPOCH, None reads to the end
+
+    Returns
+        UtilSeries, with the one sample before start and after end like
+        read_util_file()
+
+    Raises
+    """
+    def window(timeV):
+        lo = 0 if start is None else max(np.searchsorted(timeV, start, 'right') - 1, 0)
+        hi = timeV.shape[0] if end is None else np.searchsorted(timeV, end, 'left') + 1
+        return(lo, hi)
+
+    monthL = archive_partitions(entry, start, end)
+    timeL = [np.zeros(0, dtype=np.int64)]
+    utilL = [np.zeros(0, dtype=np.float32)]
+    for month in monthL:
+        (timeV, utilV) = load_partition(archivepath, key, month)
+        (lo, hi) = window(timeV)
+        timeL.append(np.array(timeV[lo:hi]))
+        utilL.append(np.array(utilV[lo:hi]))
+    # Neighbouring months each contribute a sample before start / after end
+    (timeV, utilV) = (np.concatenate(timeL), np.concatenate(utilL))
+    (lo, hi) = window(timeV)
+    (timeV, utilV) = (timeV[lo:hi], utilV[lo:hi])
+    period = max([entry['partitionD'][month]['period'] for month in monthL], default=0)
+    return UtilSeries.from_arrays(timeV, utilV, period)
+
+
+def open_util_archive(archivepath : str = None, resolution : str = '2min',
+                      excludenodeL : list = None, start : int = None,
+                      end : int = None) -> Cluster :
+    """Cluster of one resolution over a window of the archive
+
+    Args
+        archivepath  = archive directory
+        resolution   = one of UTIL_RESOLUTIONS
+        excludenodeL = node names to skip
+        start        = s since EPOCH, None reads from the beginning
+        end          = s since EPOCH, None reads to the end
+
+    Returns
+        Cluster, nodes sorted by name and gpus by index
+
+    Raises
+        ValueError if the archive has no nodes or total for resolution
+    """
+    seriesD = read_util_index(archivepath, ARCHIVE_VERSION)
+    excludeD = set([] if excludenodeL is None else excludenodeL)
+    nodeD = dict()
+    total = None
+    for key in sorted(seriesD):
+        entry = seriesD[key]
+        if entry['resolution'] != resolution or entry['node'] in excludeD:
+            continue
+        gpu = Gpu.from_series(os.path.join(archivepath, entry['source']),
+                              read_archive_series(archivepath, key, entry, start, end))
+        if entry['node'] is None:
+            total = TotalGpu(gpu.gpupath, gpu)
+        else:
+            nodeD.setdefault(entry['node'], []).append(gpu)
+    if len(nodeD) == 0 or total is None:
+        raise ValueError("ERROR!!! {} has no {} nodes or total".format(archivepath,
+                         resolution))
+    nodeL = []
+    for name in sorted(nodeD):
+        gpuL = sorted(nodeD[name], key=lambda gpu : gpu.gidx)
+        nodeL.append(Node([gpu.gpupath for gpu in gpuL], gpuL))
+    return Cluster(nodeL, total.name, total)
@@ -0,0 +1,268 @@
+# Author : Ali Snedden
+# Date   : 10/18/26
+# Goals (ranked by priority) :
+#   1. Archive the dumpmonitoringdata text files from collect_data.sh in a
+#      binary store that opens instantly, BCM drops old telemetry (README)
+#   2. Merge successive dumps of the same gpu into one series
+#
+# Refs :
+#   a) https://numpy.org/doc/stable/reference/generated/numpy.lib.format.open_memmap.html
+#
+# Copyright (C) 2024 Ali Snedden
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# A store is a directory with index.json and, per resolution, one pair of .npy
+# files per gpu (and the total) :
+#   <res>/<node>_gpu<N>.npy      UTIL_RECORD, i.e. int64 time, float32 util
+#   <res>/<node>_gpu<N>.cum.npy  float64 (n + 1, 2), UtilSeries.cumutilV / cumcoverV
+# Readers memory map both, so opening a store reads only index.json and a query
+# only touches the pages it binary searches.
+#
+import os
+import json
+import datetime
+import numpy as np
+from typing import Dict
+from classes import Gpu,Node,TotalGpu,Cluster,UtilSeries
+from functions import UTIL_RESOLUTIONS,gpu_util_manifest
+
+# Bump when the layout of the store changes
+STORE_VERSION = 1
+# Name of the index inside the store
+INDEX_NAME = 'index.json'
+# One sample on disk
+UTIL_RECORD = np.dtype([('time', '<i8'), ('util', '<f4')])
+# Format of the header start / end times in the index
+HEADER_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def read_util_index(storepath : str = None, version : int = STORE_VERSION) -> Dict :
+    """Read the index of a store
+
+    Args
+        storepath = store directory
+        version   = expected version, util_archive.py indexes have their own
+
+    Returns
+        dict of series key (e.g. '1h/node01_gpu3') -> entry with resolution,
+        node (None for the total), gidx (-1 for the total), source (name of the
+        text file), nsample, tmin, tmax, period, start, end. Empty if there is no
+        store yet.
+
+    Raises
+        ValueError if the store was written by another STORE_VERSION
+    """
+    path = os.path.join(storepath, INDEX_NAME)
+    if not os.path.isfile(path):
+        return dict()
+    with open(path, 'r') as fin:
+        indexD = json.load(fin)
+    if indexD['version'] != version:
+        raise ValueError("ERROR!!! {} is version {}, expected {}".format(
+                         path, indexD['version'], version))
+    return indexD['seriesD']
+
+
+def write_util_index(storepath : str = None, seriesD : Dict = None,
+                     version : int = STORE_VERSION):
+    """Atomically replace the index of a store, see read_util_index()"""
+    path = os.path.join(storepath, INDEX_NAME)
+    tmppath = "{}.tmp{}".format(path, os.getpid())
+    with open(tmppath, 'w') as fout:
+        json.dump({'version' : version, 'seriesD' : seriesD}, fout, indent=1,
+                  sort_keys=True)
+    os.replace(tmppath, path)
+
+
+def save_array(path : str = None, arrayV : np.ndarray = None):
+    """np.save() to a temporary file renamed over path, readers never see a
+       partial file"""
+    tmppath = "{}.tmp{}".format(path, os.getpid())
+    with open(tmppath, 'wb') as fout:
+        np.save(fout, arrayV)
+    os.replace(tmppath, path)
+
+
+def merge_series(oldtimeV : np.ndarray = None, oldutilV : np.ndarray = None,
+                 newtimeV : np.ndarray = None, newutilV : np.ndarray = None):
+    """Union of two sorted series, the new sample wins where both have a time
+
+    Args
+        oldtimeV, oldutilV = series already in the store
+        newtimeV, newutilV = series from a newer dump
+
+    Returns
+        timeV, utilV = sorted, unique times
+
+    Raises
+    """
+    timeV = np.concatenate([oldtimeV, newtimeV])
+    utilV = np.concatenate([oldutilV, newutilV])
+    # Stable s.t. the new sample is last among equal times
+    orderV = np.argsort(timeV, kind='stable')
+    timeV = timeV[orderV]
+    utilV = utilV[orderV]
+    lastV = np.append(timeV[1:] != timeV[:-1], True)
+    return(timeV[lastV], utilV[lastV])
+
+
+def open_series(storepath : str = None, key : str = None,
+                entry : Dict = None) -> UtilSeries :
+    """Memory map one series of the store, nothing is read until it is used
+
+    Args
+        storepath = store directory
+        key       = key of the series in the index
+        entry     = its entry in the index
+
+    Returns
+        UtilSeries over read only memory maps
+
+    Raises
+    """
+    stem = os.path.join(storepath, key)
+    recordV = np.load("{}.npy".format(stem), mmap_mode='r')
+    cumM = np.load("{}.cum.npy".format(stem), mmap_mode='r')
+    timeL = [None if entry[name] is None else
+             datetime.datetime.strptime(entry[name], HEADER_TIME_FORMAT)
+             for name in ['start', 'end']]
+    return UtilSeries.from_arrays(timeV = recordV['time'], utilV = recordV['util'],
+                                  period = entry['period'], cumutilV = cumM[:, 0],
+                                  cumcoverV = cumM[:, 1], start = timeL[0],
+                                  end = timeL[1])
+
+
+def store_series(storepath : str = None, key : str = None, source : str = None,
+                 series : UtilSeries = None, seriesD : Dict = None) -> int :
+    """Merge a series read from text into the store, see merge_series(). The
+       index entry is updated in seriesD, the caller writes the index.
+
+    Args
+        storepath = store directory
+        key       = e.g. '1h/node01_gpu3' or '1h/totalgpuutilization'
+        source    = path of the text file
+        series    = UtilSeries read from source
+        seriesD   = index, see read_util_index()
+
+    Returns
+        number of samples added to the store
+
+    Raises
+    """
+    (timeV, utilV) = (series.timeV, series.utilV)
+    nold = 0
+    if key in seriesD:
+        old = open_series(storepath, key, seriesD[key])
+        nold = old.timeV.shape[0]
+        (timeV, utilV) = merge_series(np.array(old.timeV), np.array(old.utilV),
+                                      timeV, utilV)
+        series = UtilSeries.from_arrays(timeV, utilV, start = old.start or series.start,
+                                        end = series.end or old.end)
+    recordV = np.zeros(timeV.shape[0], dtype=UTIL_RECORD)
+    recordV['time'] = timeV
+    recordV['util'] = utilV
+    cumM = np.stack([series.cumutilV, series.cumcoverV], axis=1)
+    stem = os.path.join(storepath, key)
+    os.makedirs(os.path.dirname(stem), exist_ok=True)
+    save_array("{}.cum.npy".format(stem), cumM)
+    save_array("{}.npy".format(stem), recordV)
+    (resolution, name) = key.split('/')
+    seriesD[key] = {'resolution' : resolution,
+                    'node' : None if '_gpu' not in name else name.rsplit('_gpu', 1)[0],
+                    'gidx' : -1 if '_gpu' not in name else int(name.rsplit('_gpu', 1)[1]),
+                    'source' : os.path.basename(source),
+                    'nsample' : int(timeV.shape[0]),
+                    'tmin' : int(timeV[0]) if timeV.shape[0] > 0 else None,
+                    'tmax' : int(timeV[-1]) if timeV.shape[0] > 0 else None,
+                    'period' : int(series.period),
+                    'start' : (None if series.start is None else
+                               series.start.strftime(HEADER_TIME_FORMAT)),
+                    'end' : (None if series.end is None else
+                             series.end.strftime(HEADER_TIME_FORMAT))}
+    return int(timeV.shape[0]) - nold
+
+
+def convert_util_dir(path : str = None, storepath : str = None,
+                     excludenodeL : list = None) -> Dict :
+    """Convert (or merge) a directory of text files from collect_data.sh into a
+       store. Running it on every new dump archives them all.
+
+    Args
+        path         = directory with node*_gpuutil_gpu*.txt files
+        storepath    = store directory, created if needed
+        excludenodeL = node names to skip
+
+    Returns
+        dict with the number of series written and samples added
+
+    Raises
+        ValueError if a file can't be parsed
+    """
+    os.makedirs(storepath, exist_ok=True)
+    seriesD = read_util_index(storepath)
+    (gpuD, totalD) = gpu_util_manifest(path, excludenodeL)
+    sourceD = dict()
+    for resolution in UTIL_RESOLUTIONS:
+        for name, nodeD in gpuD[resolution].items():
+            for gidx, gpupath in nodeD.items():
+                sourceD["{}/{}_gpu{}".format(resolution, name, gidx)] = gpupath
+        if resolution in totalD:
+            sourceD["{}/totalgpuutilization".format(resolution)] = totalD[resolution]
+    nsample = 0
+    for key in sorted(sourceD):
+        nsample += store_series(storepath, key, sourceD[key],
+                                UtilSeries(sourceD[key]), seriesD)
+    write_util_index(storepath, seriesD)
+    return {'series' : len(sourceD), 'samples' : nsample}
+
+
+def open_util_store(storepath : str = None, resolution : str = '1h',
+                    excludenodeL : list = None) -> Cluster :
+    """Cluster of one resolution over the memory mapped store, only index.json
+       is read
+
+    Args
+        storepath    = store directory
+        resolution   = one of UTIL_RESOLUTIONS
+        excludenodeL = node names to skip
+
+    Returns
+        Cluster, nodes sorted by name and gpus by index
+
+    Raises
+        ValueError if the store has no nodes or total for resolution
+    """
+    seriesD = read_util_index(storepath)
+    excludeD = set([] if excludenodeL is None else excludenodeL)
+    nodeD = dict()
+    total = None
+    for key in sorted(seriesD):
+        entry = seriesD[key]
+        if entry['resolution'] != resolution or entry['node'] in excludeD:
+            continue
+        gpu = Gpu.from_series(os.path.join(storepath, entry['source']),
+                              open_series(storepath, key, entry))
+        if entry['node'] is None:
+            total = TotalGpu(gpu.gpupath, gpu)
+        else:
+            nodeD.setdefault(entry['node'], []).append(gpu)
+    if len(nodeD) == 0 or total is None:
+        raise ValueError("ERROR!!! {} has no {} nodes or total".format(storepath,
+                         resolution))
+    nodeL = []
+    for name in sorted(nodeD):
+        gpuL = sorted(nodeD[name], key=lambda gpu : gpu.gidx)
+        nodeL.append(Node([gpu.gpupath for gpu in gpuL], gpuL))
+    return Cluster(nodeL, total.name, total)
@@ -22,6 +22,8 @@
 #
 import os
 import sys
+import json
+import contextlib
 import random
 import argparse
 import datetime
@@ -32,11 +34,46 @@ import matplotlib
 #matplotlib.use('tkagg')        # Linux
 matplotlib.use('qtagg')        # Linux
 import matplotlib.pyplot as plt
+from classes import from_epoch
 from functions import read_gpu_util
+from functions import UTIL_RESOLUTIONS
+from rollup import open_util_rollup
 
 
 
 
+def validation_report(validD : dict = None) -> dict :
+    """Json serializable form of Cluster.validate(), times are ISO 8601 and only
+       the samples outside the tolerance are listed
+
+    Args
+        validD = from Cluster.validate()
+
+    Returns
+        dict with summary, outliers, nodes, gaps and missing
+
+    Raises
+
+    """
+    def isotime(timeV):
+        return [from_epoch(int(t)).isoformat() for t in timeV]
+
+    timedf = validD['timedf']
+    outdf = timedf[np.abs(timedf['deviation']) > validD['summary']['tolerance']]
+    outdf = outdf.assign(time = isotime(outdf['time']))
+    gapdf = validD['gapdf']
+    gapdf = gapdf.assign(start = isotime(gapdf['start']), end = isotime(gapdf['end']))
+    # NaN isn't valid json
+    return {'summary' : validD['summary'],
+            'outliers' : outdf.astype(object).where(outdf.notna(), None)
+                              .to_dict('records'),
+            'nodes' : validD['nodedf'].astype(object)
+                          .where(validD['nodedf'].notna(), None).to_dict('records'),
+            'gaps' : gapdf.to_dict('records'),
+            'missing' : [{'node' : node, 'gidx' : gidx} for (node, gidx) in
+                         validD['missingL']]}
+
+
 def main():
     """
 
@@ -58,6 +95,25 @@ def main():
     parser.add_argument('--excludenodes', metavar='excludenodes', nargs='?',
                         type=str, help='Exclude nodes from calculation. Useful when'
                                        'considering nodes that have MIGs enabled')
+    parser.add_argument('--nproc', metavar='nproc', nargs='?', type=int,
+                        help='Processes used to read the files, default is all cores')
+    parser.add_argument('--resolution', metavar='2min|1h|1d', nargs='?', type=str,
+                        choices=UTIL_RESOLUTIONS,
+                        help='Only read and validate files of this resolution, '
+                             'default is all')
+    parser.add_argument('--rollupdir', metavar='path/to/rollupdir', nargs='?',
+                        type=str, help='Take the 1h / 1d series from the rollups '
+                                       'of rollup_gpu_util.py instead of --path')
+    parser.add_argument('--tolerance', metavar='percent', nargs='?', type=float,
+                        default=1.0, help='Max |total - mean of gpus| in %%, '
+                                          'default 1')
+    parser.add_argument('--report', metavar='path/to/report.json', nargs='?',
+                        type=str, help='Write the validation report as json, '
+                                       'default is stdout. Exits 1 if any total '
+                                       'sample is outside --tolerance')
+    parser.add_argument('--timeseries', metavar='path/to/deviation.csv', nargs='?',
+                        type=str, help='Also write the deviation of every total '
+                                       'sample, one csv per resolution')
     args = parser.parse_args()
 
 
@@ -71,8 +127,39 @@ def main():
 
 
     path = args.path
-    (cluster2min, cluster1h, cluster1d) = read_gpu_util(path, excludenodeL)
-    sys.exit(0)
+    resolutionL = list(UTIL_RESOLUTIONS) if args.resolution is None else [args.resolution]
+    # Keep stdout for the json report
+    # Only the raw series are in path when collect_data.sh keeps rollups
+    rawL = [res for res in resolutionL if args.rollupdir is None or res == '2min']
+    with contextlib.redirect_stdout(sys.stderr if args.report is None else sys.stdout):
+        if len(rawL) > 0:
+            clusterL = list(read_gpu_util(path, excludenodeL, args.nproc, rawL))
+        else:
+            clusterL = [None] * len(UTIL_RESOLUTIONS)
+    for i, resolution in enumerate(UTIL_RESOLUTIONS):
+        if resolution in resolutionL and resolution not in rawL:
+            clusterL[i] = open_util_rollup(args.rollupdir, resolution, excludenodeL)
+    reportD = dict()
+    noutlier = 0
+    for resolution, cluster in zip(UTIL_RESOLUTIONS, clusterL):
+        if resolution not in resolutionL:
+            continue
+        validD = cluster.validate(args.tolerance)
+        reportD[resolution] = validation_report(validD)
+        noutlier += validD['summary']['noutlier']
+        if args.timeseries is not None:
+            (stem, ext) = os.path.splitext(args.timeseries)
+            validD['timedf'].to_csv("{}_{}{}".format(stem, resolution, ext), index=False)
+        print("{} : {} of {} total samples within {}%".format(resolution,
+              validD['summary']['ncompared'] - validD['summary']['noutlier'],
+              validD['summary']['ncompared'], args.tolerance), file=sys.stderr)
+    if args.report is not None:
+        with open(args.report, 'w') as fout:
+            json.dump(reportD, fout, indent=1)
+    else:
+        json.dump(reportD, sys.stdout, indent=1)
+    # Non-zero s.t. a cron job can gate on the check
+    sys.exit(1 if noutlier > 0 else 0)
 
 
 if __name__ == "__main__":